@@ -0,0 +1,261 @@
+-- Schema changes of the ingestion / rankings / metrics performance series.
+--
+-- Requires PostgreSQL 15+ (UNIQUE NULLS NOT DISTINCT). Idempotent, runs in one
+-- transaction; apply it with the API stopped, before deploying the new code:
+--   psql -v ON_ERROR_STOP=1 -d <database> -f migrations/001_performance_schema.sql
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF current_setting('server_version_num')::int < 150000 THEN
+        RAISE EXCEPTION 'PostgreSQL 15 or later is required (UNIQUE NULLS NOT DISTINCT), found %',
+            current_setting('server_version');
+    END IF;
+END $$;
+
+
+-- ============================================================================
+-- UNIQUE NATURAL KEYS OF HIERARCHICAL METADATA AND GROUND TRUTHS
+-- ============================================================================
+-- Targets of the INSERT ... ON CONFLICT ON CONSTRAINT upserts. The former
+-- SELECT-then-INSERT path could store duplicates: they are merged into the
+-- oldest row of their key first (NULLs compare equal, like the constraints).
+
+LOCK TABLE retrieval_framework.hierarchical_metadata, retrieval_framework.ground_truth IN EXCLUSIVE MODE;
+
+CREATE TEMP TABLE hierarchical_metadata_duplicate ON COMMIT DROP AS
+SELECT id, keep_id
+FROM (
+    SELECT id, min(id) OVER (PARTITION BY id_section, section_title, depth) AS keep_id
+    FROM retrieval_framework.hierarchical_metadata
+) sections
+WHERE id <> keep_id;
+
+UPDATE retrieval_framework.chunk c
+SET hierarchical_metadata_id = d.keep_id
+FROM hierarchical_metadata_duplicate d
+WHERE c.hierarchical_metadata_id = d.id;
+
+UPDATE retrieval_framework.ground_truth g
+SET hierarchical_metadata_id = d.keep_id
+FROM hierarchical_metadata_duplicate d
+WHERE g.hierarchical_metadata_id = d.id;
+
+DELETE FROM retrieval_framework.hierarchical_metadata h
+USING hierarchical_metadata_duplicate d
+WHERE h.id = d.id;
+
+-- After the metadata merge, which can turn distinct ground truths into duplicates
+CREATE TEMP TABLE ground_truth_duplicate ON COMMIT DROP AS
+SELECT id, keep_id
+FROM (
+    SELECT id, min(id) OVER (PARTITION BY filename, confidence, hierarchical_metadata_id) AS keep_id
+    FROM retrieval_framework.ground_truth
+) ground_truths
+WHERE id <> keep_id;
+
+INSERT INTO retrieval_framework.query_ground_truth (query_id, ground_truth_id)
+SELECT a.query_id, d.keep_id
+FROM retrieval_framework.query_ground_truth a
+JOIN ground_truth_duplicate d ON d.id = a.ground_truth_id
+ON CONFLICT DO NOTHING;
+
+-- Their query_ground_truth rows go with them (ON DELETE CASCADE)
+DELETE FROM retrieval_framework.ground_truth g
+USING ground_truth_duplicate d
+WHERE g.id = d.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'hierarchical_metadata_unique_section'
+          AND connamespace = 'retrieval_framework'::regnamespace
+    ) THEN
+        ALTER TABLE retrieval_framework.hierarchical_metadata
+            ADD CONSTRAINT hierarchical_metadata_unique_section
+            UNIQUE NULLS NOT DISTINCT (id_section, section_title, depth);
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'ground_truth_unique_attributes'
+          AND connamespace = 'retrieval_framework'::regnamespace
+    ) THEN
+        ALTER TABLE retrieval_framework.ground_truth
+            ADD CONSTRAINT ground_truth_unique_attributes
+            UNIQUE NULLS NOT DISTINCT (filename, confidence, hierarchical_metadata_id);
+    END IF;
+END $$;
+
+
+-- ============================================================================
+-- ENUM TYPES
+-- ============================================================================
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_type
+        WHERE typname = 'ranking_storage' AND typnamespace = 'retrieval_framework'::regnamespace
+    ) THEN
+        CREATE TYPE retrieval_framework.ranking_storage AS ENUM ('ROWS', 'COMPACT');
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_type
+        WHERE typname = 'job_status' AND typnamespace = 'retrieval_framework'::regnamespace
+    ) THEN
+        CREATE TYPE retrieval_framework.job_status AS ENUM ('PENDING', 'RUNNING', 'SUCCEEDED', 'FAILED');
+    END IF;
+END $$;
+
+
+-- ============================================================================
+-- QUERY: CONTENT FINGERPRINT AND LATEST-VERSION INDEX
+-- ============================================================================
+
+-- NULL for existing versions: the next upload of their dataset fills it in
+ALTER TABLE retrieval_framework.query ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+COMMENT ON COLUMN retrieval_framework.query.content_hash
+    IS 'SHA-256 of prompt, device, customer, complexity and ground truth signatures';
+
+CREATE INDEX IF NOT EXISTS idx_query_dataset_position_version
+    ON retrieval_framework.query (dataset_id, position_id, version);
+
+
+-- ============================================================================
+-- DATASET SNAPSHOTS
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS retrieval_framework.dataset_snapshot (
+    id SERIAL NOT NULL,
+    dataset_id INTEGER NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+    query_count INTEGER NOT NULL,
+    position_ids INTEGER[] NOT NULL,
+    query_ids INTEGER[] NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY (dataset_id) REFERENCES retrieval_framework.dataset (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_dataset_snapshot_dataset
+    ON retrieval_framework.dataset_snapshot (dataset_id, id);
+
+-- Current active query set of the datasets that have no snapshot yet
+INSERT INTO retrieval_framework.dataset_snapshot (dataset_id, query_count, position_ids, query_ids)
+SELECT d.id,
+       count(q.id),
+       coalesce(array_agg(q.position_id ORDER BY q.position_id) FILTER (WHERE q.id IS NOT NULL), '{}'),
+       coalesce(array_agg(q.id ORDER BY q.position_id) FILTER (WHERE q.id IS NOT NULL), '{}')
+FROM retrieval_framework.dataset d
+LEFT JOIN retrieval_framework.query q ON q.dataset_id = d.id AND NOT q.obsolete
+WHERE NOT EXISTS (SELECT 1 FROM retrieval_framework.dataset_snapshot s WHERE s.dataset_id = d.id)
+GROUP BY d.id;
+
+
+-- ============================================================================
+-- EXPERIMENT: SNAPSHOT, RANKING STORAGE, VERSIONS OF CACHED READS
+-- ============================================================================
+
+ALTER TABLE retrieval_framework.experiment
+    ADD COLUMN IF NOT EXISTS dataset_snapshot_id INTEGER
+        REFERENCES retrieval_framework.dataset_snapshot (id),
+    ADD COLUMN IF NOT EXISTS ranking_storage retrieval_framework.ranking_storage DEFAULT 'ROWS' NOT NULL,
+    ADD COLUMN IF NOT EXISTS rankings_version INTEGER DEFAULT '0' NOT NULL,
+    -- NULL: the stored metrics cover the full rankings
+    ADD COLUMN IF NOT EXISTS metrics_cutoff INTEGER;
+COMMENT ON COLUMN retrieval_framework.experiment.dataset_snapshot_id IS 'Active query set the experiment ran on';
+COMMENT ON COLUMN retrieval_framework.experiment.ranking_storage IS 'ranking rows or one ranking_compact row per query';
+COMMENT ON COLUMN retrieval_framework.experiment.rankings_version
+    IS 'Incremented whenever rankings of the experiment are written';
+COMMENT ON COLUMN retrieval_framework.experiment.metrics_cutoff
+    IS 'Cutoff of the stored metrics, NULL for full rankings';
+
+
+-- ============================================================================
+-- RANKINGS: COVERING KEYSET INDEX AND COMPACT STORAGE
+-- ============================================================================
+
+-- Blocks ranking writes while it builds: part of the maintenance window
+CREATE INDEX IF NOT EXISTS idx_ranking_experiment_query_position
+    ON retrieval_framework.ranking (experiment_id, query_id, rank_position)
+    INCLUDE (chunk_id, score, is_relevant);
+
+CREATE TABLE IF NOT EXISTS retrieval_framework.ranking_compact (
+    id SERIAL NOT NULL,
+    experiment_id INTEGER NOT NULL,
+    query_id INTEGER NOT NULL,
+    chunk_ids INTEGER[] NOT NULL,
+    scores FLOAT[] NOT NULL,
+    relevance BOOLEAN[] NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT ranking_compact_unique_experiment_query UNIQUE (experiment_id, query_id),
+    FOREIGN KEY (experiment_id) REFERENCES retrieval_framework.experiment (id) ON DELETE CASCADE,
+    FOREIGN KEY (query_id) REFERENCES retrieval_framework.query (id) ON DELETE CASCADE
+);
+
+
+-- ============================================================================
+-- METRICS: STALE PAIRS AND PER-EXPERIMENT AGGREGATES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS retrieval_framework.metrics_dirty (
+    experiment_id INTEGER NOT NULL,
+    query_id INTEGER NOT NULL,
+    marked_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (experiment_id, query_id),
+    FOREIGN KEY (experiment_id) REFERENCES retrieval_framework.experiment (id) ON DELETE CASCADE,
+    FOREIGN KEY (query_id) REFERENCES retrieval_framework.query (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS retrieval_framework.experiment_aggregate (
+    experiment_id INTEGER NOT NULL,
+    query_count INTEGER NOT NULL,
+    precision_value FLOAT,
+    recall FLOAT,
+    f1_score FLOAT,
+    ndcg FLOAT,
+    mrr FLOAT,
+    map_value FLOAT,
+    metrics_version INTEGER DEFAULT '1' NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (experiment_id),
+    FOREIGN KEY (experiment_id) REFERENCES retrieval_framework.experiment (id) ON DELETE CASCADE
+);
+COMMENT ON COLUMN retrieval_framework.experiment_aggregate.metrics_version IS 'Incremented on every refresh';
+
+-- Same rows as LeaderboardService.refresh_aggregates, so existing metrics reach the leaderboard
+INSERT INTO retrieval_framework.experiment_aggregate
+    (experiment_id, query_count, precision_value, recall, f1_score, ndcg, mrr, map_value)
+SELECT e.id, count(m.id), avg(m.precision_value), avg(m.recall), avg(m.f1_score),
+       avg(m.ndcg), avg(m.mrr), avg(m.map_value)
+FROM retrieval_framework.experiment e
+LEFT JOIN retrieval_framework.metrics m ON m.experiment_id = e.id
+GROUP BY e.id
+ON CONFLICT (experiment_id) DO NOTHING;
+
+
+-- ============================================================================
+-- BACKGROUND JOBS
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS retrieval_framework.job (
+    id SERIAL NOT NULL,
+    job_type VARCHAR(100) NOT NULL,
+    status retrieval_framework.job_status DEFAULT 'PENDING' NOT NULL,
+    payload JSONB NOT NULL,
+    result JSONB,
+    error_message TEXT,
+    progress INTEGER DEFAULT '0' NOT NULL,
+    total INTEGER,
+    attempts INTEGER DEFAULT '0' NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+    started_at TIMESTAMP WITHOUT TIME ZONE,
+    finished_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (id)
+);
+COMMENT ON COLUMN retrieval_framework.job.payload IS 'Input of the job handler';
+COMMENT ON COLUMN retrieval_framework.job.result IS 'Output of the job handler once SUCCEEDED';
+CREATE INDEX IF NOT EXISTS idx_job_status_created_at ON retrieval_framework.job (status, created_at);
+
+COMMIT;
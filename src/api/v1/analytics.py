@@ -1 +1,60 @@
 # FastAPI routes for analytics endpoints
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import get_db
+from src.schemas.analytics import ExperimentSimilarityResponse, ExperimentSignificanceResponse
+from src.services.analytics_service import AnalyticsService
+
+router = APIRouter()
+
+
+@router.get("/similarity", response_model=ExperimentSimilarityResponse)
+async def compare_experiment_rankings(
+        experiment_a: int,
+        experiment_b: int,
+        k: int = Query(10, ge=1, le=1000),
+        rbo_p: float = Query(0.9, gt=0, lt=1),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Compare the rankings of two experiments on the same dataset: per-query
+    overlap@k, Jaccard, rank-biased overlap and Kendall tau, with distribution summaries
+    """
+    try:
+        return await AnalyticsService.compare_experiments(db, experiment_a, experiment_b, k=k, rbo_p=rbo_p)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+
+@router.get("/significance", response_model=ExperimentSignificanceResponse)
+async def compare_experiment_significance(
+        experiment_ids: List[int] = Query(..., description="Two or more experiments, e.g. ?experiment_ids=1&experiment_ids=2"),
+        metrics: List[str] = Query(["ndcg"], description="Metrics columns to test"),
+        resamples: int = Query(10_000, ge=100),
+        confidence: float = Query(0.95, gt=0, lt=1),
+        seed: Optional[int] = Query(None, ge=0, description="Seed for reproducible resampling"),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Paired bootstrap and randomization tests between every pair of experiments on the
+    same dataset, on their stored per-query metrics (run POST /metrics/.../calculate
+    first). The resampling runs in a process pool, off the event loop.
+    """
+    if resamples > settings.significance_max_resamples:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.significance_max_resamples} resamples"
+        )
+    if len(experiment_ids) > 10:
+        raise HTTPException(status_code=400, detail="At most 10 experiments per request")
+    try:
+        return await AnalyticsService.compare_significance(
+            db, experiment_ids, list(dict.fromkeys(metrics)), resamples=resamples, confidence=confidence, seed=seed
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+# ============================================================================
@@ -1,3 +1,4 @@
+import logging
 from datetime import date
 
 from fastapi import APIRouter
@@ -5,16 +6,27 @@ from fastapi import APIRouter
 from src.models import GroundTruth
 from src.models.dataset import Dataset
 from src.models.query import Query
-from src.schemas.dataset import DatasetCreate, DatasetUpdate, DatasetResponse, DatasetCreateResponse
-from typing import List, Optional
+from src.models.dataset_snapshot import DatasetSnapshot
+from src.schemas.dataset import DatasetCreate, DatasetUpdate, DatasetResponse, DatasetCreateResponse, \
+    DatasetDiffResponse, DatasetSnapshotResponse, DatasetSnapshotDetailResponse
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from src.database import get_db
-from src.schemas.query import QueryResponse
-from src.services.dataset_service import DatasetService
+from src.config import settings
+from src.database import get_db, async_session
+from src.schemas.job import JobResponse
+from src.schemas.query import QueryResponse, QueryInput
+from src.services.dataset_service import DatasetService, DATASET_UPLOAD_JOB
+from src.services.job_service import job_runner
+from src.utils.ndjson import iter_ndjson_models, ndjson_line, NDJSONStreamingResponse
+from src.utils.pagination import decode_cursor
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -32,9 +44,12 @@ async def list_datasets(
     return result.scalars().all()
 
 
-@router.post("/", response_model=DatasetCreateResponse, status_code=201)
+@router.post("/", response_model=Union[DatasetCreateResponse, DatasetDiffResponse, JobResponse], status_code=201)
 async def create_dataset(
         dataset: DatasetCreate,
+        response: Response,
+        dry_run: bool = False,
+        background: bool = False,
         db: AsyncSession = Depends(get_db)
 ):
     """
@@ -44,6 +59,13 @@ async def create_dataset(
     - data_creation: Set to current date for new datasets
     - data_update: Set to current date when updating existing datasets
 
+    With `?dry_run=true` nothing is written: the response is a DatasetDiffResponse
+    with the number of queries that would be added, versioned or left alone, and
+    the positions that would change.
+
+    With `?background=true` the upload is queued as a job and a JobResponse is
+    returned right away (202); poll GET /jobs/{id} for progress and final stats.
+
     Simple usage (dataset only):
         {
             "dataset_name": "my_dataset"
@@ -75,55 +97,49 @@ async def create_dataset(
         }
     """
     try:
+        if dry_run:
+            diff = await DatasetService.diff_dataset(
+                db=db,
+                dataset_name=dataset.dataset_name,
+                queries_input=dataset.queries
+            )
+            await db.rollback()
+            response.status_code = 200
+            return DatasetDiffResponse(**diff)
+
+        if background:
+            job = await job_runner.submit(
+                db,
+                job_type=DATASET_UPLOAD_JOB,
+                payload=dataset.model_dump(mode="json"),
+                total=len(dataset.queries)
+            )
+            response.status_code = 202
+            return JobResponse.model_validate(job)
+
         if not dataset.queries:
-            # Simple case: just create dataset
-            # Check if dataset exists
-            result = await db.execute(
-                select(Dataset).where(Dataset.dataset_name == dataset.dataset_name)
+            # Simple case: just create dataset (or touch an existing one)
+            db_dataset, created = await DatasetService.get_or_create_dataset(db, dataset.dataset_name)
+            if not created:
+                db_dataset.data_update = date.today()
+            await db.commit()
+            await db.refresh(db_dataset)
+
+            return DatasetCreateResponse(
+                id=db_dataset.id,
+                dataset_name=db_dataset.dataset_name,
+                data_creation=db_dataset.data_creation,
+                data_update=db_dataset.data_update
             )
-            existing_dataset = result.scalar_one_or_none()
-
-            if existing_dataset:
-                # Update existing dataset
-                existing_dataset.data_update = date.today()
-                await db.commit()
-                await db.refresh(existing_dataset)
-
-                return DatasetCreateResponse(
-                    id=existing_dataset.id,
-                    dataset_name=existing_dataset.dataset_name,
-                    data_creation=existing_dataset.data_creation,
-                    data_update=existing_dataset.data_update
-                )
-            else:
-                # Create new dataset
-                db_dataset = Dataset(
-                    dataset_name=dataset.dataset_name,
-                    data_creation=date.today(),
-                    data_update=None
-                )
-                db.add(db_dataset)
-                await db.commit()
-                await db.refresh(db_dataset)
-
-                return DatasetCreateResponse(
-                    id=db_dataset.id,
-                    dataset_name=db_dataset.dataset_name,
-                    data_creation=db_dataset.data_creation,
-                    data_update=db_dataset.data_update
-                )
         else:
             # Complex case: create dataset with queries and ground truths
-            # Process within a single transaction
-            stats = await DatasetService.process_dataset_with_queries(
+            # Process within a single transaction (replayed on a concurrent version conflict)
+            stats = await DatasetService.process_dataset_with_retry(
                 db=db,
                 dataset_name=dataset.dataset_name,
                 queries_input=dataset.queries
             )
 
-            # Commit the entire transaction
-            await db.commit()
-
             # Fetch the created/updated dataset
             result = await db.execute(
                 select(Dataset).where(Dataset.id == stats["dataset_id"])
@@ -160,6 +176,49 @@ async def create_dataset(
         )
 
 
+@router.post("/{dataset_name}/import")
+async def import_dataset(
+        dataset_name: str,
+        request: Request,
+        batch_size: Optional[int] = None
+):
+    """
+    Stream queries into a dataset from an NDJSON body, one QueryInput per line.
+
+    Lines are parsed incrementally and committed every `batch_size` queries
+    (default from settings), with the same versioning rules as POST /datasets.
+    The response is NDJSON too: one line of cumulative counters per committed
+    batch, or a final {"error": ...} line. Batches committed before an error are kept.
+
+        {"position_id": 1, "prompt": "How do I...", "complexity": "Reasoning", "ground_truths": [...]}
+        {"position_id": 2, "prompt": "Where is...", "complexity": "Table_Analysis", "ground_truths": [...]}
+    """
+    batch_size = batch_size or settings.dataset_import_batch_size
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive")
+
+    async def progress():
+        # The request-scoped session may be closed before the body is streamed, use our own
+        async with async_session() as db:
+            try:
+                async for totals in DatasetService.import_queries_in_batches(
+                        db,
+                        dataset_name=dataset_name,
+                        queries=iter_ndjson_models(request.stream(), QueryInput),
+                        batch_size=batch_size
+                ):
+                    yield ndjson_line(totals)
+            except ValueError as ve:
+                await db.rollback()
+                yield ndjson_line({"error": str(ve)})
+            except Exception as e:
+                await db.rollback()
+                logger.exception("Error importing dataset")
+                yield ndjson_line({"error": f"Failed to import dataset: {str(e)}"})
+
+    return NDJSONStreamingResponse(progress())
+
+
 @router.get("/{dataset_id}", response_model=DatasetResponse)
 async def get_dataset(
         dataset_id: int,
@@ -214,27 +273,119 @@ async def delete_dataset(
     await db.commit()
 
 
+@router.get("/{dataset_id}/snapshots", response_model=List[DatasetSnapshotResponse])
+async def list_dataset_snapshots(
+        dataset_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        db: AsyncSession = Depends(get_db)
+):
+    """List the snapshots of a dataset, most recent first"""
+    result = await db.execute(
+        select(DatasetSnapshot)
+        .where(DatasetSnapshot.dataset_id == dataset_id)
+        .order_by(DatasetSnapshot.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.post("/{dataset_id}/snapshots", response_model=DatasetSnapshotResponse, status_code=201)
+async def create_dataset_snapshot(
+        dataset_id: int,
+        db: AsyncSession = Depends(get_db)
+):
+    """Capture the current active query set (snapshots are also captured on every upload)"""
+    result = await db.execute(
+        select(Dataset).where(Dataset.id == dataset_id)
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    snapshot_id = await DatasetService.capture_snapshot(db, dataset_id)
+    await db.commit()
+    return await db.get(DatasetSnapshot, snapshot_id)
+
+
+@router.get("/{dataset_id}/snapshots/{snapshot_id}", response_model=DatasetSnapshotDetailResponse)
+async def get_dataset_snapshot(
+        dataset_id: int,
+        snapshot_id: int,
+        db: AsyncSession = Depends(get_db)
+):
+    """Get a snapshot with its (position_id, query_id) pairs"""
+    result = await db.execute(
+        select(DatasetSnapshot).where(
+            DatasetSnapshot.id == snapshot_id,
+            DatasetSnapshot.dataset_id == dataset_id
+        )
+    )
+    snapshot = result.scalar_one_or_none()
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return DatasetService.snapshot_to_dict(snapshot)
+
+
 @router.get("/{dataset_id}/queries", response_model=List[QueryResponse])
 async def get_dataset_queries(
         dataset_id: int,
         obsolete: Optional[bool] = None,
+        stream: bool = False,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        last_event_id: Optional[str] = Header(None),
         db: AsyncSession = Depends(get_db)
 ):
-    """Get all queries in a dataset with their ground-truths"""
-    from sqlalchemy.orm import selectinload
-
-    query = (
-        select(Query)
-        .options(
-            selectinload(Query.ground_truths)
-            .selectinload(GroundTruth.hierarchical_metadata)  # Eager load hierarchical metadata
+    """
+    Get all queries in a dataset with their ground-truths.
+
+    With `?stream=true` the queries are exported as NDJSON (one QueryResponse per
+    line) ordered by (position_id, version), paging through the table with a keyset
+    of `page_size` queries. An interrupted download is resumed by passing the
+    position_id and version of the last received line as `?cursor=<position_id>:<version>`
+    (or in the `Last-Event-ID` header).
+    """
+    if not stream:
+        query = (
+            select(Query)
+            .options(
+                selectinload(Query.ground_truths)
+                .selectinload(GroundTruth.hierarchical_metadata)  # Eager load hierarchical metadata
+            )
+            .where(Query.dataset_id == dataset_id)
         )
-        .where(Query.dataset_id == dataset_id)
-    )
-    if obsolete is not None:
-        query = query.where(Query.obsolete == obsolete)
+        if obsolete is not None:
+            query = query.where(Query.obsolete == obsolete)
 
-    result = await db.execute(query)
-    return result.scalars().all()
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    try:
+        after = decode_cursor(cursor or last_event_id, 2)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    page_size = page_size or settings.dataset_export_page_size
+    if page_size < 1:
+        raise HTTPException(status_code=400, detail="page_size must be positive")
+
+    result = await db.execute(select(Dataset.id).where(Dataset.id == dataset_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
 
-# ============================================================================
\ No newline at end of file
+    async def export():
+        async with async_session() as export_db:
+            async for page in DatasetService.iter_dataset_query_pages(
+                    export_db,
+                    dataset_id=dataset_id,
+                    obsolete=obsolete,
+                    after=after,
+                    page_size=page_size
+            ):
+                yield "".join(
+                    QueryResponse.model_validate(query).model_dump_json() + "\n" for query in page
+                ).encode("utf-8")
+
+    return StreamingResponse(export(), media_type="application/x-ndjson")
+
+# ============================================================================
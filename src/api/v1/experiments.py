@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import select, delete
+from typing import Dict, List, Optional
 from src.database import get_db
+from src.models.dataset_snapshot import DatasetSnapshot
 from src.models.experiment import Experiment
+from src.schemas.dataset import DatasetSnapshotDetailResponse
 from src.schemas.experiment import ExperimentCreate, ExperimentUpdate, ExperimentResponse
+from src.services.dataset_service import DatasetService
+from src.services.partition_service import PartitionService
 
 router = APIRouter()
 
@@ -33,13 +37,40 @@ async def create_experiment(
     experiment: ExperimentCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    """Create a new experiment"""
+    """Create a new experiment, pinned to a snapshot of its dataset (the latest one by default)"""
     db_experiment = Experiment(**experiment.dict())
+
+    if db_experiment.dataset_snapshot_id is None:
+        db_experiment.dataset_snapshot_id = await DatasetService.get_latest_snapshot_id(
+            db, db_experiment.dataset_id
+        )
+    else:
+        snapshot = await db.get(DatasetSnapshot, db_experiment.dataset_snapshot_id)
+        if not snapshot or snapshot.dataset_id != db_experiment.dataset_id:
+            raise HTTPException(status_code=400, detail="Snapshot does not belong to the experiment dataset")
+
     db.add(db_experiment)
+    await db.flush()
+    await PartitionService.create_experiment_partitions(db, db_experiment.id)
     await db.commit()
     await db.refresh(db_experiment)
     return db_experiment
 
+@router.get("/partitioning", response_model=Dict[str, bool])
+async def get_partitioning(db: AsyncSession = Depends(get_db)):
+    """Whether the ranking and metrics tables are partitioned by experiment"""
+    return await PartitionService.get_partitioned_tables(db)
+
+@router.post("/partitioning", response_model=Dict[str, bool])
+async def convert_to_partitioned(db: AsyncSession = Depends(get_db)):
+    """
+    Maintenance: rebuild the ranking and metrics tables partitioned by experiment_id,
+    one partition per experiment. Locks both tables while their rows are copied.
+    """
+    state = await PartitionService.convert_to_partitioned(db)
+    await db.commit()
+    return state
+
 @router.get("/{experiment_id}", response_model=ExperimentResponse)
 async def get_experiment(
     experiment_id: int,
@@ -54,6 +85,22 @@ async def get_experiment(
         raise HTTPException(status_code=404, detail="Experiment not found")
     return experiment
 
+@router.get("/{experiment_id}/queries", response_model=DatasetSnapshotDetailResponse)
+async def get_experiment_queries(
+    experiment_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the (position_id, query_id) pairs the experiment ran on, from its dataset snapshot"""
+    result = await db.execute(
+        select(DatasetSnapshot)
+        .join(Experiment, Experiment.dataset_snapshot_id == DatasetSnapshot.id)
+        .where(Experiment.id == experiment_id)
+    )
+    snapshot = result.scalar_one_or_none()
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Experiment not found or not pinned to a dataset snapshot")
+    return DatasetService.snapshot_to_dict(snapshot)
+
 @router.patch("/{experiment_id}", response_model=ExperimentResponse)
 async def update_experiment(
     experiment_id: int,
@@ -87,8 +134,10 @@ async def delete_experiment(
     experiment = result.scalar_one_or_none()
     if not experiment:
         raise HTTPException(status_code=404, detail="Experiment not found")
-    
-    await db.delete(experiment)
+
+    # Drop the experiment's partitions first, the database cascades the rest
+    await PartitionService.drop_experiment_partitions(db, experiment_id)
+    await db.execute(delete(Experiment).where(Experiment.id == experiment_id))
     await db.commit()
 
 # ============================================================================
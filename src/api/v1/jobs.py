@@ -0,0 +1,49 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import get_db
+from src.models import JobStatus
+from src.models.job import Job
+from src.schemas.job import JobResponse
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[JobResponse])
+async def list_jobs(
+        status: Optional[JobStatus] = None,
+        job_type: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        db: AsyncSession = Depends(get_db)
+):
+    """List background jobs, most recent first"""
+    query = select(Job)
+    if status:
+        query = query.where(Job.status == status)
+    if job_type:
+        query = query.where(Job.job_type == job_type)
+
+    query = query.order_by(Job.created_at.desc()).offset(skip).limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+        job_id: int,
+        db: AsyncSession = Depends(get_db)
+):
+    """Get status, progress and result of a background job"""
+    result = await db.execute(
+        select(Job).where(Job.id == job_id)
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ============================================================================
@@ -0,0 +1,37 @@
+# FastAPI routes for the configuration leaderboard
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import get_db
+from src.schemas.leaderboard import LeaderboardResponse, LeaderboardRebuildResponse
+from src.services.leaderboard_service import LeaderboardService
+
+router = APIRouter()
+
+
+@router.get("/", response_model=LeaderboardResponse)
+async def get_leaderboard(
+        dataset_id: int,
+        metric: str = "ndcg",
+        skip: int = Query(0, ge=0),
+        limit: int = Query(50, ge=1, le=1000),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Configurations evaluated on a dataset, best first by the mean of a metric, read
+    from the per-experiment aggregates maintained by the metrics calculation
+    """
+    try:
+        return await LeaderboardService.get_leaderboard(db, dataset_id, metric, skip=skip, limit=limit)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+
+@router.post("/rebuild", response_model=LeaderboardRebuildResponse)
+async def rebuild_leaderboard(db: AsyncSession = Depends(get_db)):
+    """Maintenance: recompute the aggregates of every experiment from its Metrics rows"""
+    refreshed = await LeaderboardService.refresh_aggregates(db)
+    await db.commit()
+    return {"experiments_refreshed": refreshed}
+
+# ============================================================================
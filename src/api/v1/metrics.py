@@ -1,18 +1,20 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import settings
 from src.database import get_db
 from src.models.configuration import Configuration
+from src.models.experiment import Experiment
 from src.models.metrics import Metrics
-from src.models.ranking import Ranking
 from src.schemas.configuration import ConfigurationCreate, ConfigurationResponse
 
-from sqlalchemy import func
-
-from src.schemas.metrics import MetricsResponse, MetricsCreate
+from src.schemas.metrics import MetricsResponse, MetricsCreate, ExperimentMetricsCalculation, \
+    MetricsRecomputeResponse, SlicedMetricsResponse, MetricCurvesResponse
+from src.services.metrics_dirty_service import MetricsDirtyService
+from src.services.metrics_service import MetricsService
 
 router = APIRouter()
 
@@ -39,81 +41,120 @@ async def calculate_metrics(
     db: AsyncSession = Depends(get_db)
 ):
     """Calculate and store metrics for a query in an experiment"""
-    # Get rankings for this query/experiment
-    rankings_result = await db.execute(
-        select(Ranking).where(
-            Ranking.experiment_id == metrics_data.experiment_id,
-            Ranking.query_id == metrics_data.query_id
-        ).order_by(Ranking.rank_position)
+    calculation = await MetricsService.calculate_experiment_metrics(
+        db, metrics_data.experiment_id, query_ids=[metrics_data.query_id]
     )
-    rankings = rankings_result.scalars().all()
-    
-    if not rankings:
+    if not calculation["rows"]:
         raise HTTPException(status_code=404, detail="No rankings found")
-    
-    # Calculate metrics
-    relevant_count = sum(1 for r in rankings if r.is_relevant)
-    total_count = len(rankings)
-    
-    precision = relevant_count / total_count if total_count > 0 else 0.0
-    
-    # Simple NDCG calculation (simplified)
-    dcg = sum((1 if r.is_relevant else 0) / (i + 2) for i, r in enumerate(rankings))
-    idcg = sum(1 / (i + 2) for i in range(relevant_count))
-    ndcg = dcg / idcg if idcg > 0 else 0.0
-    
-    # MRR - position of first relevant result
-    mrr = 0.0
-    for i, r in enumerate(rankings):
-        if r.is_relevant:
-            mrr = 1.0 / (i + 1)
-            break
-    
-    # Create metrics
-    db_metrics = Metrics(
-        experiment_id=metrics_data.experiment_id,
-        query_id=metrics_data.query_id,
-        precision_value=precision,
-        recall=None,  # Need ground truth for recall
-        f1_score=None,
-        ndcg=ndcg,
-        mrr=mrr,
-        map_value=None
-    )
-    
-    db.add(db_metrics)
     await db.commit()
-    await db.refresh(db_metrics)
-    return db_metrics
 
-@router.get("/aggregate")
-async def aggregate_metrics(
+    result = await db.execute(
+        select(Metrics).where(
+            Metrics.experiment_id == metrics_data.experiment_id,
+            Metrics.query_id == metrics_data.query_id
+        )
+    )
+    return result.scalar_one()
+
+@router.post("/experiment/{experiment_id}/calculate", response_model=ExperimentMetricsCalculation)
+async def calculate_experiment_metrics(
     experiment_id: int,
+    k: Optional[int] = Query(
+        None, ge=1, le=10000,
+        description="Cutoff of the stored metrics (full rankings if omitted), reused by later partial recomputes"
+    ),
+    cutoffs: Optional[List[int]] = Query(None, description="Cutoffs reported as means (settings default if omitted)"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Aggregate metrics for an experiment"""
-    result = await db.execute(
-        select(
-            func.avg(Metrics.precision_value).label('avg_precision'),
-            func.avg(Metrics.recall).label('avg_recall'),
-            func.avg(Metrics.f1_score).label('avg_f1'),
-            func.avg(Metrics.ndcg).label('avg_ndcg'),
-            func.avg(Metrics.mrr).label('avg_mrr'),
-            func.avg(Metrics.map_value).label('avg_map'),
-            func.count(Metrics.id).label('query_count')
-        ).where(Metrics.experiment_id == experiment_id)
+    """
+    Calculate and store the metrics of every ranked query of an experiment at once:
+    one bulk read of the rankings, ground-truth grading (High=3, Medium=2, Low=1 gains
+    for NDCG), vectorized computation, one bulk upsert. Means at additional cutoffs
+    are returned without being stored.
+    """
+    if cutoffs is None:
+        cutoffs = settings.metrics_report_cutoffs
+    if any(cutoff < 1 or cutoff > 10000 for cutoff in cutoffs):
+        raise HTTPException(status_code=400, detail="Cutoffs must be between 1 and 10000")
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    calculation = await MetricsService.calculate_experiment_metrics(
+        db, experiment_id, k=k, cutoffs=sorted(set(cutoffs))
     )
-    
-    row = result.one()
+    await db.commit()
     return {
         "experiment_id": experiment_id,
-        "avg_precision": float(row.avg_precision) if row.avg_precision else None,
-        "avg_recall": float(row.avg_recall) if row.avg_recall else None,
-        "avg_f1": float(row.avg_f1) if row.avg_f1 else None,
-        "avg_ndcg": float(row.avg_ndcg) if row.avg_ndcg else None,
-        "avg_mrr": float(row.avg_mrr) if row.avg_mrr else None,
-        "avg_map": float(row.avg_map) if row.avg_map else None,
-        "query_count": row.query_count
+        "k": k,
+        "queries_computed": len(calculation["rows"]),
+        "at_k": calculation["at_k"]
     }
 
+@router.get("/experiment/{experiment_id}/curves", response_model=MetricCurvesResponse)
+async def get_metric_curves(
+    experiment_id: int,
+    max_k: int = Query(100, ge=1, le=1000, description="Largest cutoff of the curves"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Precision@k, recall@k, hit-rate@k and NDCG@k of an experiment for every k up to
+    max_k (e.g. to tune top_k and pre_retrieval), computed in one pass over its
+    rankings. Cached until the experiment's rankings are written again.
+    """
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    return await MetricsService.metric_curves(db, experiment_id, max_k)
+
+@router.get("/dirty", response_model=Dict[int, int])
+async def count_dirty_metrics(db: AsyncSession = Depends(get_db)):
+    """Number of stale (experiment, query) metrics per experiment, by experiment id"""
+    return await MetricsDirtyService.count_by_experiment(db)
+
+@router.post("/recompute", response_model=MetricsRecomputeResponse)
+async def recompute_dirty_metrics(
+    experiment_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Recompute only the metrics marked stale since their last calculation (new or
+    changed rankings), at the cutoff of each experiment's last full calculation, one
+    transaction per experiment
+    """
+    if experiment_id is not None and await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    return await MetricsService.recompute_dirty(db, experiment_id=experiment_id)
+
+@router.get("/aggregate")
+async def aggregate_metrics(
+    experiment_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Aggregate metrics for an experiment. Cached until its metrics are written again;
+    concurrent identical requests share one computation.
+    """
+    return await MetricsService.aggregate_metrics(db, experiment_id)
+
+@router.get("/aggregate/slices", response_model=SlicedMetricsResponse)
+async def aggregate_metrics_by_slice(
+    experiment_id: int,
+    group_by: List[str] = Query(..., description="Query attributes, e.g. ?group_by=complexity&group_by=device"),
+    percentiles: Optional[List[float]] = Query(None, description="Fractions in [0, 1] (settings default if omitted)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Aggregate the metrics of an experiment per slice of query attributes (complexity,
+    device, customer, ...): count, mean and percentiles of every metric per slice and
+    overall, computed server-side in one statement. Cached until its metrics are written again.
+    """
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    if percentiles is None:
+        percentiles = settings.metrics_slice_percentiles
+    try:
+        return await MetricsService.aggregate_slices(
+            db, experiment_id, list(dict.fromkeys(group_by)), percentiles
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
 # ============================================================================
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
 from src.models.query import Query
 from src.schemas.query import QueryCreate, QueryUpdate, QueryResponse
+from src.services.dataset_service import DatasetService
 
 router = APIRouter()
 
@@ -43,6 +44,8 @@ async def create_query(
     """Create a new query version"""
     db_query = Query(**query_data.dict())
     db.add(db_query)
+    await db.flush()
+    await DatasetService.capture_snapshot(db, db_query.dataset_id)
     await db.commit()
     await db.refresh(db_query)
     return db_query
@@ -130,9 +133,18 @@ async def update_query(
     if not query:
         raise HTTPException(status_code=404, detail=f"Query {query_id} not found")
 
-    for field, value in query_update.dict(exclude_unset=True).items():
+    update_data = query_update.dict(exclude_unset=True)
+    for field, value in update_data.items():
         setattr(query, field, value)
 
+    if update_data.keys() - {"obsolete"}:
+        # Stale fingerprint: the next dataset upload recomputes it from the ground truths
+        query.content_hash = None
+
+    if "obsolete" in update_data:
+        await db.flush()
+        await DatasetService.capture_snapshot(db, query.dataset_id)
+
     await db.commit()
     await db.refresh(query)
     return query
@@ -152,6 +164,8 @@ async def delete_query(
         raise HTTPException(status_code=404, detail=f"Query {query_id} not found")
 
     await db.delete(query)
+    await db.flush()
+    await DatasetService.capture_snapshot(db, query.dataset_id)
     await db.commit()
 
 # ============================================================================
\ No newline at end of file
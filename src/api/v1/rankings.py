@@ -1,15 +1,25 @@
+import logging
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.config import settings
+from src.database import get_db, async_session
+from src.models.experiment import Experiment
 from src.models.configuration import Configuration
 from src.models.ranking import Ranking
 from src.schemas.configuration import ConfigurationCreate, ConfigurationResponse
 from src.schemas.ranking import RankingResponse
-from src.schemas.ranking import RankingCreate, RankingUpdate, RankingBulkCreate
+from src.schemas.ranking import RankingCreate, RankingUpdate, RankingBulkCreate, RankingResultInput
+from src.schemas.ranking import QueryRankingInput, RankingImportProgress, RankingRelabelResponse
+from src.schemas.ranking import RankingCompactionResponse, RankingPage, QueryRankingsResponse
+from src.services.ranking_service import RankingService
+from src.utils.ndjson import iter_ndjson_models, ndjson_line, NDJSONStreamingResponse
+from src.utils.pagination import encode_cursor, decode_cursor
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -20,29 +30,74 @@ async def list_rankings(
     limit: int = 100,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get rankings with filters"""
-    query = select(Ranking)
-    
-    if experiment_id:
-        query = query.where(Ranking.experiment_id == experiment_id)
-    if query_id:
-        query = query.where(Ranking.query_id == query_id)
-    
-    query = query.order_by(Ranking.rank_position).limit(limit)
+    """Get rankings with filters (row and compact storage alike)"""
+    rankings = RankingService.ranking_rows(
+        experiment_id=experiment_id or None,
+        query_id=query_id or None
+    ).subquery()
+
+    query = select(rankings).order_by(rankings.c.rank_position).limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.mappings().all()
+
+@router.get("/experiment/{experiment_id}", response_model=RankingPage)
+async def list_experiment_rankings(
+    experiment_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Page through all rankings of an experiment ordered by (query_id, rank_position).
+
+    Pass the `next_cursor` of a page as `?cursor=` to get the next one; it is null
+    on the last page. Pages are keyset-based, so deep pages cost the same as the first.
+    """
+    try:
+        after = decode_cursor(cursor, 2)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    items, next_key = await RankingService.get_ranking_page(db, experiment_id, after=after, limit=limit)
+    return {"items": items, "next_cursor": encode_cursor(*next_key) if next_key else None}
+
+@router.get("/experiment/{experiment_id}/queries", response_model=List[QueryRankingsResponse])
+async def get_experiment_rankings_by_query(
+    experiment_id: int,
+    query_ids: List[int] = Query(..., description="Queries to fetch, e.g. ?query_ids=1&query_ids=2"),
+    top_k: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """Rankings of several queries of an experiment in one call, grouped by query"""
+    if len(query_ids) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 query_ids per request")
+    return await RankingService.get_rankings_by_query(
+        db, experiment_id, list(dict.fromkeys(query_ids)), top_k=top_k
+    )
 
 @router.post("/", response_model=RankingResponse, status_code=201)
 async def create_ranking(
     ranking: RankingCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    """Create ranking from search results"""
-    db_ranking = Ranking(**ranking.dict())
-    db.add(db_ranking)
-    await db.commit()
-    await db.refresh(db_ranking)
-    return db_ranking
+    """
+    Create ranking from search results
+
+    Stored like a one-row bulk upload: honours the experiment's ranking storage
+    and labels the row when is_relevant is omitted.
+    """
+    try:
+        rankings = await RankingService.bulk_insert_rankings(
+            db,
+            experiment_id=ranking.experiment_id,
+            query_id=ranking.query_id,
+            results=[RankingResultInput(**ranking.dict(exclude={"experiment_id", "query_id"}))]
+        )
+        await db.commit()
+        return rankings[0]
+    except ValueError as ve:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(ve))
 
 @router.patch("/{ranking_id}", response_model=RankingResponse)
 async def update_ranking(
@@ -70,21 +125,113 @@ async def bulk_create_rankings(
     bulk_data: RankingBulkCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    """Bulk create rankings"""
-    rankings = []
-    for result in bulk_data.results:
-        ranking = Ranking(
+    """
+    Bulk create the ranking of one query, in a single transaction
+
+    Written with one multi-row INSERT ... RETURNING (COPY for very large payloads).
+    """
+    try:
+        rankings = await RankingService.bulk_insert_rankings(
+            db,
             experiment_id=bulk_data.experiment_id,
             query_id=bulk_data.query_id,
-            **result
+            results=bulk_data.results
         )
-        db.add(ranking)
-        rankings.append(ranking)
-    
+        await db.commit()
+        return rankings
+    except ValueError as ve:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(ve))
+
+@router.post("/experiment/{experiment_id}/import")
+async def import_experiment_rankings(
+    experiment_id: int,
+    request: Request,
+    batch_size: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream the rankings of many queries from an NDJSON body, one query per line:
+
+        {"query_id": 1, "results": [{"rank_position": 1, "score": 0.93, "chunk_id": 42}, ...]}
+        {"query_id": 2, "results": [...]}
+
+    Rows are committed every `batch_size` rankings (default from settings) and the
+    response streams one NDJSON report per committed batch with per-query counts,
+    or a final {"error": ...} line. Batches committed before an error or a dropped
+    connection are kept; positions already stored are skipped, so the same stream
+    can be sent again (or resumed from GET .../progress) safely.
+    """
+    batch_size = batch_size or settings.ranking_import_batch_size
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive")
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+
+    async def progress():
+        # The request-scoped session may be closed before the body is streamed, use our own
+        async with async_session() as import_db:
+            try:
+                async for report in RankingService.import_rankings_in_batches(
+                        import_db,
+                        experiment_id=experiment_id,
+                        rankings=iter_ndjson_models(request.stream(), QueryRankingInput),
+                        batch_size=batch_size
+                ):
+                    yield ndjson_line(report)
+            except ValueError as ve:
+                await import_db.rollback()
+                yield ndjson_line({"error": str(ve)})
+            except Exception as e:
+                await import_db.rollback()
+                logger.exception("Error importing rankings")
+                yield ndjson_line({"error": f"Failed to import rankings: {str(e)}"})
+
+    return NDJSONStreamingResponse(progress())
+
+@router.get("/experiment/{experiment_id}/progress", response_model=RankingImportProgress)
+async def get_experiment_ranking_progress(
+    experiment_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Number of rankings stored per query of an experiment (to resume an interrupted import)"""
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    return await RankingService.get_import_progress(db, experiment_id)
+
+@router.post("/experiment/{experiment_id}/relabel", response_model=RankingRelabelResponse)
+async def relabel_experiment_rankings(
+    experiment_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Recompute is_relevant for every ranking of an experiment from the ground truths
+    of its queries (chunk filename and section), overwriting client-sent labels
+    """
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    stats = await RankingService.relabel_experiment(db, experiment_id)
     await db.commit()
-    for ranking in rankings:
-        await db.refresh(ranking)
-    
-    return rankings
+    return stats
+
+@router.post("/experiment/{experiment_id}/compact", response_model=RankingCompactionResponse)
+async def compact_experiment_rankings(
+    experiment_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Migrate an experiment to compact ranking storage: one row per query with packed
+    chunk_ids / scores / relevance arrays. Reads through GET /rankings are unchanged,
+    except that compact rankings have no id.
+    """
+    if await db.get(Experiment, experiment_id) is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    try:
+        stats = await RankingService.compact_experiment(db, experiment_id)
+        await db.commit()
+        return stats
+    except ValueError as ve:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(ve))
 
 # ============================================================================
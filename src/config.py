@@ -20,6 +20,47 @@ class Settings(BaseSettings):
     api_title: str = "RAG Experiment API"
     api_version: str = "1.0.0"
     cors_origins: List[str] = ["http://localhost:5173"]
+
+    # Dataset ingestion
+    dataset_import_batch_size: int = 1000
+    interning_cache_size: int = 100_000
+    dataset_export_page_size: int = 500
+    # Attempts of an upload transaction that hit a concurrent version conflict
+    dataset_write_max_attempts: int = 3
+
+    # Rankings: bulk uploads above this many rows are written with COPY
+    ranking_copy_threshold: int = 5000
+    # Rows per transaction of the experiment-wide NDJSON ranking import
+    ranking_import_batch_size: int = 5000
+    # Label rankings sent without is_relevant against the query's ground truths
+    ranking_auto_label: bool = True
+
+    # Metrics: cutoffs reported (as means) by the experiment-wide calculation
+    metrics_report_cutoffs: List[int] = [1, 5, 10]
+    # Percentiles of the sliced aggregation, and how many results are cached
+    metrics_slice_percentiles: List[float] = [0.25, 0.5, 0.75]
+    metrics_slice_cache_size: int = 1024
+    # Cached metric@k curves (per experiment and depth)
+    metrics_curve_cache_size: int = 256
+    # Cached per-experiment aggregates and leaderboard pages (versioned by metric writes)
+    metrics_aggregate_cache_size: int = 4096
+    # Upper bound on the age of cached metric reads, for changes no version covers
+    metrics_cache_ttl_seconds: float = 300.0
+
+    # Analytics: worker processes of the significance tests, and their resample budget
+    analytics_workers: int = 4
+    significance_max_resamples: int = 100_000
+
+    # Background jobs
+    job_workers: int = 2
+    job_poll_interval_seconds: float = 5.0
+    job_stale_after_seconds: int = 600
+    # Runs of a job that lost its worker (stale heartbeat) before it is marked FAILED
+    job_max_attempts: int = 3
+    # Refresh of a running job's updated_at, must stay well below job_stale_after_seconds
+    job_heartbeat_interval_seconds: float = 60.0
+    # Upper bound of the exponential backoff of a worker after a database error
+    job_error_backoff_max_seconds: float = 60.0
     
     @property
     def database_url(self) -> str:
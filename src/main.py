@@ -1,16 +1,35 @@
 import src.models
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.config import settings
+from src.utils.cache import cache_registry
+from src.utils.locks import lock_registry
+from src.services.dataset_service import DatasetService, DATASET_UPLOAD_JOB
+from src.services.job_service import job_runner
+from src.services.analytics_service import shutdown_resampling_pool
 from src.api.v1 import experiments, configurations, queries, datasets, documents, embeddings, rankings, metrics, \
-    blacklist, chunking, chunks, preprocessing, query_enhancement, reranking, research_strategies, vector_db
+    blacklist, chunking, chunks, preprocessing, query_enhancement, reranking, research_strategies, vector_db, jobs, \
+    analytics, leaderboard
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background jobs: register the handlers, then start the worker pool
+    job_runner.register(DATASET_UPLOAD_JOB, DatasetService.run_upload_job)
+    job_runner.start()
+    yield
+    await job_runner.stop()
+    shutdown_resampling_pool()
+
 
 app = FastAPI(
     title=settings.api_title,
     version=settings.api_version,
     docs_url=f"{settings.api_prefix}/docs",
     redoc_url=f"{settings.api_prefix}/redoc",
-    openapi_url=f"{settings.api_prefix}/openapi.json"
+    openapi_url=f"{settings.api_prefix}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS
@@ -103,6 +122,21 @@ app.include_router(
     prefix=f"{settings.api_prefix}/vector-db",
     tags=["vector-db"]
 )
+app.include_router(
+    jobs.router,
+    prefix=f"{settings.api_prefix}/jobs",
+    tags=["jobs"]
+)
+app.include_router(
+    analytics.router,
+    prefix=f"{settings.api_prefix}/analytics",
+    tags=["analytics"]
+)
+app.include_router(
+    leaderboard.router,
+    prefix=f"{settings.api_prefix}/leaderboard",
+    tags=["leaderboard"]
+)
 
 @app.get("/")
 async def root():
@@ -116,6 +150,14 @@ async def root():
 async def health():
     return {"status": "healthy", "version": settings.api_version}
 
+@app.get("/health/stats")
+async def health_stats():
+    """Process-local counters (cache hits/misses, lock waits) for monitoring"""
+    return {
+        "caches": {name: cache.stats() for name, cache in cache_registry.items()},
+        "locks": {name: lock.stats() for name, lock in lock_registry.items()}
+    }
+
 # Run with: uvicorn app.main:app --reload
 
 # ============================================================================
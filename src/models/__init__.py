@@ -4,7 +4,7 @@ from src.database import Base
 from src.models.blacklist import BlacklistChapter
 from src.models.embedding import Embedding
 from src.models.enums import ChunkingType, ConfidenceLevel, ResearchType, ComplexityQuery, ExperimentStatus, \
-    ConfidenceLevelType
+    ConfidenceLevelType, JobStatus, RankingStorage
 from src.models.ingestion_configuration import IngestionConfiguration
 from src.models.reranking import Reranking
 from src.models.chunking import Chunking
@@ -13,6 +13,7 @@ from src.models.preprocessing import Preprocessing
 from src.models.research_strategy import ResearchStrategy
 from src.models.configuration import Configuration
 from src.models.dataset import Dataset
+from src.models.dataset_snapshot import DatasetSnapshot
 from src.models.hierarchical_metadata import HierarchicalMetadata
 from src.models.chunk import Chunk
 from src.models.query import Query
@@ -21,9 +22,13 @@ from src.models.document import Document
 from src.models.knowledge_base import KnowledgeBase
 from src.models.experiment import Experiment, experiment_document_association
 from src.models.ranking import Ranking
+from src.models.ranking_compact import RankingCompact
 from src.models.metrics import Metrics
+from src.models.metrics_dirty import MetricsDirty
+from src.models.experiment_aggregate import ExperimentAggregate
 from src.models.retrieval_configuration import RetrievalConfiguration
 from src.models.vector_db import VectorDBProvider, VectorDBCollection
+from src.models.job import Job
 
 # Make all models available when importing from src.models
 __all__ = [
@@ -34,6 +39,8 @@ __all__ = [
     'ChunkingType',
     'ComplexityQuery',
     'ExperimentStatus',
+    'JobStatus',
+    'RankingStorage',
     'BlacklistChapter',
   #  'blacklist_association',
     'Embedding',
@@ -46,6 +53,7 @@ __all__ = [
     'RetrievalConfiguration',  # NEW
     'Configuration',
     'Dataset',
+    'DatasetSnapshot',
     'HierarchicalMetadata',
     'Chunk',
     'Query',
@@ -55,7 +63,11 @@ __all__ = [
     'experiment_document_association',
     'Experiment',
     'Ranking',
+    'RankingCompact',
     'Metrics',
+    'MetricsDirty',
+    'ExperimentAggregate',
     'VectorDBProvider',
     'VectorDBCollection',
+    'Job',
 ]
\ No newline at end of file
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from src.database import Base
+
+
+# Immutable list of the active (non-obsolete) query versions of a dataset at a point in time
+class DatasetSnapshot(Base):
+    __tablename__ = "dataset_snapshot"
+    __table_args__ = (
+        Index('idx_dataset_snapshot_dataset', 'dataset_id', 'id'),
+        {'schema': 'retrieval_framework'}
+    )
+
+    id = Column(Integer, primary_key=True)
+    dataset_id = Column(
+        Integer,
+        ForeignKey('retrieval_framework.dataset.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    query_count = Column(Integer, nullable=False)
+    # Parallel arrays ordered by position: query_ids[i] is the active version at position_ids[i]
+    position_ids = Column(ARRAY(Integer), nullable=False)
+    query_ids = Column(ARRAY(Integer), nullable=False)
+
+    dataset = relationship("Dataset")
@@ -119,3 +119,13 @@ class ExperimentStatus(str, enum.Enum):
     ABORTED = "ABORTED"
     CRASHED = "CRASHED"
 
+class RankingStorage(str, enum.Enum):
+    ROWS = "ROWS"  # One ranking row per rank position
+    COMPACT = "COMPACT"  # One ranking_compact row per query
+
+class JobStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
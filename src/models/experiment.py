@@ -5,7 +5,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 from src.database import Base
-from src.models import ExperimentStatus
+from src.models import ExperimentStatus, RankingStorage
 
 # Association table for many-to-many relationship between experiments and documents
 experiment_document_association = Table(
@@ -35,6 +35,8 @@ class Experiment(Base):
     configuration_id = Column(Integer, ForeignKey('retrieval_framework.configuration.id', ondelete='CASCADE'),
                               nullable=False)
     dataset_id = Column(Integer, ForeignKey('retrieval_framework.dataset.id', ondelete='CASCADE'), nullable=False)
+    dataset_snapshot_id = Column(Integer, ForeignKey('retrieval_framework.dataset_snapshot.id'), nullable=True,
+                                 comment='Active query set the experiment ran on')
     vector_db_collection_id = Column(Integer,
                                      ForeignKey('retrieval_framework.vector_db_collection.id', ondelete='RESTRICT'))
 
@@ -47,8 +49,20 @@ class Experiment(Base):
 
     error_message = Column(Text, nullable=True)  # Add this for crash details
 
+    ranking_storage = Column(
+        Enum(RankingStorage, name='ranking_storage', schema='retrieval_framework'),
+        nullable=False,
+        server_default='ROWS',
+        comment='ranking rows or one ranking_compact row per query'
+    )
+    rankings_version = Column(Integer, nullable=False, server_default='0',
+                              comment='Incremented whenever rankings of the experiment are written')
+    metrics_cutoff = Column(Integer, nullable=True,
+                            comment='Cutoff of the stored metrics, NULL for full rankings')
+
     configuration = relationship("Configuration")
     dataset = relationship("Dataset")
+    dataset_snapshot = relationship("DatasetSnapshot")
     vector_db_collection = relationship("VectorDBCollection", back_populates="experiments")
     rankings = relationship("Ranking", back_populates="experiment")
     metrics = relationship("Metrics", back_populates="experiment")
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, func
+from src.database import Base
+
+
+# Per-experiment means of the Metrics rows, refreshed whenever the experiment's metrics
+# are written; read by the configuration leaderboard
+class ExperimentAggregate(Base):
+    __tablename__ = "experiment_aggregate"
+    __table_args__ = {'schema': 'retrieval_framework'}
+
+    experiment_id = Column(
+        Integer,
+        ForeignKey('retrieval_framework.experiment.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    query_count = Column(Integer, nullable=False)
+    # Means over the experiment's queries (NULL values excluded), named like the Metrics columns
+    precision_value = Column(Float)
+    recall = Column(Float)
+    f1_score = Column(Float)
+    ndcg = Column(Float)
+    mrr = Column(Float)
+    map_value = Column(Float)
+    metrics_version = Column(Integer, nullable=False, server_default='1',
+                             comment='Incremented on every refresh')
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
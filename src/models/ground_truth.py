@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Table, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Table, DateTime, func, UniqueConstraint
 from sqlalchemy.orm import relationship
 from src.database import Base
 from src.models import ConfidenceLevel
@@ -8,7 +8,12 @@ from src.models.enums import ConfidenceLevelType
 
 class GroundTruth(Base):
     __tablename__ = "ground_truth"
-    __table_args__ = {'schema': 'retrieval_framework'}
+    __table_args__ = (
+        UniqueConstraint('filename', 'confidence', 'hierarchical_metadata_id',
+                         name='ground_truth_unique_attributes',
+                         postgresql_nulls_not_distinct=True),
+        {'schema': 'retrieval_framework'}
+    )
 
     id = Column(Integer, primary_key=True)
     filename = Column(String(255), nullable=False)
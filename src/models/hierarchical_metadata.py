@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Float, DateTime, Date, Text, ForeignKey, Enum
+    Column, Integer, String, Boolean, Float, DateTime, Date, Text, ForeignKey, Enum, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -8,7 +8,13 @@ from src.database import Base
 
 class HierarchicalMetadata(Base):
     __tablename__ = "hierarchical_metadata"
-    __table_args__ = {'schema': 'retrieval_framework'}
+    __table_args__ = (
+        # NULLS NOT DISTINCT (PostgreSQL 15+) so that partially empty sections are deduplicated too
+        UniqueConstraint('id_section', 'section_title', 'depth',
+                         name='hierarchical_metadata_unique_section',
+                         postgresql_nulls_not_distinct=True),
+        {'schema': 'retrieval_framework'}
+    )
 
     id = Column(Integer, primary_key=True)
     id_section = Column(String(255))
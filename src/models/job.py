@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from src.database import Base
+from src.models import JobStatus
+
+
+# SQLAlchemy ORM model for background jobs (long dataset uploads, ...)
+class Job(Base):
+    __tablename__ = "job"
+    __table_args__ = (
+        Index('idx_job_status_created_at', 'status', 'created_at'),
+        {'schema': 'retrieval_framework'}
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String(100), nullable=False)
+    status = Column(
+        Enum(JobStatus, name='job_status', schema='retrieval_framework'),
+        nullable=False,
+        server_default='PENDING'
+    )
+    payload = Column(JSONB, nullable=False, comment='Input of the job handler')
+    result = Column(JSONB, nullable=True, comment='Output of the job handler once SUCCEEDED')
+    error_message = Column(Text, nullable=True)
+    progress = Column(Integer, nullable=False, server_default='0')
+    total = Column(Integer, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default='0')
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Doubles as a heartbeat: RUNNING jobs that stop updating it are picked up again
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -2,6 +2,9 @@ from sqlalchemy import Column, Integer, Float, ForeignKey, UniqueConstraint, Ind
 from sqlalchemy.orm import relationship
 from src.database import Base
 
+# Metric value columns, in declaration order
+METRIC_COLUMNS = ("precision_value", "recall", "f1_score", "ndcg", "mrr", "map_value")
+
 
 class Metrics(Base):
     __tablename__ = "metrics"
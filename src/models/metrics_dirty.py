@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, func
+from src.database import Base
+
+
+# (experiment, query) pairs whose stored Metrics are stale: their ranking or the query's
+# ground truths changed since the last calculation
+class MetricsDirty(Base):
+    __tablename__ = "metrics_dirty"
+    __table_args__ = {'schema': 'retrieval_framework'}
+
+    experiment_id = Column(
+        Integer,
+        ForeignKey('retrieval_framework.experiment.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    query_id = Column(
+        Integer,
+        ForeignKey('retrieval_framework.query.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    marked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
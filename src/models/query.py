@@ -30,6 +30,7 @@ class Query(Base):
         Index('idx_query_obsolete', 'dataset_id', 'obsolete'),
         Index('idx_query_version', 'position_id', 'dataset_id', 'version'),
         Index('idx_query_created_at', 'created_at'),
+        Index('idx_query_dataset_position_version', 'dataset_id', 'position_id', 'version'),  # Export keyset
         {'schema': 'retrieval_framework'}
     )
 
@@ -52,6 +53,8 @@ class Query(Base):
    #     nullable=False
    # )
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    content_hash = Column(String(64), nullable=True,
+                          comment='SHA-256 of prompt, device, customer, complexity and ground truth signatures')
 
     # Relationships (now much simpler!)
     # Relationships - Add cascade to dataset relationship
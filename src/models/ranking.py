@@ -11,6 +11,9 @@ class Ranking(Base):
         Index('idx_ranking_chunk', 'chunk_id'),
         Index('idx_ranking_query', 'query_id'),
         Index('idx_ranking_experiment', 'experiment_id'),
+        # Keyset pages of an experiment are answered by index-only scans
+        Index('idx_ranking_experiment_query_position', 'experiment_id', 'query_id', 'rank_position',
+              postgresql_include=['chunk_id', 'score', 'is_relevant']),
         {'schema': 'retrieval_framework'}
     )
 
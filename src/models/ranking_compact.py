@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, Float, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import relationship
+from src.database import Base
+
+
+# Whole ranking of one query in one row, for experiments with RankingStorage.COMPACT
+class RankingCompact(Base):
+    __tablename__ = "ranking_compact"
+    __table_args__ = (
+        UniqueConstraint('experiment_id', 'query_id', name='ranking_compact_unique_experiment_query'),
+        {'schema': 'retrieval_framework'}
+    )
+
+    id = Column(Integer, primary_key=True)
+    experiment_id = Column(
+        Integer,
+        ForeignKey('retrieval_framework.experiment.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    query_id = Column(
+        Integer,
+        ForeignKey('retrieval_framework.query.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    # Parallel arrays: element i is rank position i + 1. Chunk ids are checked on write
+    # (arrays cannot carry foreign keys); relevance elements are NULL until labeled
+    chunk_ids = Column(ARRAY(Integer), nullable=False)
+    scores = Column(ARRAY(Float), nullable=False)
+    relevance = Column(ARRAY(Boolean), nullable=False)
+
+    experiment = relationship("Experiment")
+    query = relationship("Query")
@@ -0,0 +1,68 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class DistributionSummary(BaseModel):
+    """Distribution of a per-query value over an experiment (undefined values excluded)"""
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    p25: Optional[float] = None
+    median: Optional[float] = None
+    p75: Optional[float] = None
+    max: Optional[float] = None
+
+
+class QuerySimilarity(BaseModel):
+    query_id: int
+    overlap_at_k: float
+    jaccard: Optional[float] = None
+    rbo: float
+    kendall_tau: Optional[float] = None  # None with fewer than 2 chunks in common
+
+
+class SimilaritySummary(BaseModel):
+    overlap_at_k: DistributionSummary
+    jaccard: DistributionSummary
+    rbo: DistributionSummary
+    kendall_tau: DistributionSummary
+
+
+class ExperimentSimilarityResponse(BaseModel):
+    """How much the rankings moved between two experiments on the same dataset"""
+    experiment_a: int
+    experiment_b: int
+    k: int
+    rbo_p: float
+    queries_compared: int
+    queries_only_in_a: int
+    queries_only_in_b: int
+    summary: SimilaritySummary
+    queries: List[QuerySimilarity]
+
+
+class PairedComparison(BaseModel):
+    """Paired tests of metric B - A over the queries scored by both experiments"""
+    experiment_a: int
+    experiment_b: int
+    metric: str
+    queries: int
+    mean_a: Optional[float] = None
+    mean_b: Optional[float] = None
+    mean_difference: Optional[float] = None
+    ci_low: Optional[float] = None
+    ci_high: Optional[float] = None
+    bootstrap_p_value: Optional[float] = None
+    randomization_p_value: Optional[float] = None
+
+
+class ExperimentSignificanceResponse(BaseModel):
+    experiment_ids: List[int]
+    metrics: List[str]
+    resamples: int
+    confidence: float
+    seed: int
+    comparisons: List[PairedComparison]
+
+# ============================================================================
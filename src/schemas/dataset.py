@@ -1,6 +1,6 @@
-from datetime import date
+from datetime import date, datetime
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 
 class DatasetBase(BaseModel):
@@ -47,6 +47,46 @@ class DatasetCreateResponse(DatasetResponse):
     ground_truths_added: int = 0
 
 
+class QueryChangeReport(BaseModel):
+    """Change that an upload would apply at one position"""
+    position_id: int
+    change: Literal["added", "updated"]
+    current_version: Optional[int] = None
+    new_version: int
+
+
+class DatasetDiffResponse(BaseModel):
+    """Dry-run report of what an upload would change, nothing is written"""
+    dataset_name: str
+    dataset_id: Optional[int] = None  # None if the dataset does not exist yet
+    dry_run: bool = True
+    queries_added: int = 0
+    queries_updated: int = 0
+    queries_unchanged: int = 0
+    changes: List[QueryChangeReport] = Field(default_factory=list)
+
+
+class DatasetSnapshotResponse(BaseModel):
+    """Snapshot metadata, without the query list"""
+    id: int
+    dataset_id: int
+    created_at: datetime
+    query_count: int
+
+    class Config:
+        from_attributes = True
+
+
+class SnapshotQuery(BaseModel):
+    position_id: int
+    query_id: int
+
+
+class DatasetSnapshotDetailResponse(DatasetSnapshotResponse):
+    """Snapshot with its (position_id, query_id) pairs"""
+    queries: List[SnapshotQuery]
+
+
 # Import for forward reference resolution
 from src.schemas.query import QueryInput
 DatasetCreate.model_rebuild()
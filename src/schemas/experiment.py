@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
-from src.models import ExperimentStatus
+from src.models import ExperimentStatus, RankingStorage
 
 
 class ExperimentBase(BaseModel):
@@ -9,6 +9,8 @@ class ExperimentBase(BaseModel):
     configuration_id: int
     dataset_id: int
     vector_db_collection_id: Optional[int] = None
+    dataset_snapshot_id: Optional[int] = None  # Defaults to the latest snapshot of the dataset
+    ranking_storage: RankingStorage = RankingStorage.ROWS
 
 
 class ExperimentCreate(ExperimentBase):
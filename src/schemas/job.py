@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Dict, Any
+from src.models import JobStatus
+
+
+class JobResponse(BaseModel):
+    id: int
+    job_type: str
+    status: JobStatus
+    progress: int
+    total: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+        use_enum_values = True
+
+# ============================================================================
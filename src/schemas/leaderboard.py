@@ -0,0 +1,28 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class LeaderboardEntry(BaseModel):
+    """A configuration, represented by its best experiment on the dataset"""
+    rank: int
+    configuration_id: int
+    configuration_name: str
+    experiment_id: int
+    experiments: int  # Experiments of this configuration with a value for the metric
+    score: float
+    query_count: int
+    metrics_version: int
+
+
+class LeaderboardResponse(BaseModel):
+    dataset_id: int
+    metric: str
+    total: int
+    items: List[LeaderboardEntry]
+
+
+class LeaderboardRebuildResponse(BaseModel):
+    experiments_refreshed: int
+
+# ============================================================================
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class MetricsBase(BaseModel):
     precision_value: Optional[float] = None
@@ -22,4 +22,50 @@ class MetricsResponse(MetricsBase):
     class Config:
         from_attributes = True
 
+class MetricsAverages(BaseModel):
+    precision_value: Optional[float] = None
+    recall: Optional[float] = None
+    f1_score: Optional[float] = None
+    ndcg: Optional[float] = None
+    mrr: Optional[float] = None
+    map_value: Optional[float] = None
+
+class ExperimentMetricsCalculation(BaseModel):
+    experiment_id: int
+    k: Optional[int] = None
+    queries_computed: int
+    at_k: Dict[int, MetricsAverages] = {}
+
+class MetricsRecomputeResponse(BaseModel):
+    experiments_recomputed: int
+    pairs_recomputed: int
+    pairs_removed: int
+
+class MetricDistribution(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+
+class MetricsSlice(BaseModel):
+    key: Dict[str, Any]
+    count: int
+    metrics: Dict[str, MetricDistribution]
+
+class SlicedMetricsResponse(BaseModel):
+    experiment_id: int
+    group_by: List[str]
+    percentiles: List[float]
+    overall: MetricsSlice
+    slices: List[MetricsSlice]
+
+class MetricCurvesResponse(BaseModel):
+    """Mean of each metric at k = 1..max_k (index k - 1), None where undefined"""
+    experiment_id: int
+    max_k: int
+    query_count: int
+    precision: List[Optional[float]]
+    recall: List[Optional[float]]
+    hit_rate: List[Optional[float]]
+    ndcg: List[Optional[float]]
+
 # ============================================================================
@@ -12,20 +12,61 @@ class RankingBase(BaseModel):
     experiment_id: int
 
 class RankingCreate(RankingBase):
-    pass
+    rank_position: int = Field(..., ge=1, description="1-based position of the chunk in the ranking")
 
 class RankingUpdate(BaseModel):
     is_relevant: Optional[bool] = None
 
+class RankingResultInput(BaseModel):
+    """One retrieved chunk of a bulk ranking upload"""
+    rank_position: int = Field(..., ge=1, description="1-based position of the chunk in the ranking")
+    score: float
+    is_relevant: Optional[bool] = None
+    chunk_id: int
+
 class RankingBulkCreate(BaseModel):
     experiment_id: int
     query_id: int
-    results: List[dict]
+    results: List[RankingResultInput]
+
+class QueryRankingInput(BaseModel):
+    """One line of an experiment-wide NDJSON ranking import: the ranking of one query"""
+    query_id: int
+    results: List[RankingResultInput]
+
+class QueryRankingCount(BaseModel):
+    query_id: int
+    rows: int
+
+class RankingImportProgress(BaseModel):
+    """Rankings already stored for an experiment, per query"""
+    experiment_id: int
+    total_rows: int
+    queries: List[QueryRankingCount]
+
+class RankingRelabelResponse(BaseModel):
+    experiment_id: int
+    rankings_labeled: int
+    relevant: int
+
+class RankingCompactionResponse(BaseModel):
+    experiment_id: int
+    queries_compacted: int
+    rows_compacted: int
 
 class RankingResponse(RankingBase):
-    id: int
+    id: Optional[int] = None  # None for rankings of experiments with compact storage
     
     class Config:
         from_attributes = True
 
+class RankingPage(BaseModel):
+    """One keyset page of an experiment's rankings, ordered by (query_id, rank_position)"""
+    items: List[RankingResponse]
+    next_cursor: Optional[str] = None  # None on the last page
+
+class QueryRankingsResponse(BaseModel):
+    query_id: int
+    rankings: List[RankingResponse]
+
 # ============================================================================
@@ -0,0 +1,349 @@
+# Business logic for cross-experiment analytics (ranking similarity, significance tests)
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.experiment import Experiment
+from src.models.metrics import Metrics, METRIC_COLUMNS
+from src.services.ranking_service import RankingService, RankedList
+from src.utils.resampling import paired_resampling
+
+SIMILARITY_METRICS = ("overlap_at_k", "jaccard", "rbo", "kendall_tau")
+
+# Upper bound of block_size * k * k booleans materialized at once by the pairwise comparisons
+SIMILARITY_BLOCK_CELLS = 4_000_000
+
+# Worker processes of the resampling tests, started on first use
+_resampling_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_resampling_pool() -> ProcessPoolExecutor:
+    """Process pool of the significance tests (spawned workers, see utils.resampling)"""
+    global _resampling_pool
+    if _resampling_pool is None:
+        _resampling_pool = ProcessPoolExecutor(
+            max_workers=settings.analytics_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _resampling_pool
+
+
+def shutdown_resampling_pool() -> None:
+    """Stop the worker processes, if started"""
+    global _resampling_pool
+    if _resampling_pool is not None:
+        _resampling_pool.shutdown(cancel_futures=True)
+        _resampling_pool = None
+
+
+class AnalyticsService:
+    """Service layer for analytics operations"""
+
+    @staticmethod
+    def top_k_matrix(rankings: List[RankedList], k: int, pad: int) -> np.ndarray:
+        """
+        Stack the first k distinct chunk ids of each ranking into an (n, k) int64 matrix
+        (a chunk ranked twice keeps its best position)
+
+        Args:
+            rankings: One ranked list per row
+            k: Depth
+            pad: Filler for rankings shorter than k (must not be a chunk id)
+        """
+        matrix = np.full((len(rankings), k), pad, dtype=np.int64)
+        for row, ranking in enumerate(rankings):
+            top = list(dict.fromkeys(ranking.chunk_ids))[:k]
+            matrix[row, :len(top)] = top
+        return matrix
+
+    @staticmethod
+    def ranking_similarity(a: np.ndarray, b: np.ndarray, rbo_p: float = 0.9) -> Dict[str, np.ndarray]:
+        """
+        Per-row similarity of two (n, k) top-k matrices, vectorized over rows.
+
+        Rows are compared in blocks: for each block a (rows, k, k) boolean matrix marks
+        where a[i] == b[j], and every metric is a reduction of it:
+            overlap_at_k: |A ∩ B| / k
+            jaccard: |A ∩ B| / |A ∪ B|
+            rbo: extrapolated rank-biased overlap (Webber et al. 2010) at depth k,
+                from the prefix overlaps X_d; a match (i, j) counts from depth max(i, j)
+            kendall_tau: tau over the chunks present in both lists (NaN if fewer than 2)
+
+        Chunk ids must be distinct within a row. Padding must differ between ``a`` and
+        ``b`` (e.g. -1 and -2) and never match.
+
+        Returns:
+            Mapping of metric name to an (n,) float array
+        """
+        n, k = a.shape
+        results = {name: np.empty(n, dtype=np.float64) for name in SIMILARITY_METRICS}
+        if n == 0:
+            return results
+
+        positions = np.arange(k)
+        # one_hot_depth[i * k + j, d] is 1 when a match at (i, j) first counts at depth d
+        one_hot_depth = (np.maximum.outer(positions, positions).reshape(-1)[:, None] == positions).astype(np.float64)
+        depths = positions + 1.0
+        rbo_weights = ((1 - rbo_p) / rbo_p) * rbo_p ** depths / depths
+        lengths_a = (a >= 0).sum(axis=1)
+        lengths_b = (b >= 0).sum(axis=1)
+        earlier = positions[:, None] < positions[None, :]
+
+        block_size = max(1, SIMILARITY_BLOCK_CELLS // (k * k))
+        for start in range(0, n, block_size):
+            block = slice(start, start + block_size)
+            matches = a[block, :, None] == b[block, None, :]
+
+            overlap = matches.sum(axis=(1, 2)).astype(np.float64)
+            results["overlap_at_k"][block] = overlap / k
+            union = lengths_a[block] + lengths_b[block] - overlap
+            with np.errstate(invalid="ignore", divide="ignore"):
+                results["jaccard"][block] = np.where(union > 0, overlap / union, np.nan)
+
+            prefix_overlap = np.cumsum(matches.reshape(matches.shape[0], -1) @ one_hot_depth, axis=1)
+            results["rbo"][block] = (
+                prefix_overlap @ rbo_weights + prefix_overlap[:, -1] / k * rbo_p ** k
+            )
+
+            # Position in b of the chunk at each position of a (-1 when absent from b)
+            matched = matches.any(axis=2)
+            b_position = np.where(matched, matches.argmax(axis=2), -1)
+            pairs = matched[:, :, None] & matched[:, None, :] & earlier
+            concordant = (pairs & (b_position[:, :, None] < b_position[:, None, :])).sum(axis=(1, 2))
+            discordant = (pairs & (b_position[:, :, None] > b_position[:, None, :])).sum(axis=(1, 2))
+            compared = concordant + discordant
+            with np.errstate(invalid="ignore", divide="ignore"):
+                results["kendall_tau"][block] = np.where(
+                    compared > 0, (concordant - discordant) / compared, np.nan
+                )
+        return results
+
+    @staticmethod
+    def summarize(values: np.ndarray) -> Dict[str, Optional[float]]:
+        """Distribution summary of one metric, NaNs (undefined values) excluded"""
+        defined = values[~np.isnan(values)]
+        if defined.size == 0:
+            return {"count": 0, "mean": None, "std": None, "min": None,
+                    "p25": None, "median": None, "p75": None, "max": None}
+        p25, median, p75 = np.percentile(defined, [25, 50, 75])
+        return {
+            "count": int(defined.size),
+            "mean": float(defined.mean()),
+            "std": float(defined.std()),
+            "min": float(defined.min()),
+            "p25": float(p25),
+            "median": float(median),
+            "p75": float(p75),
+            "max": float(defined.max())
+        }
+
+    @staticmethod
+    async def check_same_dataset(db: AsyncSession, experiment_ids: Sequence[int]) -> None:
+        """
+        Raises:
+            ValueError: unknown experiments or experiments on different datasets
+        """
+        result = await db.execute(
+            select(Experiment.id, Experiment.dataset_id)
+            .where(Experiment.id.in_(experiment_ids))
+        )
+        datasets = {row.id: row.dataset_id for row in result}
+        for experiment_id in experiment_ids:
+            if experiment_id not in datasets:
+                raise ValueError(f"Experiment {experiment_id} not found")
+        if len(set(datasets.values())) > 1:
+            raise ValueError("Experiments must be run on the same dataset")
+
+    @staticmethod
+    async def compare_experiments(
+            db: AsyncSession,
+            experiment_a: int,
+            experiment_b: int,
+            k: int = 10,
+            rbo_p: float = 0.9
+    ) -> Dict[str, Any]:
+        """
+        Compare the rankings of two experiments on the same dataset, query by query
+
+        Each experiment's rankings are read with one bulk fetch; queries ranked by only
+        one of them are counted but not compared.
+
+        Args:
+            db: Database session
+            experiment_a: Reference experiment
+            experiment_b: Experiment compared to the reference
+            k: Depth of the comparison
+            rbo_p: Persistence of rank-biased overlap (0 < p < 1)
+
+        Returns:
+            Per-query metrics ordered by query id and a summary per metric
+
+        Raises:
+            ValueError: unknown experiments or experiments on different datasets
+        """
+        await AnalyticsService.check_same_dataset(db, [experiment_a, experiment_b])
+        rankings_a = await RankingService.load_rankings(db, experiment_a)
+        rankings_b = await RankingService.load_rankings(db, experiment_b)
+        query_ids = sorted(rankings_a.keys() & rankings_b.keys())
+
+        metrics = AnalyticsService.ranking_similarity(
+            AnalyticsService.top_k_matrix([rankings_a[q] for q in query_ids], k, pad=-1),
+            AnalyticsService.top_k_matrix([rankings_b[q] for q in query_ids], k, pad=-2),
+            rbo_p=rbo_p
+        )
+
+        def value(array: np.ndarray, row: int) -> Optional[float]:
+            return None if np.isnan(array[row]) else float(array[row])
+
+        return {
+            "experiment_a": experiment_a,
+            "experiment_b": experiment_b,
+            "k": k,
+            "rbo_p": rbo_p,
+            "queries_compared": len(query_ids),
+            "queries_only_in_a": len(rankings_a.keys() - rankings_b.keys()),
+            "queries_only_in_b": len(rankings_b.keys() - rankings_a.keys()),
+            "summary": {name: AnalyticsService.summarize(metrics[name]) for name in SIMILARITY_METRICS},
+            "queries": [
+                {"query_id": query_id, **{name: value(metrics[name], row) for name in SIMILARITY_METRICS}}
+                for row, query_id in enumerate(query_ids)
+            ]
+        }
+
+    @staticmethod
+    async def paired_tests(
+            differences: np.ndarray,
+            resamples: int,
+            confidence: float,
+            seed: np.random.SeedSequence
+    ) -> Dict[str, Optional[float]]:
+        """
+        Paired bootstrap and randomization tests of the mean of ``differences``.
+
+        The resamples are split across the process pool, each worker with its own
+        generator spawned from ``seed``, so results are reproducible for a given seed
+        and worker count.
+
+        Returns:
+            mean_difference, the bootstrap percentile confidence interval (ci_low,
+            ci_high) and the two-sided p-values of both tests (add-one estimates)
+        """
+        if differences.size == 0:
+            return {"mean_difference": None, "ci_low": None, "ci_high": None,
+                    "bootstrap_p_value": None, "randomization_p_value": None}
+
+        workers = max(1, min(settings.analytics_workers, resamples))
+        shares = [resamples // workers + (1 if i < resamples % workers else 0) for i in range(workers)]
+        loop = asyncio.get_running_loop()
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(get_resampling_pool(), paired_resampling, differences, share, child_seed)
+            for share, child_seed in zip(shares, seed.spawn(workers))
+        ])
+        bootstrap = np.concatenate([part[0] for part in parts])
+        randomization = np.concatenate([part[1] for part in parts])
+
+        observed = float(differences.mean())
+        alpha = 1 - confidence
+        ci_low, ci_high = np.percentile(bootstrap, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+        # Tolerance against floating-point ties with the observed statistic
+        extreme = abs(observed) - 1e-12
+        return {
+            "mean_difference": observed,
+            "ci_low": float(ci_low),
+            "ci_high": float(ci_high),
+            # Bootstrap distribution shifted to the null hypothesis (mean difference 0)
+            "bootstrap_p_value": float((np.sum(np.abs(bootstrap - observed) >= extreme) + 1) / (resamples + 1)),
+            "randomization_p_value": float((np.sum(np.abs(randomization) >= extreme) + 1) / (resamples + 1))
+        }
+
+    @staticmethod
+    async def compare_significance(
+            db: AsyncSession,
+            experiment_ids: Sequence[int],
+            metrics: Sequence[str],
+            resamples: int = 10_000,
+            confidence: float = 0.95,
+            seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Paired significance tests between every pair of experiments on the same dataset
+
+        The per-query Metrics rows of all experiments are read in one query and aligned
+        by query id; each pair is tested on the queries where both have a value.
+
+        Args:
+            db: Database session
+            experiment_ids: Two or more experiments, compared pairwise in this order
+            metrics: Metrics columns to test
+            resamples: Number of bootstrap and randomization resamples per test
+            confidence: Level of the bootstrap confidence intervals
+            seed: Seed of the resampling (random if None, returned in the result)
+
+        Returns:
+            One comparison per (pair, metric): means of both experiments and the
+            outcome of the tests on B - A
+
+        Raises:
+            ValueError: fewer than two experiments, unknown metric, unknown
+                experiments or experiments on different datasets
+        """
+        experiment_ids = list(dict.fromkeys(experiment_ids))
+        if len(experiment_ids) < 2:
+            raise ValueError("At least two distinct experiments are required")
+        unknown = [name for name in metrics if name not in METRIC_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)} (expected among {', '.join(METRIC_COLUMNS)})")
+        await AnalyticsService.check_same_dataset(db, experiment_ids)
+
+        result = await db.execute(
+            select(Metrics.experiment_id, Metrics.query_id, *[Metrics.__table__.c[name] for name in metrics])
+            .where(Metrics.experiment_id.in_(experiment_ids))
+        )
+        rows = result.all()
+        query_ids = sorted({row.query_id for row in rows})
+        column_of = {query_id: column for column, query_id in enumerate(query_ids)}
+        row_of = {experiment_id: row for row, experiment_id in enumerate(experiment_ids)}
+
+        # values[metric][experiment row, query column], NaN where missing or NULL
+        values = {name: np.full((len(experiment_ids), len(query_ids)), np.nan) for name in metrics}
+        for row in rows:
+            for name in metrics:
+                value = getattr(row, name)
+                if value is not None:
+                    values[name][row_of[row.experiment_id], column_of[row.query_id]] = value
+
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2 ** 63)
+        pairs = [(a, b, name) for a, b in combinations(range(len(experiment_ids)), 2) for name in metrics]
+        seeds = np.random.SeedSequence(seed).spawn(len(pairs))
+
+        async def compare(a: int, b: int, name: str, pair_seed: np.random.SeedSequence) -> Dict[str, Any]:
+            paired = ~np.isnan(values[name][a]) & ~np.isnan(values[name][b])
+            values_a, values_b = values[name][a][paired], values[name][b][paired]
+            return {
+                "experiment_a": experiment_ids[a],
+                "experiment_b": experiment_ids[b],
+                "metric": name,
+                "queries": int(paired.sum()),
+                "mean_a": float(values_a.mean()) if paired.any() else None,
+                "mean_b": float(values_b.mean()) if paired.any() else None,
+                **await AnalyticsService.paired_tests(values_b - values_a, resamples, confidence, pair_seed)
+            }
+
+        return {
+            "experiment_ids": experiment_ids,
+            "metrics": list(metrics),
+            "resamples": resamples,
+            "confidence": confidence,
+            "seed": seed,
+            "comparisons": await asyncio.gather(*[
+                compare(a, b, name, pair_seed) for (a, b, name), pair_seed in zip(pairs, seeds)
+            ])
+        }
@@ -1,17 +1,58 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
 from datetime import date
-from typing import List, Optional, Tuple, Dict, Set
-from sqlalchemy import select, and_, func
+from typing import List, Optional, Tuple, Dict, Set, Iterable, Any, AsyncIterator, Callable, Awaitable
+from sqlalchemy import select, and_, func, any_, literal, insert, update, bindparam, tuple_, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert, aggregate_order_by
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from src.models.dataset import Dataset
-from src.models.query import Query
+from src.models.dataset_snapshot import DatasetSnapshot
+from src.models.query import Query, query_ground_truth_association
 from src.models.ground_truth import GroundTruth
 from src.models.hierarchical_metadata import HierarchicalMetadata
 from src.models import ConfidenceLevel
 from src.schemas.ground_truth import GroundTruthInput
 from src.schemas.hierarchical_metadata import HierarchicalMetadataInput
+from src.schemas.dataset import DatasetCreate
 from src.schemas.query import QueryInput
+from src.utils.cache import InterningCache
+from src.utils.locks import AdvisoryLock
+from src.utils.sql import int_array
+from src.config import settings
+
+# Job type of background dataset uploads, see JobRunner
+DATASET_UPLOAD_JOB = "dataset_upload"
+
+# Natural keys used to resolve hierarchical metadata and ground truths in bulk
+MetadataKey = Tuple[Optional[str], Optional[str], Optional[int]]
+GroundTruthKey = Tuple[str, ConfidenceLevel, Optional[int]]
+
+
+@dataclass
+class QueryChangeSet:
+    """Outcome of comparing incoming queries with the latest stored versions"""
+    latest_versions: Dict[int, Any]
+    fingerprints: Dict[int, str]
+    added: List[QueryInput] = field(default_factory=list)
+    updated: List[QueryInput] = field(default_factory=list)
+    unchanged: List[QueryInput] = field(default_factory=list)
+    # Legacy versions without a stored fingerprint that were found unchanged
+    fingerprint_backfill: Dict[int, str] = field(default_factory=dict)
+
+
+# Unique constraints a concurrent writer of the same dataset can trip; the transaction is retried
+RETRYABLE_CONSTRAINTS = ("query_unique_position_dataset_version", "dataset_dataset_name_key")
+
+# Serializes writes to the same dataset across API workers
+dataset_write_lock = AdvisoryLock("dataset_write", namespace=1)
+
+# Process-local interning of natural key -> id, shared by every request of this worker
+hierarchical_metadata_cache = InterningCache("hierarchical_metadata", settings.interning_cache_size)
+ground_truth_cache = InterningCache("ground_truth", settings.interning_cache_size)
 
 
 class DatasetService:
@@ -22,7 +63,12 @@ class DatasetService:
             db: AsyncSession,
             dataset_name: str
     ) -> Tuple[Dataset, bool]:
-        """Get existing dataset by name or create new one"""
+        """
+        Get existing dataset by name or create new one
+
+        Race-safe: a concurrent creation of the same name makes the INSERT wait for the
+        other transaction and then do nothing, and the dataset is read back instead.
+        """
         result = await db.execute(
             select(Dataset).where(Dataset.dataset_name == dataset_name)
         )
@@ -31,14 +77,28 @@ class DatasetService:
         if existing_dataset:
             return existing_dataset, False
 
-        new_dataset = Dataset(
-            dataset_name=dataset_name,
-            data_creation=date.today(),
-            data_update=None
+        result = await db.execute(
+            pg_insert(Dataset)
+            .values(dataset_name=dataset_name, data_creation=date.today(), data_update=None)
+            .on_conflict_do_nothing(index_elements=[Dataset.dataset_name])
+            .returning(Dataset.id)
         )
-        db.add(new_dataset)
-        await db.flush()
-        return new_dataset, True
+        created_id = result.scalar_one_or_none()
+
+        result = await db.execute(
+            select(Dataset).where(Dataset.dataset_name == dataset_name)
+        )
+        return result.scalar_one(), created_id is not None
+
+    @staticmethod
+    async def lock_dataset(db: AsyncSession, dataset_id: int) -> None:
+        """
+        Serialize writers of a dataset until the current transaction ends.
+
+        Reads issued after the lock see every version committed by the previous
+        holder, so version numbers computed from them cannot collide.
+        """
+        await dataset_write_lock.acquire(db, dataset_id)
 
     @staticmethod
     async def update_dataset_timestamp(db: AsyncSession, dataset: Dataset) -> None:
@@ -127,6 +187,63 @@ class DatasetService:
             return f"{ground_truth.filename}|{confidence_value}|{hm.id_section}|{hm.section_title}|{hm.depth}"
         return f"{ground_truth.filename}|{confidence_value}|None|None|None"
 
+    @staticmethod
+    def _create_ground_truth_signature_from_row(row: Any) -> str:
+        """
+        Create a unique signature for a ground truth from a flat result row
+
+        Args:
+            row: Row with filename, confidence, id_section, section_title and depth columns
+
+        Returns:
+            String signature representing the ground truth
+        """
+        confidence_value = row.confidence.value if isinstance(row.confidence, ConfidenceLevel) else str(
+            row.confidence)
+        return f"{row.filename}|{confidence_value}|{row.id_section}|{row.section_title}|{row.depth}"
+
+    @staticmethod
+    def compute_query_fingerprint(
+            prompt: str,
+            device: Optional[str],
+            customer: Optional[str],
+            complexity: Any,
+            ground_truth_signatures: Iterable[str]
+    ) -> str:
+        """
+        Compute the canonical content digest stored in Query.content_hash
+
+        Args:
+            prompt: Query prompt
+            device: Query device
+            customer: Query customer
+            complexity: ComplexityQuery member or its value
+            ground_truth_signatures: Signatures of the query's ground truths (order and duplicates ignored)
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        canonical = json.dumps(
+            [prompt, device, customer, getattr(complexity, "value", complexity), sorted(set(ground_truth_signatures))],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def compute_query_input_fingerprint(query_input: QueryInput) -> str:
+        """Compute the content digest of an incoming query"""
+        return DatasetService.compute_query_fingerprint(
+            query_input.prompt,
+            query_input.device,
+            query_input.customer,
+            query_input.complexity,
+            (
+                DatasetService._create_ground_truth_signature(gt.filename, gt.confidence, gt.hierarchical_metadata)
+                for gt in query_input.ground_truths
+            )
+        )
+
     @staticmethod
     def has_ground_truths_changed(
             existing_query: Query,
@@ -162,29 +279,47 @@ class DatasetService:
         return existing_signatures != new_signatures
 
     @staticmethod
-    def has_query_changed(
-            existing_query: Query,
+    def has_query_attributes_changed(
+            existing_query: Any,
             query_input: QueryInput
     ) -> bool:
         """
-        Check if query attributes or ground truths have changed (synchronous function)
+        Check if the scalar attributes of a query have changed
 
         Args:
-            existing_query: Existing query from database
+            existing_query: Query object or row exposing prompt, device, customer and complexity
             query_input: New query input data
 
         Returns:
-            True if attributes or ground truths changed, False otherwise
+            True if any attribute changed, False otherwise
         """
-        # Check if basic attributes changed
-        attributes_changed = (
+        return (
                 existing_query.prompt != query_input.prompt or
                 existing_query.device != query_input.device or
                 existing_query.customer != query_input.customer or
                 existing_query.complexity.value != query_input.complexity.value
         )
 
-        if attributes_changed:
+    @staticmethod
+    def has_query_changed(
+            existing_query: Query,
+            query_input: QueryInput
+    ) -> bool:
+        """
+        Check if query attributes or ground truths have changed (synchronous function)
+
+        Args:
+            existing_query: Existing query from database (ground_truths only needed without content_hash)
+            query_input: New query input data
+
+        Returns:
+            True if attributes or ground truths changed, False otherwise
+        """
+        if existing_query.content_hash is not None:
+            return existing_query.content_hash != DatasetService.compute_query_input_fingerprint(query_input)
+
+        # Check if basic attributes changed
+        if DatasetService.has_query_attributes_changed(existing_query, query_input):
             return True
 
         # Check if ground truths changed
@@ -203,28 +338,9 @@ class DatasetService:
             metadata_id: Optional[int]
     ) -> GroundTruth:
         """Create or find existing ground truth by attributes"""
-        result = await db.execute(
-            select(GroundTruth).where(
-                and_(
-                    GroundTruth.filename == filename,
-                    GroundTruth.confidence == confidence,
-                    GroundTruth.hierarchical_metadata_id == metadata_id
-                )
-            )
-        )
-        existing_gt = result.scalar_one_or_none()
-
-        if existing_gt:
-            return existing_gt
-
-        new_gt = GroundTruth(
-            filename=filename,
-            confidence=confidence,
-            hierarchical_metadata_id=metadata_id
-        )
-        db.add(new_gt)
-        await db.flush()
-        return new_gt
+        key = (filename, confidence, metadata_id)
+        ground_truth_ids = await DatasetService.bulk_resolve_ground_truths(db, [key])
+        return await db.get(GroundTruth, ground_truth_ids[key])
 
     @staticmethod
     async def create_or_update_hierarchical_metadata(
@@ -235,101 +351,411 @@ class DatasetService:
         if not metadata_input:
             return None
 
-        # Handle comparison with None values properly
-        query_conditions = []
+        key = (metadata_input.id_section, metadata_input.section_title, metadata_input.depth)
+        metadata_ids = await DatasetService.bulk_resolve_hierarchical_metadata(db, [key])
+        return metadata_ids[key]
+
+    @staticmethod
+    async def associate_ground_truths_with_query(
+            db: AsyncSession,
+            query: Query,
+            ground_truths_input: List[GroundTruthInput]
+    ) -> int:
+        """Associate ground truths with a query version"""
+        ground_truth_ids = await DatasetService.resolve_ground_truth_inputs(
+            db, {query.id: ground_truths_input}
+        )
+        if not ground_truth_ids[query.id]:
+            return 0
+
+        # Ground truths that are already associated are skipped by the primary key
+        result = await db.execute(
+            pg_insert(query_ground_truth_association)
+            .on_conflict_do_nothing()
+            .returning(query_ground_truth_association.c.ground_truth_id),
+            [{"query_id": query.id, "ground_truth_id": gt_id} for gt_id in ground_truth_ids[query.id]]
+        )
+        count = len(result.all())
+
+        if count:
+            # The stored fingerprint no longer covers every ground truth
+            await db.execute(
+                update(Query)
+                .where(Query.id == query.id)
+                .values(content_hash=None)
+                .execution_options(synchronize_session=False)
+            )
+        return count
+
+    @staticmethod
+    async def validate_query_ids(queries_input: List[QueryInput]) -> None:
+        """Validate that position IDs are unique"""
+        if not queries_input:
+            return
+
+        position_ids = [q.position_id for q in queries_input]
+
+        if len(position_ids) != len(set(position_ids)):
+            raise ValueError("Duplicate position IDs found in input")
 
-        if metadata_input.id_section is not None:
-            query_conditions.append(HierarchicalMetadata.id_section == metadata_input.id_section)
-        else:
-            query_conditions.append(HierarchicalMetadata.id_section.is_(None))
+    @staticmethod
+    async def fetch_latest_query_versions(
+            db: AsyncSession,
+            dataset_id: int,
+            position_ids: List[int]
+    ) -> Dict[int, Any]:
+        """
+        Fetch the latest version of every given position in a single statement
 
-        if metadata_input.section_title is not None:
-            query_conditions.append(HierarchicalMetadata.section_title == metadata_input.section_title)
-        else:
-            query_conditions.append(HierarchicalMetadata.section_title.is_(None))
+        Args:
+            db: Database session
+            dataset_id: Dataset the positions belong to
+            position_ids: Positions to look up
 
-        if metadata_input.depth is not None:
-            query_conditions.append(HierarchicalMetadata.depth == metadata_input.depth)
-        else:
-            query_conditions.append(HierarchicalMetadata.depth.is_(None))
+        Returns:
+            Mapping of position_id to a row with the scalar columns of its latest version
+        """
+        if not position_ids:
+            return {}
 
         result = await db.execute(
-            select(HierarchicalMetadata).where(and_(*query_conditions))
+            select(
+                Query.id,
+                Query.position_id,
+                Query.version,
+                Query.prompt,
+                Query.device,
+                Query.customer,
+                Query.complexity,
+                Query.content_hash
+            )
+            .where(
+                and_(
+                    Query.dataset_id == dataset_id,
+                    Query.position_id == any_(int_array(position_ids))
+                )
+            )
+            .distinct(Query.position_id)
+            .order_by(Query.position_id, Query.version.desc())
         )
-        existing_metadata = result.scalar_one_or_none()
+        return {row.position_id: row for row in result}
+
+    @staticmethod
+    async def fetch_ground_truth_signatures(
+            db: AsyncSession,
+            query_ids: List[int]
+    ) -> Dict[int, Set[str]]:
+        """
+        Fetch the ground truth signatures of many query versions in a single statement
 
-        if existing_metadata:
-            return existing_metadata.id
+        Args:
+            db: Database session
+            query_ids: Query versions to look up
 
-        new_metadata = HierarchicalMetadata(
-            id_section=metadata_input.id_section,
-            section_title=metadata_input.section_title,
-            depth=metadata_input.depth,
+        Returns:
+            Mapping of query_id to the set of its ground truth signatures
+        """
+        signatures: Dict[int, Set[str]] = {query_id: set() for query_id in query_ids}
+        if not query_ids:
+            return signatures
+
+        result = await db.execute(
+            select(
+                query_ground_truth_association.c.query_id,
+                GroundTruth.filename,
+                GroundTruth.confidence,
+                HierarchicalMetadata.id_section,
+                HierarchicalMetadata.section_title,
+                HierarchicalMetadata.depth
+            )
+            .join(GroundTruth, GroundTruth.id == query_ground_truth_association.c.ground_truth_id)
+            .outerjoin(HierarchicalMetadata, HierarchicalMetadata.id == GroundTruth.hierarchical_metadata_id)
+            .where(query_ground_truth_association.c.query_id == any_(int_array(query_ids)))
         )
-        db.add(new_metadata)
-        await db.flush()
-        return new_metadata.id
+        for row in result:
+            signatures[row.query_id].add(DatasetService._create_ground_truth_signature_from_row(row))
+        return signatures
 
     @staticmethod
-    async def associate_ground_truths_with_query(
+    async def bulk_resolve_hierarchical_metadata(
             db: AsyncSession,
-            query: Query,
-            ground_truths_input: List[GroundTruthInput]
-    ) -> int:
-        """Associate ground truths with a query version"""
-        count = 0
+            metadata_keys: Iterable[MetadataKey]
+    ) -> Dict[MetadataKey, int]:
+        """
+        Find or create many hierarchical metadata rows.
+
+        Keys found in the interning cache cost no round trip; the others are resolved
+        with one INSERT ... ON CONFLICT ... RETURNING, which is safe against
+        concurrent workers thanks to the unique constraint.
+
+        Args:
+            db: Database session
+            metadata_keys: (id_section, section_title, depth) tuples to resolve
+
+        Returns:
+            Mapping of each key to its hierarchical metadata id
+        """
+        resolved: Dict[MetadataKey, int] = {}
+        misses: Set[MetadataKey] = set()
+        for key in set(metadata_keys):
+            metadata_id = hierarchical_metadata_cache.lookup(db, key)
+            if metadata_id is None:
+                misses.add(key)
+            else:
+                resolved[key] = metadata_id
+        if not misses:
+            return resolved
+
+        table = HierarchicalMetadata.__table__
+        stmt = pg_insert(table)
+        # A no-op update (instead of DO NOTHING) makes RETURNING yield pre-existing rows as well
+        stmt = stmt.on_conflict_do_update(
+            constraint='hierarchical_metadata_unique_section',
+            set_={'depth': stmt.excluded.depth}
+        ).returning(table.c.id, table.c.id_section, table.c.section_title, table.c.depth)
 
-        # First, we need to get the query with its ground_truths relationship loaded
-        # This is CRITICAL to avoid lazy loading issues
         result = await db.execute(
-            select(Query)
-            .options(selectinload(Query.ground_truths))
-            .where(Query.id == query.id)
+            stmt,
+            [
+                {"id_section": id_section, "section_title": section_title, "depth": depth}
+                # Same row order in every transaction: concurrent upserts cannot deadlock
+                for id_section, section_title, depth in sorted(misses, key=repr)
+            ]
         )
-        query_with_gts = result.scalar_one()
+        for row in result:
+            key = (row.id_section, row.section_title, row.depth)
+            hierarchical_metadata_cache.stage(db, key, row.id)
+            resolved[key] = row.id
+        return resolved
 
-        # Get existing ground truth IDs to check for duplicates
-        existing_gt_ids = {gt.id for gt in query_with_gts.ground_truths}
+    @staticmethod
+    async def bulk_resolve_ground_truths(
+            db: AsyncSession,
+            ground_truth_keys: Iterable[GroundTruthKey]
+    ) -> Dict[GroundTruthKey, int]:
+        """
+        Find or create many ground truths, going through the interning cache first
+        and resolving the misses with one INSERT ... ON CONFLICT ... RETURNING
 
-        for gt_input in ground_truths_input:
-            metadata_id = await DatasetService.create_or_update_hierarchical_metadata(
-                db, gt_input.hierarchical_metadata
+        Args:
+            db: Database session
+            ground_truth_keys: (filename, confidence, hierarchical_metadata_id) tuples to resolve
+
+        Returns:
+            Mapping of each key to its ground truth id
+        """
+        resolved: Dict[GroundTruthKey, int] = {}
+        misses: Set[GroundTruthKey] = set()
+        for key in set(ground_truth_keys):
+            ground_truth_id = ground_truth_cache.lookup(db, key)
+            if ground_truth_id is None:
+                misses.add(key)
+            else:
+                resolved[key] = ground_truth_id
+        if not misses:
+            return resolved
+
+        table = GroundTruth.__table__
+        stmt = pg_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            constraint='ground_truth_unique_attributes',
+            set_={'filename': stmt.excluded.filename}
+        ).returning(table.c.id, table.c.filename, table.c.confidence, table.c.hierarchical_metadata_id)
+
+        result = await db.execute(
+            stmt,
+            [
+                {"filename": filename, "confidence": confidence, "hierarchical_metadata_id": metadata_id}
+                for filename, confidence, metadata_id in sorted(misses, key=repr)
+            ]
+        )
+        for row in result:
+            key = (row.filename, row.confidence, row.hierarchical_metadata_id)
+            ground_truth_cache.stage(db, key, row.id)
+            resolved[key] = row.id
+        return resolved
+
+    @staticmethod
+    async def resolve_ground_truth_inputs(
+            db: AsyncSession,
+            ground_truths_by_owner: Dict[Any, List[GroundTruthInput]]
+    ) -> Dict[Any, List[int]]:
+        """
+        Resolve the ground truth ids of many groups of inputs with at most one statement per table
+
+        Args:
+            db: Database session
+            ground_truths_by_owner: Ground truth inputs grouped by an arbitrary key (e.g. position_id)
+
+        Returns:
+            Mapping of each group key to its de-duplicated ground truth ids
+        """
+        def metadata_key(gt_input: GroundTruthInput) -> Optional[MetadataKey]:
+            metadata = gt_input.hierarchical_metadata
+            if metadata is None:
+                return None
+            return metadata.id_section, metadata.section_title, metadata.depth
+
+        metadata_ids = await DatasetService.bulk_resolve_hierarchical_metadata(
+            db,
+            (
+                key
+                for inputs in ground_truths_by_owner.values()
+                for key in map(metadata_key, inputs)
+                if key is not None
             )
+        )
 
-            ground_truth = await DatasetService.create_or_find_ground_truth(
-                db,
-                filename=gt_input.filename,
-                confidence=gt_input.confidence,
-                metadata_id=metadata_id
+        def ground_truth_key(gt_input: GroundTruthInput) -> GroundTruthKey:
+            key = metadata_key(gt_input)
+            return gt_input.filename, gt_input.confidence, metadata_ids[key] if key is not None else None
+
+        ground_truth_ids = await DatasetService.bulk_resolve_ground_truths(
+            db,
+            (ground_truth_key(gt) for inputs in ground_truths_by_owner.values() for gt in inputs)
+        )
+
+        return {
+            owner: list(dict.fromkeys(ground_truth_ids[ground_truth_key(gt)] for gt in inputs))
+            for owner, inputs in ground_truths_by_owner.items()
+        }
+
+    @staticmethod
+    async def classify_queries(
+            db: AsyncSession,
+            dataset_id: Optional[int],
+            queries_input: List[QueryInput]
+    ) -> QueryChangeSet:
+        """
+        Split incoming queries into added, updated and unchanged ones without writing anything.
+
+        Versions with a stored content_hash are compared by digest alone, with no
+        relationship loading; ground truths are only fetched for legacy versions
+        that predate the fingerprint and whose attributes did not change.
+
+        Args:
+            db: Database session
+            dataset_id: Dataset to compare against, None if it does not exist yet
+            queries_input: Incoming queries
+
+        Returns:
+            QueryChangeSet with the latest versions, the incoming fingerprints and the split
+        """
+        latest_versions = {}
+        if dataset_id is not None:
+            latest_versions = await DatasetService.fetch_latest_query_versions(
+                db, dataset_id, [q.position_id for q in queries_input]
             )
+        change_set = QueryChangeSet(
+            latest_versions=latest_versions,
+            fingerprints={
+                q.position_id: DatasetService.compute_query_input_fingerprint(q) for q in queries_input
+            }
+        )
 
-            # Check if this ground truth is already associated
-            if ground_truth.id not in existing_gt_ids:
-                query_with_gts.ground_truths.append(ground_truth)
-                existing_gt_ids.add(ground_truth.id)
-                count += 1
+        legacy_candidates = [
+            latest_versions[q.position_id].id
+            for q in queries_input
+            if q.position_id in latest_versions
+            and latest_versions[q.position_id].content_hash is None
+            and not DatasetService.has_query_attributes_changed(latest_versions[q.position_id], q)
+        ]
+        legacy_signatures = await DatasetService.fetch_ground_truth_signatures(db, legacy_candidates)
 
-        await db.flush()
-        return count
+        for query_input in queries_input:
+            latest_query = latest_versions.get(query_input.position_id)
+            fingerprint = change_set.fingerprints[query_input.position_id]
+
+            if latest_query is None:
+                change_set.added.append(query_input)
+            elif latest_query.content_hash is not None:
+                if latest_query.content_hash == fingerprint:
+                    change_set.unchanged.append(query_input)
+                else:
+                    change_set.updated.append(query_input)
+            elif latest_query.id in legacy_signatures:
+                existing_fingerprint = DatasetService.compute_query_fingerprint(
+                    latest_query.prompt,
+                    latest_query.device,
+                    latest_query.customer,
+                    latest_query.complexity,
+                    legacy_signatures[latest_query.id]
+                )
+                if existing_fingerprint == fingerprint:
+                    change_set.unchanged.append(query_input)
+                    change_set.fingerprint_backfill[latest_query.id] = fingerprint
+                else:
+                    change_set.updated.append(query_input)
+            else:
+                change_set.updated.append(query_input)
+
+        return change_set
 
     @staticmethod
-    async def validate_query_ids(queries_input: List[QueryInput]) -> None:
-        """Validate that position IDs are unique"""
-        if not queries_input:
-            return
+    async def diff_dataset(
+            db: AsyncSession,
+            dataset_name: str,
+            queries_input: List[QueryInput]
+    ) -> Dict[str, Any]:
+        """
+        Report what process_dataset_with_queries would do, without writing anything
 
-        position_ids = [q.position_id for q in queries_input]
+        Args:
+            db: Database session (only read from)
+            dataset_name: Dataset the upload targets
+            queries_input: Incoming queries
 
-        if len(position_ids) != len(set(position_ids)):
-            raise ValueError("Duplicate position IDs found in input")
+        Returns:
+            Counters and the per-position list of added/updated queries, ordered by position
+        """
+        await DatasetService.validate_query_ids(queries_input)
+
+        result = await db.execute(
+            select(Dataset.id).where(Dataset.dataset_name == dataset_name)
+        )
+        dataset_id = result.scalar_one_or_none()
+
+        change_set = await DatasetService.classify_queries(db, dataset_id, queries_input)
+
+        changes = [
+            {"position_id": q.position_id, "change": "added", "current_version": None, "new_version": 1}
+            for q in change_set.added
+        ]
+        for q in change_set.updated:
+            current_version = change_set.latest_versions[q.position_id].version
+            changes.append({
+                "position_id": q.position_id,
+                "change": "updated",
+                "current_version": current_version,
+                "new_version": current_version + 1
+            })
+        changes.sort(key=lambda change: change["position_id"])
+
+        return {
+            "dataset_name": dataset_name,
+            "dataset_id": dataset_id,
+            "queries_added": len(change_set.added),
+            "queries_updated": len(change_set.updated),
+            "queries_unchanged": len(change_set.unchanged),
+            "changes": changes
+        }
 
     @staticmethod
     async def process_dataset_with_queries(
             db: AsyncSession,
             dataset_name: str,
-            queries_input: List[QueryInput]
+            queries_input: List[QueryInput],
+            snapshot: bool = True
     ) -> Dict[str, int]:
-        """Process dataset creation/update with queries and ground truths"""
+        """
+        Process dataset creation/update with queries and ground truths.
+
+        Works set-based: the latest versions (with their content fingerprints), the metadata
+        and ground truth upserts, the new query versions and their associations are each
+        handled by a single statement, whatever the number of queries. A modifying call
+        captures a dataset snapshot unless ``snapshot`` is False (batched imports take a
+        single one at the end).
+        """
         stats = {
             "dataset_id": 0,
             "queries_added": 0,
@@ -342,85 +768,339 @@ class DatasetService:
 
         dataset, is_new = await DatasetService.get_or_create_dataset(db, dataset_name)
         stats["dataset_id"] = dataset.id
+        await DatasetService.lock_dataset(db, dataset.id)
 
-        dataset_modified = False
+        if not queries_input:
+            return stats
 
-        for query_input in queries_input:
-            # Get latest query version with ground truths eagerly loaded
-            result = await db.execute(
+        change_set = await DatasetService.classify_queries(db, dataset.id, queries_input)
+        latest_versions = change_set.latest_versions
+
+        if change_set.fingerprint_backfill:
+            await db.execute(
+                update(Query.__table__)
+                .where(Query.__table__.c.id == bindparam("query_id"))
+                .values(content_hash=bindparam("fingerprint")),
+                [
+                    {"query_id": query_id, "fingerprint": fingerprint}
+                    for query_id, fingerprint in change_set.fingerprint_backfill.items()
+                ]
+            )
+
+        queries_to_write = change_set.added + change_set.updated
+        obsolete_query_ids = [latest_versions[q.position_id].id for q in change_set.updated]
+        stats["queries_added"] = len(change_set.added)
+        stats["queries_updated"] = len(change_set.updated)
+
+        if not queries_to_write:
+            return stats
+
+        if obsolete_query_ids:
+            await db.execute(
+                update(Query)
+                .where(Query.id == any_(int_array(obsolete_query_ids)))
+                .values(obsolete=True)
+                .execution_options(synchronize_session=False)
+            )
+            stats["queries_marked_obsolete"] = len(obsolete_query_ids)
+
+        ground_truth_ids = await DatasetService.resolve_ground_truth_inputs(
+            db, {q.position_id: q.ground_truths for q in queries_to_write}
+        )
+
+        result = await db.execute(
+            insert(Query.__table__).returning(Query.__table__.c.id, Query.__table__.c.position_id),
+            [
+                {
+                    "position_id": q.position_id,
+                    "dataset_id": dataset.id,
+                    "version": latest_versions[q.position_id].version + 1 if q.position_id in latest_versions else 1,
+                    "prompt": q.prompt,
+                    "device": q.device,
+                    "customer": q.customer,
+                    "complexity": q.complexity,
+                    "obsolete": False,
+                    "content_hash": change_set.fingerprints[q.position_id]
+                }
+                for q in queries_to_write
+            ]
+        )
+        new_query_ids = {row.position_id: row.id for row in result}
+
+        associations = [
+            {"query_id": new_query_ids[position_id], "ground_truth_id": gt_id}
+            for position_id, gt_ids in ground_truth_ids.items()
+            for gt_id in gt_ids
+        ]
+        if associations:
+            await db.execute(insert(query_ground_truth_association), associations)
+        stats["ground_truths_added"] = len(associations)
+
+        await DatasetService.update_dataset_timestamp(db, dataset)
+        if snapshot:
+            await DatasetService.capture_snapshot(db, dataset.id)
+        return stats
+
+    @staticmethod
+    async def process_dataset_with_retry(
+            db: AsyncSession,
+            dataset_name: str,
+            queries_input: List[QueryInput],
+            snapshot: bool = True
+    ) -> Dict[str, int]:
+        """
+        Run process_dataset_with_queries and commit, retrying on a concurrent version conflict.
+
+        Writers of the same dataset are serialized by lock_dataset, so a conflict only comes
+        from a writer that bypassed the lock (e.g. a direct POST /queries); the whole
+        transaction is then rolled back and replayed against the new latest versions,
+        at most settings.dataset_write_max_attempts times.
+
+        Args:
+            db: Database session, committed on success and rolled back on failure
+            dataset_name: Dataset to create or update
+            queries_input: Incoming queries
+            snapshot: Capture a dataset snapshot if the dataset is modified
+
+        Returns:
+            Stats of the committed attempt
+        """
+        attempt = 1
+        while True:
+            try:
+                stats = await DatasetService.process_dataset_with_queries(
+                    db, dataset_name, queries_input, snapshot=snapshot
+                )
+                await db.commit()
+                return stats
+            except IntegrityError as e:
+                await db.rollback()
+                retryable = any(name in str(e.orig) for name in RETRYABLE_CONSTRAINTS)
+                if not retryable or attempt >= settings.dataset_write_max_attempts:
+                    raise
+                dataset_write_lock.conflict_retries += 1
+                attempt += 1
+
+    @staticmethod
+    async def capture_snapshot(db: AsyncSession, dataset_id: int) -> int:
+        """
+        Materialize the current active query set of a dataset as an immutable snapshot.
+
+        Runs as a single INSERT ... SELECT, the (position_id, query_id) pairs never
+        leave the database.
+
+        Args:
+            db: Database session
+            dataset_id: Dataset to snapshot
+
+        Returns:
+            Id of the new snapshot
+        """
+        active = (
+            select(
+                literal(dataset_id).label("dataset_id"),
+                func.count(Query.id).label("query_count"),
+                func.coalesce(
+                    func.array_agg(aggregate_order_by(Query.position_id, Query.position_id)),
+                    literal([], ARRAY(Integer))
+                ).label("position_ids"),
+                func.coalesce(
+                    func.array_agg(aggregate_order_by(Query.id, Query.position_id)),
+                    literal([], ARRAY(Integer))
+                ).label("query_ids")
+            )
+            .where(
+                and_(
+                    Query.dataset_id == dataset_id,
+                    Query.obsolete == False
+                )
+            )
+        )
+        result = await db.execute(
+            insert(DatasetSnapshot)
+            .from_select(["dataset_id", "query_count", "position_ids", "query_ids"], active)
+            .returning(DatasetSnapshot.id)
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    def snapshot_to_dict(snapshot: DatasetSnapshot) -> Dict[str, Any]:
+        """Expand the parallel arrays of a snapshot into (position_id, query_id) pairs"""
+        return {
+            "id": snapshot.id,
+            "dataset_id": snapshot.dataset_id,
+            "created_at": snapshot.created_at,
+            "query_count": snapshot.query_count,
+            "queries": [
+                {"position_id": position_id, "query_id": query_id}
+                for position_id, query_id in zip(snapshot.position_ids, snapshot.query_ids)
+            ]
+        }
+
+    @staticmethod
+    async def get_latest_snapshot_id(db: AsyncSession, dataset_id: int) -> Optional[int]:
+        """Return the most recent snapshot of a dataset, if any"""
+        result = await db.execute(
+            select(func.max(DatasetSnapshot.id)).where(DatasetSnapshot.dataset_id == dataset_id)
+        )
+        return result.scalar()
+
+    @staticmethod
+    async def import_queries_in_batches(
+            db: AsyncSession,
+            dataset_name: str,
+            queries: AsyncIterator[QueryInput],
+            batch_size: int
+    ) -> AsyncIterator[Dict[str, int]]:
+        """
+        Import a stream of queries into a dataset, committing every ``batch_size`` queries.
+
+        Each batch goes through process_dataset_with_queries, so versioning matches a
+        regular upload; batches committed before a failure are kept. A single dataset
+        snapshot is captured once the stream ends (or fails) if any batch modified the
+        dataset, instead of one per batch.
+
+        Args:
+            db: Database session, committed after every batch
+            dataset_name: Dataset to create or update
+            queries: Queries to import, consumed lazily
+            batch_size: Number of queries per transaction
+
+        Yields:
+            Cumulative stats after each committed batch
+        """
+        totals = {
+            "dataset_id": 0,
+            "queries_processed": 0,
+            "batches_committed": 0,
+            "queries_added": 0,
+            "queries_updated": 0,
+            "queries_marked_obsolete": 0,
+            "ground_truths_added": 0
+        }
+        seen_positions: Set[int] = set()
+        batch: List[QueryInput] = []
+
+        async def commit_batch() -> None:
+            stats = await DatasetService.process_dataset_with_retry(db, dataset_name, batch, snapshot=False)
+            totals["dataset_id"] = stats.pop("dataset_id")
+            for key, value in stats.items():
+                totals[key] += value
+            totals["queries_processed"] += len(batch)
+            totals["batches_committed"] += 1
+            batch.clear()
+
+        async def commit_snapshot() -> None:
+            if totals["queries_added"] + totals["queries_updated"] == 0:
+                return
+            await DatasetService.lock_dataset(db, totals["dataset_id"])
+            await DatasetService.capture_snapshot(db, totals["dataset_id"])
+            await db.commit()
+
+        try:
+            async for query_input in queries:
+                # Duplicates inside a batch are caught by validate_query_ids, across batches here
+                if query_input.position_id in seen_positions:
+                    raise ValueError(f"Duplicate position ID {query_input.position_id} found in input")
+                seen_positions.add(query_input.position_id)
+
+                batch.append(query_input)
+                if len(batch) >= batch_size:
+                    await commit_batch()
+                    yield dict(totals)
+
+            if batch or totals["batches_committed"] == 0:
+                await commit_batch()
+                yield dict(totals)
+        except Exception:
+            # Still snapshot the batches committed before the failure
+            await db.rollback()
+            await commit_snapshot()
+            raise
+
+        await commit_snapshot()
+
+    @staticmethod
+    async def run_upload_job(
+            db: AsyncSession,
+            payload: Dict[str, Any],
+            report_progress: Callable[[int, Optional[int]], Awaitable[None]]
+    ) -> Dict[str, int]:
+        """
+        Job handler for background dataset uploads.
+
+        Processes a DatasetCreate payload in committed batches, so a job resumed after a
+        worker restart skips the batches already stored (they are detected as unchanged).
+
+        Returns:
+            Cumulative stats of the upload
+        """
+        dataset = DatasetCreate.model_validate(payload)
+        total = len(dataset.queries)
+        await report_progress(0, total)
+
+        async def queries() -> AsyncIterator[QueryInput]:
+            for query_input in dataset.queries:
+                yield query_input
+
+        totals: Dict[str, int] = {}
+        async for totals in DatasetService.import_queries_in_batches(
+                db,
+                dataset_name=dataset.dataset_name,
+                queries=queries(),
+                batch_size=settings.dataset_import_batch_size
+        ):
+            await report_progress(totals["queries_processed"], total)
+        return totals
+
+    @staticmethod
+    async def iter_dataset_query_pages(
+            db: AsyncSession,
+            dataset_id: int,
+            obsolete: Optional[bool] = None,
+            after: Optional[Tuple[int, int]] = None,
+            page_size: int = 500
+    ) -> AsyncIterator[List[Query]]:
+        """
+        Page through the queries of a dataset ordered by (position_id, version).
+
+        Uses a keyset on (position_id, version) instead of OFFSET, and loads the ground
+        truths of each page in one batch. Pages are expunged from the session once the
+        caller resumes iteration, so memory stays bounded by the page size.
+
+        Args:
+            db: Database session
+            dataset_id: Dataset to export
+            obsolete: Optional filter on the obsolete flag
+            after: (position_id, version) of the last query already received
+            page_size: Number of queries per page
+
+        Yields:
+            Lists of Query objects with ground_truths and their metadata loaded
+        """
+        while True:
+            stmt = (
                 select(Query)
                 .options(
                     selectinload(Query.ground_truths).selectinload(GroundTruth.hierarchical_metadata)
                 )
-                .where(
-                    and_(
-                        Query.position_id == query_input.position_id,
-                        Query.dataset_id == dataset.id
-                    )
-                )
-                .order_by(Query.version.desc())
-                .limit(1)
+                .where(Query.dataset_id == dataset_id)
+                .order_by(Query.position_id, Query.version)
+                .limit(page_size)
             )
-            latest_query = result.scalar_one_or_none()
-
-            if latest_query:
-                # Check if query or ground truths changed
-                if DatasetService.has_query_changed(latest_query, query_input):
-                    # Mark old version as obsolete
-                    latest_query.obsolete = True
-                    stats["queries_marked_obsolete"] += 1
-
-                    # Create new version
-                    next_version = await DatasetService.get_next_version(
-                        db, query_input.position_id, dataset.id
-                    )
-
-                    new_query = Query(
-                        position_id=query_input.position_id,
-                        dataset_id=dataset.id,
-                        version=next_version,
-                        prompt=query_input.prompt,
-                        device=query_input.device,
-                        customer=query_input.customer,
-                        complexity=query_input.complexity,
-                        obsolete=False
-                    )
-                    db.add(new_query)
-                    await db.flush()  # Flush to get the ID
-
-                    gt_count = await DatasetService.associate_ground_truths_with_query(
-                        db, new_query, query_input.ground_truths
-                    )
-                    stats["ground_truths_added"] += gt_count
-                    stats["queries_updated"] += 1
-                    dataset_modified = True
-                else:
-                    # Query and ground truths haven't changed - do nothing
-                    pass
-            else:
-                # Create first version
-                new_query = Query(
-                    position_id=query_input.position_id,
-                    dataset_id=dataset.id,
-                    version=1,
-                    prompt=query_input.prompt,
-                    device=query_input.device,
-                    customer=query_input.customer,
-                    complexity=query_input.complexity,
-                    obsolete=False
-                )
-                db.add(new_query)
-                await db.flush()  # Flush to get the ID
+            if obsolete is not None:
+                stmt = stmt.where(Query.obsolete == obsolete)
+            if after is not None:
+                stmt = stmt.where(tuple_(Query.position_id, Query.version) > tuple_(*after))
 
-                gt_count = await DatasetService.associate_ground_truths_with_query(
-                    db, new_query, query_input.ground_truths
-                )
-                stats["ground_truths_added"] += gt_count
-                stats["queries_added"] += 1
-                dataset_modified = True
+            result = await db.execute(stmt)
+            page = list(result.scalars().all())
+            if not page:
+                return
 
-        if dataset_modified:
-            await DatasetService.update_dataset_timestamp(db, dataset)
+            yield page
 
-        await db.flush()
-        return stats
\ No newline at end of file
+            after = (page[-1].position_id, page[-1].version)
+            db.expunge_all()
+            if len(page) < page_size:
+                return
@@ -0,0 +1,223 @@
+# Background job runner for long operations (large dataset uploads, ...)
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, or_, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import async_session
+from src.models import JobStatus
+from src.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# report_progress(progress, total) persists the progress of the running job
+ProgressCallback = Callable[[int, Optional[int]], Awaitable[None]]
+# handler(db, payload, report_progress) -> result stored on the job
+JobHandler = Callable[[AsyncSession, Dict[str, Any], ProgressCallback], Awaitable[Dict[str, Any]]]
+
+
+class JobRunner:
+    """
+    Bounded pool of asyncio workers processing jobs persisted in the job table.
+
+    Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several API workers
+    can share the table. While a job runs its updated_at is refreshed every
+    job_heartbeat_interval_seconds; a RUNNING job whose heartbeat is older than
+    job_stale_after_seconds (its worker died) is claimed again, so handlers must
+    be safe to re-run. A stale job that already ran job_max_attempts times (e.g. it
+    keeps killing its worker) is marked FAILED instead. Database errors of a worker
+    are logged and retried with an exponential backoff instead of ending the worker.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        """Register the coroutine that processes jobs of ``job_type``"""
+        self._handlers[job_type] = handler
+
+    async def submit(
+            self,
+            db: AsyncSession,
+            job_type: str,
+            payload: Dict[str, Any],
+            total: Optional[int] = None
+    ) -> Job:
+        """
+        Persist a new PENDING job and wake up a worker
+
+        Args:
+            db: Database session, committed so the job is visible to the workers
+            job_type: Registered job type
+            payload: JSON-serializable handler input
+            total: Optional number of work units, for progress reporting
+
+        Returns:
+            The created job
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job = Job(job_type=job_type, payload=payload, total=total)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        self._wakeup.set()
+        return job
+
+    def start(self) -> None:
+        """Spawn the worker tasks (also picks up jobs left over by a previous run)"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks; interrupted jobs are resumed after their heartbeat expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        failures = 0
+        while True:
+            try:
+                job_id = await self._claim_next()
+                if job_id is None:
+                    await self._wait_for_jobs(settings.job_poll_interval_seconds)
+                else:
+                    await self._run(job_id)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                failures += 1
+                backoff = min(
+                    settings.job_poll_interval_seconds * 2 ** (failures - 1),
+                    settings.job_error_backoff_max_seconds
+                )
+                logger.exception("Job worker error (attempt %d), retrying in %.1fs", failures, backoff)
+                await asyncio.sleep(backoff)
+
+    async def _wait_for_jobs(self, timeout: float) -> None:
+        """Sleep until a job is submitted or ``timeout`` elapses"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _claim_next(self) -> Optional[int]:
+        """Atomically move the oldest runnable job to RUNNING and return its id"""
+        async with async_session() as db:
+            stale_before = func.now() - timedelta(seconds=settings.job_stale_after_seconds)
+            stale = and_(
+                Job.job_type.in_(list(self._handlers)),
+                Job.status == JobStatus.RUNNING,
+                Job.updated_at < stale_before
+            )
+            exhausted = (
+                select(Job.id)
+                .where(stale, Job.attempts >= settings.job_max_attempts)
+                .with_for_update(skip_locked=True)
+            )
+            result = await db.execute(
+                update(Job)
+                .where(Job.id.in_(exhausted.scalar_subquery()))
+                .values(
+                    status=JobStatus.FAILED,
+                    error_message=f"Worker lost {settings.job_max_attempts} times, giving up",
+                    finished_at=func.now(),
+                    updated_at=func.now()
+                )
+                .returning(Job.id)
+                .execution_options(synchronize_session=False)
+            )
+            for failed_id in result.scalars():
+                logger.error("Job %d failed: worker lost %d times", failed_id, settings.job_max_attempts)
+
+            result = await db.execute(
+                select(Job.id)
+                .where(
+                    Job.job_type.in_(list(self._handlers)),
+                    or_(
+                        Job.status == JobStatus.PENDING,
+                        and_(stale, Job.attempts < settings.job_max_attempts)
+                    )
+                )
+                .order_by(Job.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job_id = result.scalar_one_or_none()
+            if job_id is None:
+                await db.commit()
+                return None
+
+            await db.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(
+                    status=JobStatus.RUNNING,
+                    started_at=func.now(),
+                    updated_at=func.now(),
+                    attempts=Job.attempts + 1
+                )
+            )
+            await db.commit()
+            return job_id
+
+    @staticmethod
+    async def _update_job(job_id: int, **values: Any) -> None:
+        async with async_session() as db:
+            await db.execute(
+                update(Job).where(Job.id == job_id).values(updated_at=func.now(), **values)
+            )
+            await db.commit()
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Keep a running job's updated_at fresh, so it is not claimed as stale"""
+        while True:
+            await asyncio.sleep(settings.job_heartbeat_interval_seconds)
+            try:
+                await self._update_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Heartbeat of job %d failed", job_id)
+
+    async def _run(self, job_id: int) -> None:
+        async def report_progress(progress: int, total: Optional[int] = None) -> None:
+            values = {"progress": progress}
+            if total is not None:
+                values["total"] = total
+            await self._update_job(job_id, **values)
+
+        try:
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                async with async_session() as db:
+                    job = await db.get(Job, job_id)
+                    handler = self._handlers[job.job_type]
+                    result = await handler(db, job.payload, report_progress)
+            finally:
+                heartbeat.cancel()
+            await self._update_job(
+                job_id, status=JobStatus.SUCCEEDED, result=result, error_message=None, finished_at=func.now()
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Job %d failed", job_id)
+            await self._update_job(
+                job_id, status=JobStatus.FAILED, error_message=str(e), finished_at=func.now()
+            )
+
+
+job_runner = JobRunner(settings.job_workers)
@@ -0,0 +1,228 @@
+# Business logic for the configuration leaderboard (materialized per-experiment aggregates)
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select, func, any_
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.configuration import Configuration
+from src.models.experiment import Experiment
+from src.models.experiment_aggregate import ExperimentAggregate
+from src.models.metrics import Metrics, METRIC_COLUMNS
+from src.utils.cache import CoalescingCache
+from src.utils.sql import int_array
+
+# Aggregate and leaderboard reads, keyed by the metrics_version of the experiments they
+# read (bumped by refresh_aggregates, which every metric write goes through)
+aggregate_cache = CoalescingCache(
+    "metrics_aggregates", settings.metrics_aggregate_cache_size, settings.metrics_cache_ttl_seconds
+)
+
+
+class LeaderboardService:
+    """Service layer for leaderboard operations"""
+
+    @staticmethod
+    async def refresh_aggregates(db: AsyncSession, experiment_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recompute the experiment_aggregate rows of these experiments from their Metrics
+        rows with one INSERT ... SELECT ... ON CONFLICT DO UPDATE, bumping metrics_version.
+
+        Experiments without metrics get a row with query_count 0. Nothing is committed.
+
+        Args:
+            db: Database session
+            experiment_ids: Experiments to refresh (every experiment if None)
+
+        Returns:
+            Number of experiments refreshed
+        """
+        experiment = Experiment.__table__
+        metrics = Metrics.__table__
+        aggregate = ExperimentAggregate.__table__
+
+        source = (
+            select(
+                experiment.c.id,
+                func.count(metrics.c.id),
+                *[func.avg(metrics.c[name]) for name in METRIC_COLUMNS]
+            )
+            .select_from(experiment.outerjoin(metrics, metrics.c.experiment_id == experiment.c.id))
+            .group_by(experiment.c.id)
+        )
+        if experiment_ids is not None:
+            source = source.where(experiment.c.id == any_(int_array(experiment_ids)))
+
+        stmt = pg_insert(aggregate).from_select(["experiment_id", "query_count", *METRIC_COLUMNS], source)
+        result = await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[aggregate.c.experiment_id],
+                set_={
+                    "query_count": stmt.excluded.query_count,
+                    **{name: stmt.excluded[name] for name in METRIC_COLUMNS},
+                    "metrics_version": aggregate.c.metrics_version + 1,
+                    "updated_at": func.now()
+                }
+            )
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def get_metrics_version(db: AsyncSession, experiment_id: int) -> Optional[int]:
+        """metrics_version of an experiment (None if its aggregate was never refreshed)"""
+        result = await db.execute(
+            select(ExperimentAggregate.metrics_version).where(ExperimentAggregate.experiment_id == experiment_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_dataset_version(db: AsyncSession, dataset_id: int) -> Optional[str]:
+        """
+        Fingerprint of the (experiment_id, metrics_version) pairs of a dataset's aggregates:
+        it changes whenever one of them is refreshed, added or deleted
+        """
+        aggregate = ExperimentAggregate.__table__
+        experiment = Experiment.__table__
+        pair = func.concat(aggregate.c.experiment_id, ":", aggregate.c.metrics_version)
+        result = await db.execute(
+            select(func.md5(func.string_agg(pair, aggregate_order_by(",", aggregate.c.experiment_id))))
+            .select_from(aggregate.join(experiment, experiment.c.id == aggregate.c.experiment_id))
+            .where(experiment.c.dataset_id == dataset_id)
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_leaderboard(
+            db: AsyncSession,
+            dataset_id: int,
+            metric: str,
+            skip: int = 0,
+            limit: int = 50
+    ) -> Dict[str, Any]:
+        """
+        Rank the configurations evaluated on a dataset by a metric (higher is better)
+
+        Each configuration is represented by its best experiment (DISTINCT ON over the
+        materialized aggregates, the most recent experiment on ties); experiments without
+        a value for the metric are ignored. Pages are cached per dataset version (see
+        get_dataset_version); configuration names are always read fresh.
+
+        Args:
+            db: Database session
+            dataset_id: Dataset the experiments ran on
+            metric: Metrics column to rank by
+            skip: Number of configurations to skip
+            limit: Maximum number of configurations to return
+
+        Returns:
+            Total number of ranked configurations and the requested page
+
+        Raises:
+            ValueError: unknown metric
+        """
+        if metric not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown metric '{metric}' (expected among {', '.join(METRIC_COLUMNS)})")
+        version = await LeaderboardService.get_dataset_version(db, dataset_id)
+        page = await aggregate_cache.get_or_compute(
+            ("leaderboard", dataset_id, version, metric, skip, limit),
+            lambda: LeaderboardService._read_leaderboard(db, dataset_id, metric, skip, limit)
+        )
+        if not page["items"]:
+            return page
+
+        configuration = Configuration.__table__
+        result = await db.execute(
+            select(configuration.c.id, configuration.c.name)
+            .where(configuration.c.id == any_(int_array(item["configuration_id"] for item in page["items"])))
+        )
+        names = dict(result.all())
+        return {
+            **page,
+            "items": [
+                {**item, "configuration_name": names.get(item["configuration_id"], item["configuration_name"])}
+                for item in page["items"]
+            ]
+        }
+
+    @staticmethod
+    async def _read_leaderboard(
+            db: AsyncSession,
+            dataset_id: int,
+            metric: str,
+            skip: int,
+            limit: int
+    ) -> Dict[str, Any]:
+        """Uncached get_leaderboard"""
+        aggregate = ExperimentAggregate.__table__
+        experiment = Experiment.__table__
+        score = aggregate.c[metric]
+        best = (
+            select(
+                experiment.c.configuration_id,
+                aggregate.c.experiment_id,
+                score.label("score"),
+                aggregate.c.query_count,
+                aggregate.c.metrics_version,
+                func.count().over(partition_by=experiment.c.configuration_id).label("experiments")
+            )
+            .join(experiment, experiment.c.id == aggregate.c.experiment_id)
+            .where(
+                experiment.c.dataset_id == dataset_id,
+                aggregate.c.query_count > 0,
+                score.is_not(None)
+            )
+            .distinct(experiment.c.configuration_id)
+            .order_by(experiment.c.configuration_id, score.desc(), aggregate.c.experiment_id.desc())
+            .subquery("best")
+        )
+        configuration = Configuration.__table__
+        result = await db.execute(
+            select(best, configuration.c.name.label("configuration_name"), func.count().over().label("total"))
+            .join(configuration, configuration.c.id == best.c.configuration_id)
+            .order_by(best.c.score.desc(), best.c.configuration_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        rows = result.all()
+        if rows:
+            total = rows[0].total
+        else:
+            # Page past the end: the window count is not available
+            total = await LeaderboardService._count_configurations(db, dataset_id, metric) if skip else 0
+        return {
+            "dataset_id": dataset_id,
+            "metric": metric,
+            "total": total,
+            "items": [
+                {
+                    "rank": skip + position,
+                    "configuration_id": row.configuration_id,
+                    "configuration_name": row.configuration_name,
+                    "experiment_id": row.experiment_id,
+                    "experiments": row.experiments,
+                    "score": row.score,
+                    "query_count": row.query_count,
+                    "metrics_version": row.metrics_version
+                }
+                for position, row in enumerate(rows, start=1)
+            ]
+        }
+
+    @staticmethod
+    async def _count_configurations(db: AsyncSession, dataset_id: int, metric: str) -> int:
+        """Number of configurations ranked on a dataset (for pages past the end)"""
+        aggregate = ExperimentAggregate.__table__
+        experiment = Experiment.__table__
+        result = await db.execute(
+            select(func.count(experiment.c.configuration_id.distinct()))
+            .select_from(aggregate.join(experiment, experiment.c.id == aggregate.c.experiment_id))
+            .where(
+                experiment.c.dataset_id == dataset_id,
+                aggregate.c.query_count > 0,
+                aggregate.c[metric].is_not(None)
+            )
+        )
+        return result.scalar_one()
+
+# ============================================================================
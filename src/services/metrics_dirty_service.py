@@ -0,0 +1,91 @@
+# Business logic for tracking stale metrics
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, delete, func, any_, literal, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.experiment import Experiment
+from src.models.metrics_dirty import MetricsDirty
+from src.utils.sql import int_array
+
+
+class MetricsDirtyService:
+    """
+    Service layer for the metrics_dirty queue.
+
+    Ranking writers mark pairs in their own transaction; the calculation claims them
+    with DELETE ... RETURNING before reading the rankings, so a pair marked again by a
+    concurrent writer stays dirty for the next recompute. Ground truths need no marks:
+    they are fixed per query version, a changed query gets a new id.
+    """
+
+    @staticmethod
+    async def mark_rankings(db: AsyncSession, experiment_id: int, query_ids: Iterable[int]) -> None:
+        """
+        Mark the metrics of these queries in an experiment as stale (their ranking changed)
+        and bump the experiment's rankings_version
+        """
+        query_ids = sorted(set(query_ids))
+        if not query_ids:
+            return
+        await db.execute(
+            update(Experiment.__table__)
+            .where(Experiment.__table__.c.id == experiment_id)
+            .values(rankings_version=Experiment.__table__.c.rankings_version + 1)
+        )
+        table = MetricsDirty.__table__
+        await db.execute(
+            pg_insert(table)
+            .from_select(
+                ["experiment_id", "query_id"],
+                select(literal(experiment_id, Integer), func.unnest(int_array(query_ids)))
+            )
+            .on_conflict_do_nothing()
+        )
+
+    @staticmethod
+    async def claim(
+            db: AsyncSession,
+            experiment_id: int,
+            query_ids: Optional[Iterable[int]] = None
+    ) -> List[int]:
+        """
+        Remove the dirty marks of an experiment (restricted to ``query_ids`` if given)
+
+        Returns:
+            Query ids that were dirty
+        """
+        table = MetricsDirty.__table__
+        stmt = delete(table).where(table.c.experiment_id == experiment_id)
+        if query_ids is not None:
+            stmt = stmt.where(table.c.query_id == any_(int_array(query_ids)))
+        result = await db.execute(stmt.returning(table.c.query_id))
+        return sorted(result.scalars().all())
+
+    @staticmethod
+    async def dirty_queries(db: AsyncSession, experiment_id: Optional[int] = None) -> Dict[int, List[int]]:
+        """Dirty query ids of each experiment (only ``experiment_id`` if given)"""
+        table = MetricsDirty.__table__
+        stmt = (
+            select(table.c.experiment_id, func.array_agg(table.c.query_id).label("query_ids"))
+            .group_by(table.c.experiment_id)
+            .order_by(table.c.experiment_id)
+        )
+        if experiment_id is not None:
+            stmt = stmt.where(table.c.experiment_id == experiment_id)
+        result = await db.execute(stmt)
+        return {row.experiment_id: sorted(row.query_ids) for row in result}
+
+    @staticmethod
+    async def count_by_experiment(db: AsyncSession) -> Dict[int, int]:
+        """Number of dirty pairs of each experiment that has any"""
+        table = MetricsDirty.__table__
+        result = await db.execute(
+            select(table.c.experiment_id, func.count().label("dirty"))
+            .group_by(table.c.experiment_id)
+            .order_by(table.c.experiment_id)
+        )
+        return {row.experiment_id: row.dirty for row in result}
+
+# ============================================================================
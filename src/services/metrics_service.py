@@ -1 +1,671 @@
 # Business logic for computing evaluation metrics
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, update, delete, any_, literal, func, tuple_, Float
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import ConfidenceLevel
+from src.models.chunk import Chunk
+from src.models.experiment import Experiment
+from src.models.ground_truth import GroundTruth
+from src.models.metrics import Metrics, METRIC_COLUMNS
+from src.models.query import Query, query_ground_truth_association
+from src.services.leaderboard_service import LeaderboardService, aggregate_cache
+from src.services.metrics_dirty_service import MetricsDirtyService
+from src.services.ranking_service import RankingService, RankedList
+from src.utils.cache import CoalescingCache
+from src.utils.sql import int_array
+
+# Query attributes metrics can be sliced by
+SLICE_ATTRIBUTES = {
+    "complexity": Query.complexity,
+    "device": Query.device,
+    "customer": Query.customer,
+    "obsolete": Query.obsolete,
+    "version": Query.version,
+    "dataset_id": Query.dataset_id
+}
+
+# Sliced aggregates, keyed by (experiment_id, metrics_version, group_by, percentiles)
+metrics_slice_cache = CoalescingCache(
+    "metrics_slices", settings.metrics_slice_cache_size, settings.metrics_cache_ttl_seconds
+)
+
+# Metric@k curves, keyed by (experiment_id, rankings_version, max_k)
+metrics_curve_cache = CoalescingCache(
+    "metrics_curves", settings.metrics_curve_cache_size, settings.metrics_cache_ttl_seconds
+)
+
+# Graded gain of a ranked chunk matching a ground truth of this confidence
+CONFIDENCE_GAINS = {
+    ConfidenceLevel.HIGH: 3.0,
+    ConfidenceLevel.MEDIUM: 2.0,
+    ConfidenceLevel.LOW: 1.0
+}
+
+# Metrics of the metric@k curves
+CURVE_METRICS = ("precision", "recall", "hit_rate", "ndcg")
+
+
+@dataclass
+class GainMatrix:
+    """Graded rankings of an experiment, one row per query ordered by query id"""
+    query_ids: List[int]
+    gains: np.ndarray  # (n, k) gain of the ground truth each ranked chunk covers, 0 if none or padding
+    lengths: np.ndarray  # (n,) number of ranked chunks within k
+    ideal_gains: np.ndarray  # (n, k) gains of the query's ground truths, sorted descending
+    ground_truths: np.ndarray  # (n,) number of ground truths of the query
+
+
+class MetricsService:
+    """Service layer for metrics operations"""
+
+    @staticmethod
+    def compute_metrics(
+            gains: np.ndarray,
+            lengths: np.ndarray,
+            ideal_gains: np.ndarray,
+            ground_truths: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Per-row retrieval metrics of an (n, k) gain matrix, vectorized over rows.
+
+        A ranked chunk is relevant when its gain is positive, i.e. when it covers a
+        ground truth not covered by a better-ranked chunk (see load_gain_matrix), so
+        there are never more relevant chunks than ground truths:
+            precision_value: relevant retrieved / retrieved
+            recall: ground truths covered / ground truths
+            f1_score: harmonic mean of precision and recall
+            ndcg: graded DCG with a log2(rank + 1) discount over the ideal DCG
+            mrr: reciprocal rank of the first relevant result (0 if none)
+            map_value: average precision
+
+        The ideal ranking is the ground truth gains sorted descending, truncated to the
+        ranking length. Metrics that need relevant items are NaN for queries without
+        ground truths.
+
+        Args:
+            gains: (n, k) gain of each ranked chunk, padding is 0
+            lengths: (n,) number of results of each ranking within the cutoff
+            ideal_gains: (n, k) ground truth gains sorted descending, padded with 0
+            ground_truths: (n,) number of ground truths of each query (>= hits)
+
+        Returns:
+            Mapping of metric column to an (n,) float array
+        """
+        n, k = gains.shape
+        positions = np.arange(1, k + 1, dtype=np.float64)
+        relevance = gains > 0
+        binary = relevance.astype(np.float64)
+
+        hits = binary.sum(axis=1)
+        relevant = ground_truths.astype(np.float64)
+        defined = relevant > 0
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            precision = np.where(lengths > 0, hits / lengths, 0.0)
+            recall = np.where(defined, hits / relevant, np.nan)
+            f1 = np.where(
+                precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0
+            )
+            f1 = np.where(defined, f1, np.nan)
+
+            discounts = 1.0 / np.log2(positions + 1)
+            dcg = gains @ discounts
+            ideal = np.where(positions <= lengths[:, None], ideal_gains, 0.0)
+            idcg = ideal @ discounts
+            ndcg = np.where(idcg > 0, dcg / idcg, np.nan)
+
+            first_hit = relevance.argmax(axis=1) if k else np.zeros(n, dtype=np.int64)
+            mrr = np.where(relevance.any(axis=1), 1.0 / (first_hit + 1), 0.0)
+
+            precision_at = np.cumsum(binary, axis=1) / positions
+            average_precision = np.where(defined, (precision_at * binary).sum(axis=1) / relevant, np.nan)
+
+        return {
+            "precision_value": precision,
+            "recall": recall,
+            "f1_score": f1,
+            "ndcg": ndcg,
+            "mrr": mrr,
+            "map_value": average_precision
+        }
+
+    @staticmethod
+    def compute_metrics_at(matrix: GainMatrix, cutoffs: Iterable[int]) -> Dict[int, Dict[str, np.ndarray]]:
+        """Metrics of every query at each cutoff (one vectorized pass per cutoff)"""
+        return {
+            cutoff: MetricsService.compute_metrics(
+                matrix.gains[:, :cutoff],
+                np.minimum(matrix.lengths, cutoff),
+                matrix.ideal_gains[:, :cutoff],
+                matrix.ground_truths
+            )
+            for cutoff in cutoffs
+        }
+
+    @staticmethod
+    def compute_curves(matrix: GainMatrix) -> Dict[str, np.ndarray]:
+        """
+        Per-row metric@k for every k = 1..K of an (n, K) gain matrix, from cumulative
+        sums along the ranks (one pass instead of one compute_metrics per cutoff).
+
+        Values at k equal compute_metrics_at(matrix, [k]): precision over the results
+        retrieved within k, recall over the ground truths, hit rate 1 if any hit within
+        k, and NDCG over the ideal DCG of the first min(k, length) ground truth gains.
+
+        Returns:
+            Mapping of CURVE_METRICS to an (n, K) float array (column k - 1 is @k)
+        """
+        gains = matrix.gains
+        n, k = gains.shape
+        positions = np.arange(1, k + 1, dtype=np.float64)
+        binary = (gains > 0).astype(np.float64)
+
+        hits = np.cumsum(binary, axis=1)
+        retrieved = np.minimum(matrix.lengths[:, None], positions)
+        relevant = np.broadcast_to(matrix.ground_truths[:, None], (n, k))
+
+        discounts = 1.0 / np.log2(positions + 1)
+        dcg = np.cumsum(gains * discounts, axis=1)
+        # ideal_dcg[:, m]: DCG of the first m ideal gains
+        ideal_dcg = np.concatenate(
+            (np.zeros((n, 1)), np.cumsum(matrix.ideal_gains * discounts, axis=1)), axis=1
+        )
+        idcg = np.take_along_axis(ideal_dcg, retrieved.astype(np.int64), axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {
+                "precision": np.where(retrieved > 0, hits / retrieved, 0.0),
+                "recall": np.where(relevant > 0, hits / relevant, np.nan),
+                "hit_rate": (hits > 0).astype(np.float64),
+                "ndcg": np.where(idcg > 0, dcg / idcg, np.nan)
+            }
+
+    @staticmethod
+    def cover_ground_truths(
+            section_keys: np.ndarray,
+            file_keys: np.ndarray,
+            truth_keys: np.ndarray,
+            truth_gains: np.ndarray
+    ) -> np.ndarray:
+        """
+        Gain of the ground truth each ranked chunk covers, crediting every ground truth
+        at most once.
+
+        Ranks are scanned in order, vectorized over rows: a chunk covers the best
+        uncovered ground truth among those of its section key and of its whole-file key
+        (the section one on ties), and gets 0 when they are all covered already.
+
+        Args:
+            section_keys: (n, k) (query, filename, section) key of each ranked chunk, -1 if
+                the chunk has no section or is padding
+            file_keys: (n, k) (query, filename) key of each ranked chunk, -1 for padding
+            truth_keys: (m,) key of each ground truth, in the same key space; keys of
+                different rows never collide
+            truth_gains: (m,) gain of each ground truth
+
+        Returns:
+            (n, k) gains, 0 where no ground truth is covered
+        """
+        gains = np.zeros(file_keys.shape, dtype=np.float64)
+        if not len(truth_keys):
+            return gains
+
+        # Ground truths grouped by key, best first: pool p holds pool_gain[start[p]:start[p] + size[p]]
+        order = np.lexsort((-truth_gains, truth_keys))
+        sorted_keys, pool_gain = truth_keys[order], truth_gains[order]
+        pool_keys, start, size = np.unique(sorted_keys, return_index=True, return_counts=True)
+
+        def pool_of(keys: np.ndarray) -> np.ndarray:
+            position = np.minimum(np.searchsorted(pool_keys, keys), len(pool_keys) - 1)
+            return np.where((keys >= 0) & (pool_keys[position] == keys), position, -1)
+
+        section_pool = pool_of(section_keys)
+        file_pool = pool_of(file_keys)
+        covered = np.zeros(len(pool_keys), dtype=np.int64)
+
+        def next_gain(pool: np.ndarray) -> np.ndarray:
+            safe = np.maximum(pool, 0)
+            left = (pool >= 0) & (covered[safe] < size[safe])
+            return np.where(left, pool_gain[np.minimum(start[safe] + covered[safe], len(pool_gain) - 1)], 0.0)
+
+        for rank in range(file_keys.shape[1]):
+            section, whole_file = section_pool[:, rank], file_pool[:, rank]
+            section_gain, file_gain = next_gain(section), next_gain(whole_file)
+            take_section = (section_gain > 0) & (section_gain >= file_gain)
+            take_file = ~take_section & (file_gain > 0)
+            # Pools of one rank belong to distinct rows, so no index repeats
+            covered[section[take_section]] += 1
+            covered[whole_file[take_file]] += 1
+            gains[:, rank] = np.where(take_section, section_gain, np.where(take_file, file_gain, 0.0))
+        return gains
+
+    @staticmethod
+    async def load_gain_matrix(db: AsyncSession, rankings: Dict[int, RankedList], k: int) -> GainMatrix:
+        """
+        Grade the ranked chunks against the ground truths of their queries.
+
+        Uses the matching rule of the ranking labels (same filename and either no section
+        or the chunk's hierarchical metadata, see RankingService._chunk_relevance); each
+        ground truth is covered by at most one chunk, the best-ranked one matching it
+        (see cover_ground_truths), and graded with CONFIDENCE_GAINS. Chunk and ground
+        truth attributes are read with one query each; the matching is a sorted
+        (query, filename, section) key lookup over the whole matrix.
+
+        Args:
+            db: Database session
+            rankings: Mapping of query id to its ranked list
+            k: Width of the matrix (rankings are truncated or padded to it)
+        """
+        query_ids = sorted(rankings)
+        n = len(query_ids)
+        chunk_ids = np.full((n, k), -1, dtype=np.int64)
+        for row, query_id in enumerate(query_ids):
+            top = rankings[query_id].chunk_ids[:k]
+            chunk_ids[row, :len(top)] = top
+        lengths = (chunk_ids >= 0).sum(axis=1).astype(np.float64)
+
+        chunk = Chunk.__table__
+        result = await db.execute(
+            select(chunk.c.id, chunk.c.filename, chunk.c.hierarchical_metadata_id)
+            .where(chunk.c.id == any_(int_array(np.unique(chunk_ids[chunk_ids >= 0]).tolist())))
+            .order_by(chunk.c.id)
+        )
+        chunk_rows = result.all()
+
+        ground_truth = GroundTruth.__table__
+        association = query_ground_truth_association
+        result = await db.execute(
+            select(
+                association.c.query_id,
+                ground_truth.c.filename,
+                ground_truth.c.hierarchical_metadata_id,
+                ground_truth.c.confidence
+            )
+            .join(ground_truth, ground_truth.c.id == association.c.ground_truth_id)
+            .where(association.c.query_id == any_(int_array(query_ids)))
+        )
+        truth_rows = result.all()
+
+        # Integer codes of filenames and sections (section 0 = the whole file)
+        filenames: Dict[str, int] = {}
+        sections: Dict[int, int] = {}
+
+        def file_code(filename: str) -> int:
+            return filenames.setdefault(filename, len(filenames))
+
+        def section_code(metadata_id: Optional[int]) -> int:
+            return 0 if metadata_id is None else sections.setdefault(metadata_id, len(sections) + 1)
+
+        row_of = {query_id: row for row, query_id in enumerate(query_ids)}
+        truth_row = np.array([row_of[r.query_id] for r in truth_rows], dtype=np.int64)
+        truth_file = np.array([file_code(r.filename) for r in truth_rows], dtype=np.int64)
+        truth_section = np.array([section_code(r.hierarchical_metadata_id) for r in truth_rows], dtype=np.int64)
+        truth_gain = np.array([CONFIDENCE_GAINS[r.confidence] for r in truth_rows], dtype=np.float64)
+
+        # Chunk attributes, behind a sentinel (padding and deleted chunks) whose
+        # filename code matches no ground truth
+        chunk_file = [file_code(r.filename) for r in chunk_rows]
+        chunk_section = [section_code(r.hierarchical_metadata_id) for r in chunk_rows]
+        file_count = len(filenames) + 1
+        section_count = len(sections) + 1
+        known_ids = np.array([-1] + [r.id for r in chunk_rows], dtype=np.int64)
+        known_file = np.array([file_count - 1] + chunk_file, dtype=np.int64)
+        known_section = np.array([0] + chunk_section, dtype=np.int64)
+        slot = np.minimum(np.searchsorted(known_ids, chunk_ids), len(known_ids) - 1)
+        slot = np.where(known_ids[slot] == chunk_ids, slot, 0)
+
+        def key(row: np.ndarray, file: np.ndarray, section: np.ndarray) -> np.ndarray:
+            return (row * file_count + file) * section_count + section
+
+        cell_row = np.arange(n, dtype=np.int64)[:, None]
+        cell_file = known_file[slot]
+        cell_section = known_section[slot]
+        gains = MetricsService.cover_ground_truths(
+            np.where(cell_section > 0, key(cell_row, cell_file, cell_section), -1),
+            np.where(slot > 0, key(cell_row, cell_file, 0), -1),
+            key(truth_row, truth_file, truth_section),
+            truth_gain
+        )
+
+        # Ground truth gains of each query, sorted descending and truncated to k
+        order = np.lexsort((-truth_gain, truth_row))
+        sorted_row, sorted_gain = truth_row[order], truth_gain[order]
+        rank = np.arange(len(sorted_row)) - np.searchsorted(sorted_row, sorted_row)
+        kept = rank < k
+        ideal_gains = np.zeros((n, k), dtype=np.float64)
+        ideal_gains[sorted_row[kept], rank[kept]] = sorted_gain[kept]
+
+        return GainMatrix(
+            query_ids=query_ids,
+            gains=gains,
+            lengths=lengths,
+            ideal_gains=ideal_gains,
+            ground_truths=np.bincount(truth_row, minlength=n).astype(np.float64)
+        )
+
+    @staticmethod
+    def summarize_at(metrics_at: Dict[int, Dict[str, np.ndarray]]) -> Dict[int, Dict[str, Optional[float]]]:
+        """Mean of each metric at each cutoff, undefined values (NaN) excluded"""
+        def mean(values: np.ndarray) -> Optional[float]:
+            defined = values[~np.isnan(values)]
+            return float(defined.mean()) if defined.size else None
+
+        return {
+            cutoff: {name: mean(metrics[name]) for name in METRIC_COLUMNS}
+            for cutoff, metrics in metrics_at.items()
+        }
+
+    @staticmethod
+    async def calculate_experiment_metrics(
+            db: AsyncSession,
+            experiment_id: int,
+            query_ids: Optional[Iterable[int]] = None,
+            k: Optional[int] = None,
+            cutoffs: Sequence[int] = ()
+    ) -> Dict[str, Any]:
+        """
+        Compute and store the metrics of every ranked query of an experiment.
+
+        Rankings are read with one bulk fetch (both storages) and graded against the
+        ground truths (see load_gain_matrix); every metric is computed on the padded gain
+        matrix (see compute_metrics) and written with a single upsert on
+        metrics_unique_experiment_query, in the caller's transaction. The dirty marks
+        of the evaluated queries are cleared first and the experiment's leaderboard
+        aggregate is refreshed.
+
+        A whole-experiment calculation records its cutoff on the experiment
+        (metrics_cutoff); calculations restricted to some queries reuse it, so that all
+        the stored metrics of an experiment share one cutoff.
+
+        Args:
+            db: Database session
+            experiment_id: Experiment to evaluate
+            query_ids: Restrict to these queries (all ranked queries if None)
+            k: Cutoff of the stored metrics (full rankings if None); only for
+                whole-experiment calculations
+            cutoffs: Additional cutoffs, reported as means but not stored
+
+        Returns:
+            rows: One row of Metrics values per query, ordered by query id
+            at_k: Mean of each metric at each of ``cutoffs``
+
+        Raises:
+            ValueError: k given with query_ids
+        """
+        experiment = Experiment.__table__
+        if query_ids is None:
+            await db.execute(update(experiment).where(experiment.c.id == experiment_id).values(metrics_cutoff=k))
+        else:
+            if k is not None:
+                raise ValueError("Calculations restricted to some queries reuse the experiment's cutoff")
+            query_ids = list(query_ids)
+            result = await db.execute(select(experiment.c.metrics_cutoff).where(experiment.c.id == experiment_id))
+            k = result.scalar_one_or_none()
+        await MetricsDirtyService.claim(db, experiment_id, query_ids)
+
+        rankings = await RankingService.load_rankings(db, experiment_id, query_ids)
+        if not rankings:
+            return {"rows": [], "at_k": {}}
+
+        stored_k = k or max(len(ranking.chunk_ids) for ranking in rankings.values())
+        matrix = await MetricsService.load_gain_matrix(db, rankings, max([stored_k, *cutoffs]))
+        metrics = MetricsService.compute_metrics_at(matrix, [stored_k])[stored_k]
+
+        # NaN (undefined) is stored as NULL
+        columns = {
+            name: [None if np.isnan(value) else value for value in metrics[name].tolist()]
+            for name in METRIC_COLUMNS
+        }
+        rows = [
+            {
+                "experiment_id": experiment_id,
+                "query_id": query_id,
+                **{name: columns[name][row] for name in METRIC_COLUMNS}
+            }
+            for row, query_id in enumerate(matrix.query_ids)
+        ]
+
+        stmt = pg_insert(Metrics.__table__)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                constraint="metrics_unique_experiment_query",
+                set_={name: stmt.excluded[name] for name in METRIC_COLUMNS}
+            ),
+            rows
+        )
+        await LeaderboardService.refresh_aggregates(db, [experiment_id])
+        return {
+            "rows": rows,
+            "at_k": MetricsService.summarize_at(MetricsService.compute_metrics_at(matrix, cutoffs))
+        }
+
+    @staticmethod
+    async def recompute_dirty(
+            db: AsyncSession,
+            experiment_id: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Recompute the metrics of the dirty (experiment, query) pairs only, committing
+        once per experiment.
+
+        Dirty pairs whose ranking no longer exists lose their stored metrics. Metrics are
+        recomputed at the cutoff each experiment was calculated with.
+
+        Args:
+            db: Database session, committed after every experiment
+            experiment_id: Restrict to this experiment (every experiment if None)
+
+        Returns:
+            Number of experiments touched, pairs recomputed and pairs removed
+        """
+        stats = {"experiments_recomputed": 0, "pairs_recomputed": 0, "pairs_removed": 0}
+        dirty = await MetricsDirtyService.dirty_queries(db, experiment_id)
+        for dirty_experiment_id, query_ids in dirty.items():
+            calculation = await MetricsService.calculate_experiment_metrics(
+                db, dirty_experiment_id, query_ids=query_ids
+            )
+            computed = {row["query_id"] for row in calculation["rows"]}
+            unranked = [query_id for query_id in query_ids if query_id not in computed]
+            if unranked:
+                await db.execute(
+                    delete(Metrics.__table__).where(
+                        Metrics.experiment_id == dirty_experiment_id,
+                        Metrics.query_id == any_(int_array(unranked))
+                    )
+                )
+                await LeaderboardService.refresh_aggregates(db, [dirty_experiment_id])
+            await db.commit()
+
+            stats["experiments_recomputed"] += 1
+            stats["pairs_recomputed"] += len(computed)
+            stats["pairs_removed"] += len(unranked)
+        return stats
+
+    @staticmethod
+    async def aggregate_metrics(db: AsyncSession, experiment_id: int) -> Dict[str, Any]:
+        """
+        Mean of every metric of an experiment over its queries (one AVG scan of its
+        Metrics rows), cached per metrics_version of the experiment
+
+        Returns:
+            avg_* means (None without values) and the number of queries with metrics
+        """
+        async def compute() -> Dict[str, Any]:
+            result = await db.execute(
+                select(
+                    func.avg(Metrics.precision_value).label('avg_precision'),
+                    func.avg(Metrics.recall).label('avg_recall'),
+                    func.avg(Metrics.f1_score).label('avg_f1'),
+                    func.avg(Metrics.ndcg).label('avg_ndcg'),
+                    func.avg(Metrics.mrr).label('avg_mrr'),
+                    func.avg(Metrics.map_value).label('avg_map'),
+                    func.count(Metrics.id).label('query_count')
+                ).where(Metrics.experiment_id == experiment_id)
+            )
+            row = result.one()
+            averages = ("avg_precision", "avg_recall", "avg_f1", "avg_ndcg", "avg_mrr", "avg_map")
+            return {
+                "experiment_id": experiment_id,
+                **{name: None if getattr(row, name) is None else float(getattr(row, name)) for name in averages},
+                "query_count": row.query_count
+            }
+
+        version = await LeaderboardService.get_metrics_version(db, experiment_id)
+        return await aggregate_cache.get_or_compute(("aggregate", experiment_id, version), compute)
+
+    @staticmethod
+    async def aggregate_slices(
+            db: AsyncSession,
+            experiment_id: int,
+            group_by: Sequence[str],
+            percentiles: Sequence[float]
+    ) -> Dict[str, Any]:
+        """
+        Distribution of every metric of an experiment per slice of query attributes.
+
+        One statement: metrics JOIN query GROUP BY GROUPING SETS ((attributes), ()),
+        with count, mean and percentile_cont per metric; the empty grouping set is the
+        whole experiment. Results are cached per metrics_version of the experiment.
+
+        Args:
+            db: Database session
+            experiment_id: Experiment to aggregate
+            group_by: Names of SLICE_ATTRIBUTES, in slice key order
+            percentiles: Fractions in [0, 1]
+
+        Returns:
+            overall and per-slice counts and distributions (slices ordered by key)
+
+        Raises:
+            ValueError: unknown experiment or attribute, percentile out of range
+        """
+        unknown = [name for name in group_by if name not in SLICE_ATTRIBUTES]
+        if unknown or not group_by:
+            raise ValueError(
+                f"Slice attributes must be among {', '.join(SLICE_ATTRIBUTES)} (got {', '.join(unknown) or 'none'})"
+            )
+        if any(not 0 <= fraction <= 1 for fraction in percentiles):
+            raise ValueError("Percentiles must be between 0 and 1")
+        if await db.get(Experiment, experiment_id) is None:
+            raise ValueError(f"Experiment {experiment_id} not found")
+        version = await LeaderboardService.get_metrics_version(db, experiment_id)
+        return await metrics_slice_cache.get_or_compute(
+            (experiment_id, version, tuple(group_by), tuple(percentiles)),
+            lambda: MetricsService._aggregate_slices(db, experiment_id, group_by, percentiles)
+        )
+
+    @staticmethod
+    async def _aggregate_slices(
+            db: AsyncSession,
+            experiment_id: int,
+            group_by: Sequence[str],
+            percentiles: Sequence[float]
+    ) -> Dict[str, Any]:
+        """Uncached aggregate_slices"""
+        attributes = [SLICE_ATTRIBUTES[name] for name in group_by]
+        total = func.grouping(*attributes).label("total")
+        aggregates = []
+        for name in METRIC_COLUMNS:
+            column = Metrics.__table__.c[name]
+            aggregates += [
+                func.count(column).label(f"{name}_count"),
+                func.avg(column).label(f"{name}_mean"),
+                func.percentile_cont(literal(list(percentiles), ARRAY(Float))).within_group(column)
+                .label(f"{name}_percentiles")
+            ]
+        result = await db.execute(
+            select(
+                *[attribute.label(name) for name, attribute in zip(group_by, attributes)],
+                total,
+                func.count().label("count"),
+                *aggregates
+            )
+            .select_from(Metrics.__table__.join(Query.__table__, Query.id == Metrics.query_id))
+            .where(Metrics.experiment_id == experiment_id)
+            .group_by(func.grouping_sets(tuple_(*attributes), tuple_()))
+            .order_by(total.desc(), *[attribute.asc().nulls_last() for attribute in attributes])
+        )
+
+        labels = [f"p{fraction * 100:g}" for fraction in percentiles]
+
+        def distribution(row: Any, name: str) -> Dict[str, Any]:
+            values = getattr(row, f"{name}_percentiles") or [None] * len(labels)
+            mean = getattr(row, f"{name}_mean")
+            return {
+                "count": getattr(row, f"{name}_count"),
+                "mean": None if mean is None else float(mean),
+                "percentiles": dict(zip(labels, values))
+            }
+
+        def metrics_slice(row: Any, key: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                "key": key,
+                "count": row.count,
+                "metrics": {name: distribution(row, name) for name in METRIC_COLUMNS}
+            }
+
+        rows = result.all()
+        return {
+            "experiment_id": experiment_id,
+            "group_by": list(group_by),
+            "percentiles": list(percentiles),
+            "overall": metrics_slice(rows[0], {}),
+            "slices": [
+                metrics_slice(row, {name: getattr(row, name) for name in group_by})
+                for row in rows[1:]
+            ]
+        }
+
+    @staticmethod
+    async def metric_curves(db: AsyncSession, experiment_id: int, max_k: int) -> Dict[str, Any]:
+        """
+        Mean precision, recall, hit rate and NDCG at every k = 1..max_k of an experiment.
+
+        Rankings are bulk-loaded and graded once (see load_gain_matrix); the curves come
+        from cumulative sums over the gain matrix (see compute_curves). Results are cached
+        per rankings_version of the experiment.
+
+        Args:
+            db: Database session
+            experiment_id: Experiment to evaluate
+            max_k: Largest cutoff
+
+        Returns:
+            Number of ranked queries and, per metric, its mean at k = 1..max_k (None
+            where undefined for every query)
+
+        Raises:
+            ValueError: experiment not found
+        """
+        result = await db.execute(select(Experiment.rankings_version).where(Experiment.id == experiment_id))
+        rankings_version = result.scalar_one_or_none()
+        if rankings_version is None:
+            raise ValueError(f"Experiment {experiment_id} not found")
+
+        async def compute() -> Dict[str, Any]:
+            rankings = await RankingService.load_rankings(db, experiment_id)
+            matrix = await MetricsService.load_gain_matrix(db, rankings, max_k)
+            curves = MetricsService.compute_curves(matrix)
+            return {
+                "experiment_id": experiment_id,
+                "max_k": max_k,
+                "query_count": len(matrix.query_ids),
+                **{name: mean(curves[name]) for name in CURVE_METRICS}
+            }
+
+        def mean(values: np.ndarray) -> List[Optional[float]]:
+            defined = ~np.isnan(values)
+            counts = defined.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = np.where(defined, values, 0.0).sum(axis=0) / counts
+            return [float(value) if count else None for value, count in zip(means, counts)]
+
+        return await metrics_curve_cache.get_or_compute((experiment_id, rankings_version, max_k), compute)
+
+# ============================================================================
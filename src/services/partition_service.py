@@ -0,0 +1,134 @@
+# Per-experiment LIST partitioning of the ranking and metrics tables
+from typing import Dict, List
+
+from sqlalchemy import select, text, Table
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import AddConstraint, CreateIndex, UniqueConstraint
+
+from src.models.experiment import Experiment
+from src.models.metrics import Metrics
+from src.models.ranking import Ranking
+
+# Tables holding per-experiment rows that can be partitioned by experiment_id
+PARTITIONED_TABLES: List[Table] = [Ranking.__table__, Metrics.__table__]
+
+
+def _qualified(table: Table, name: str) -> str:
+    return f"{table.schema}.{name}"
+
+
+def _partition_name(table: Table, experiment_id: int) -> str:
+    return f"{table.name}_e{int(experiment_id)}"
+
+
+class PartitionService:
+    """
+    Service layer for experiment partitions.
+
+    The ORM models are unchanged: whether ranking and metrics are plain or partitioned
+    tables is decided in the database (see convert_to_partitioned). When they are,
+    every experiment owns one partition per table, created with the experiment and
+    dropped with it, and per-experiment queries are pruned to that partition.
+    """
+
+    @staticmethod
+    async def get_partitioned_tables(db: AsyncSession) -> Dict[str, bool]:
+        """Tell, for each partitionable table, whether it is partitioned in the database"""
+        result = await db.execute(
+            text(
+                "SELECT c.relname FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = :schema"
+            ),
+            {"schema": PARTITIONED_TABLES[0].schema}
+        )
+        partitioned = set(result.scalars())
+        return {table.name: table.name in partitioned for table in PARTITIONED_TABLES}
+
+    @staticmethod
+    async def create_experiment_partitions(db: AsyncSession, experiment_id: int) -> None:
+        """Create the partitions of a new experiment in every partitioned table (no commit)"""
+        partitioned = await PartitionService.get_partitioned_tables(db)
+        for table in PARTITIONED_TABLES:
+            if partitioned[table.name]:
+                await db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {_qualified(table, _partition_name(table, experiment_id))} "
+                    f"PARTITION OF {table.fullname} FOR VALUES IN ({int(experiment_id)})"
+                ))
+
+    @staticmethod
+    async def drop_experiment_partitions(db: AsyncSession, experiment_id: int) -> None:
+        """
+        Drop the partitions of an experiment (no commit).
+
+        Dropping a partition releases its rows at once, instead of the row-by-row
+        ON DELETE CASCADE that deleting the experiment would trigger.
+        """
+        partitioned = await PartitionService.get_partitioned_tables(db)
+        for table in PARTITIONED_TABLES:
+            if partitioned[table.name]:
+                await db.execute(text(
+                    f"DROP TABLE IF EXISTS {_qualified(table, _partition_name(table, experiment_id))}"
+                ))
+
+    @staticmethod
+    async def convert_to_partitioned(db: AsyncSession) -> Dict[str, bool]:
+        """
+        Rebuild ranking and metrics as tables partitioned by LIST (experiment_id).
+
+        One-off maintenance operation, run in the caller's transaction: each plain table
+        is renamed, a partitioned table with the same columns and serial is created with
+        one partition per existing experiment, the rows are copied over and the old
+        table is dropped. The primary key becomes (id, experiment_id), as a partitioned
+        table requires; the other constraints and indexes are recreated from the models
+        under their original names. Tables already partitioned are left alone.
+
+        Returns:
+            Partitioning state of each table afterwards
+        """
+        partitioned = await PartitionService.get_partitioned_tables(db)
+        result = await db.execute(select(Experiment.id).order_by(Experiment.id))
+        experiment_ids = list(result.scalars())
+        dialect = (await db.connection()).dialect
+
+        for table in PARTITIONED_TABLES:
+            if partitioned[table.name]:
+                continue
+            legacy_name = f"{table.name}_unpartitioned"
+            legacy = _qualified(table, legacy_name)
+
+            await db.execute(text(f"LOCK TABLE {table.fullname} IN ACCESS EXCLUSIVE MODE"))
+            await db.execute(text(f"ALTER TABLE {table.fullname} RENAME TO {legacy_name}"))
+            await db.execute(text(
+                f"CREATE TABLE {table.fullname} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING COMMENTS) "
+                f"PARTITION BY LIST (experiment_id)"
+            ))
+            for experiment_id in experiment_ids:
+                await db.execute(text(
+                    f"CREATE TABLE {_qualified(table, _partition_name(table, experiment_id))} "
+                    f"PARTITION OF {table.fullname} FOR VALUES IN ({int(experiment_id)})"
+                ))
+            await db.execute(text(f"INSERT INTO {table.fullname} SELECT * FROM {legacy}"))
+
+            # Keep the id sequence alive when the old table (its owner) is dropped
+            result = await db.execute(
+                text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}
+            )
+            sequence = result.scalar()
+            if sequence:
+                await db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table.fullname}.id"))
+            await db.execute(text(f"DROP TABLE {legacy}"))
+
+            await db.execute(text(
+                f"ALTER TABLE {table.fullname} ADD CONSTRAINT {table.name}_pkey PRIMARY KEY (id, experiment_id)"
+            ))
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint):
+                    await db.execute(text(str(AddConstraint(constraint).compile(dialect=dialect))))
+            for constraint in table.foreign_key_constraints:
+                await db.execute(text(str(AddConstraint(constraint).compile(dialect=dialect))))
+            for index in table.indexes:
+                await db.execute(text(str(CreateIndex(index).compile(dialect=dialect))))
+
+        return await PartitionService.get_partitioned_tables(db)
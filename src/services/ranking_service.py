@@ -1 +1,776 @@
 # Business logic for ranking results
+from dataclasses import dataclass
+from typing import List, Dict, Any, AsyncIterator, Optional, Iterable, Tuple
+
+from asyncpg.exceptions import IntegrityConstraintViolationError
+from sqlalchemy import (
+    select, insert, update, delete, exists, or_, any_, literal, func, union_all, true, tuple_, cast, Integer
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models import RankingStorage
+from src.models.chunk import Chunk
+from src.models.experiment import Experiment
+from src.models.ground_truth import GroundTruth
+from src.models.query import query_ground_truth_association
+from src.models.ranking import Ranking
+from src.models.ranking_compact import RankingCompact
+from src.schemas.ranking import RankingResultInput, QueryRankingInput
+from src.services.metrics_dirty_service import MetricsDirtyService
+from src.utils.sql import int_array
+
+# Columns written by bulk uploads, in COPY order
+RANKING_COPY_COLUMNS = ("rank_position", "score", "is_relevant", "chunk_id", "query_id", "experiment_id")
+
+
+@dataclass
+class RankedList:
+    """Ranking of one query, ordered by rank position, whatever the storage"""
+    chunk_ids: List[int]
+    scores: List[float]
+    relevance: List[Optional[bool]]
+
+
+class RankingService:
+    """Service layer for ranking operations"""
+
+    @staticmethod
+    def validate_rank_positions(results: List[RankingResultInput]) -> None:
+        """Validate that rank positions are unique within one ranking"""
+        positions = [r.rank_position for r in results]
+        if len(positions) != len(set(positions)):
+            seen = set()
+            for position in positions:
+                if position in seen:
+                    raise ValueError(f"Duplicate rank position {position} found in input")
+                seen.add(position)
+
+    @staticmethod
+    async def get_ranking_storage(db: AsyncSession, experiment_id: int) -> RankingStorage:
+        """
+        Return the ranking storage mode of an experiment.
+
+        The experiment row is share-locked until the end of the transaction, so that
+        compact_experiment cannot switch the mode under a running write.
+        """
+        result = await db.execute(
+            select(Experiment.ranking_storage)
+            .where(Experiment.id == experiment_id)
+            .with_for_update(read=True)
+        )
+        storage = result.scalar_one_or_none()
+        if storage is None:
+            raise ValueError(f"Experiment {experiment_id} not found")
+        return storage
+
+    @staticmethod
+    def _compact_row(
+            experiment_id: int,
+            query_id: int,
+            results: List[RankingResultInput]
+    ) -> Dict[str, Any]:
+        """Pack a ranking into parallel arrays; positions must be exactly 1..n"""
+        ordered = sorted(results, key=lambda r: r.rank_position)
+        if ordered and ordered[-1].rank_position != len(ordered):
+            raise ValueError(
+                f"Compact rankings need contiguous rank positions 1..n (query {query_id})"
+            )
+        return {
+            "experiment_id": experiment_id,
+            "query_id": query_id,
+            "chunk_ids": [r.chunk_id for r in ordered],
+            "scores": [r.score for r in ordered],
+            "relevance": [r.is_relevant for r in ordered]
+        }
+
+    @staticmethod
+    async def _validate_chunk_ids(db: AsyncSession, chunk_ids: Iterable[int]) -> None:
+        """Stand-in for the foreign key compact arrays cannot have"""
+        chunk_ids = set(chunk_ids)
+        result = await db.execute(
+            select(Chunk.id).where(Chunk.id == any_(int_array(chunk_ids)))
+        )
+        missing = chunk_ids - set(result.scalars())
+        if missing:
+            raise ValueError(f"Unknown chunk IDs: {sorted(missing)[:10]}")
+
+    @staticmethod
+    def _expand_compact_row(row: Any) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": None,
+                "rank_position": position,
+                "score": score,
+                "is_relevant": is_relevant,
+                "chunk_id": chunk_id,
+                "query_id": row.query_id,
+                "experiment_id": row.experiment_id
+            }
+            for position, (chunk_id, score, is_relevant) in enumerate(
+                zip(row.chunk_ids, row.scores, row.relevance), start=1
+            )
+        ]
+
+    @staticmethod
+    async def bulk_insert_rankings(
+            db: AsyncSession,
+            experiment_id: int,
+            query_id: int,
+            results: List[RankingResultInput]
+    ) -> List[Dict[str, Any]]:
+        """
+        Store the ranking of one query in an experiment without per-row round trips.
+
+        Up to settings.ranking_copy_threshold rows go through a single multi-row
+        INSERT ... RETURNING; larger payloads are streamed with COPY and read back
+        with one SELECT. Experiments with compact storage get a single ranking_compact
+        row. Rows sent without is_relevant are labeled against the query's ground
+        truths (see label_rankings) and the query's metrics are marked stale. Nothing
+        is committed.
+
+        Args:
+            db: Database session
+            experiment_id: Experiment the ranking belongs to
+            query_id: Query that was searched
+            results: Retrieved chunks
+
+        Returns:
+            Stored rankings as column dicts, ordered by rank position
+
+        Raises:
+            ValueError: duplicate rank positions, unknown chunk/query/experiment or
+                a ranking already stored at one of the positions
+        """
+        RankingService.validate_rank_positions(results)
+        if not results:
+            return []
+
+        storage = await RankingService.get_ranking_storage(db, experiment_id)
+        if storage == RankingStorage.COMPACT:
+            rankings = await RankingService._insert_compact_ranking(db, experiment_id, query_id, results)
+            await MetricsDirtyService.mark_rankings(db, experiment_id, [query_id])
+            return rankings
+
+        rows = RankingService._ranking_rows(experiment_id, query_id, results)
+        table = Ranking.__table__
+
+        try:
+            if len(rows) <= settings.ranking_copy_threshold:
+                result = await db.execute(
+                    insert(table).returning(*table.c, sort_by_parameter_order=True),
+                    rows
+                )
+                rankings = [dict(row._mapping) for row in result]
+                await MetricsDirtyService.mark_rankings(db, experiment_id, [query_id])
+                if settings.ranking_auto_label:
+                    labels = await RankingService.label_rankings(
+                        db, experiment_id, query_ids=[query_id], only_unlabeled=True
+                    )
+                    for ranking in rankings:
+                        ranking["is_relevant"] = labels.get(ranking["id"], ranking["is_relevant"])
+                return rankings
+
+            await RankingService._copy_rankings(db, rows)
+        except (IntegrityError, IntegrityConstraintViolationError) as e:
+            raise ValueError(f"Rankings rejected by the database: {getattr(e, 'orig', e)}") from e
+
+        await MetricsDirtyService.mark_rankings(db, experiment_id, [query_id])
+        if settings.ranking_auto_label:
+            await RankingService.label_rankings(db, experiment_id, query_ids=[query_id], only_unlabeled=True)
+
+        result = await db.execute(
+            select(table)
+            .where(
+                table.c.experiment_id == experiment_id,
+                table.c.query_id == query_id,
+                table.c.rank_position == any_(int_array(r.rank_position for r in results))
+            )
+            .order_by(table.c.rank_position)
+        )
+        return [dict(row._mapping) for row in result]
+
+    @staticmethod
+    async def _insert_compact_ranking(
+            db: AsyncSession,
+            experiment_id: int,
+            query_id: int,
+            results: List[RankingResultInput]
+    ) -> List[Dict[str, Any]]:
+        row = RankingService._compact_row(experiment_id, query_id, results)
+        await RankingService._validate_chunk_ids(db, row["chunk_ids"])
+        try:
+            await db.execute(insert(RankingCompact.__table__), [row])
+        except IntegrityError as e:
+            raise ValueError(f"Rankings rejected by the database: {e.orig}") from e
+
+        if settings.ranking_auto_label:
+            await RankingService.label_compact_rankings(db, experiment_id, query_ids=[query_id], only_unlabeled=True)
+        result = await db.execute(
+            select(RankingCompact.__table__)
+            .where(RankingCompact.experiment_id == experiment_id, RankingCompact.query_id == query_id)
+        )
+        return RankingService._expand_compact_row(result.one())
+
+    @staticmethod
+    def _ranking_rows(
+            experiment_id: int,
+            query_id: int,
+            results: List[RankingResultInput]
+    ) -> List[Dict[str, Any]]:
+        return [
+            {
+                "rank_position": r.rank_position,
+                "score": r.score,
+                "is_relevant": r.is_relevant,
+                "chunk_id": r.chunk_id,
+                "query_id": query_id,
+                "experiment_id": experiment_id
+            }
+            for r in results
+        ]
+
+    @staticmethod
+    async def import_rankings_in_batches(
+            db: AsyncSession,
+            experiment_id: int,
+            rankings: AsyncIterator[QueryRankingInput],
+            batch_size: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Import a stream of per-query rankings, committing every ``batch_size`` rows.
+
+        The stream is only consumed while no batch is being written, so a slow database
+        slows the client down instead of buffering the body in memory. Rows already
+        stored at the same (experiment, query, rank position) are skipped (the same
+        query with compact storage), which makes re-sending a stream after a dropped
+        connection safe: committed batches are kept and only the missing rows are written.
+        Rows sent without is_relevant are labeled, and the metrics of queries that got
+        new rows marked stale, in the same transaction.
+
+        Args:
+            db: Database session, committed after every batch
+            experiment_id: Experiment the rankings belong to
+            rankings: Rankings to import, one query per item, consumed lazily
+            batch_size: Number of ranking rows per transaction
+
+        Yields:
+            One report per committed batch: per-query counts of received and inserted
+            rows, plus cumulative totals
+        """
+        totals = {"queries_processed": 0, "rows_received": 0, "rows_inserted": 0, "batches_committed": 0}
+        batch: List[QueryRankingInput] = []
+        batch_rows = 0
+
+        table = Ranking.__table__
+        stmt = (
+            pg_insert(table)
+            .on_conflict_do_nothing(constraint="ranking_unique_experiment_query_position")
+            .returning(table.c.query_id)
+        )
+        compact_table = RankingCompact.__table__
+        compact_stmt = (
+            pg_insert(compact_table)
+            .on_conflict_do_nothing(constraint="ranking_compact_unique_experiment_query")
+            .returning(compact_table.c.query_id, func.cardinality(compact_table.c.chunk_ids).label("rows"))
+        )
+
+        async def commit_batch() -> Dict[str, Any]:
+            inserted: Dict[int, int] = {}
+            storage = await RankingService.get_ranking_storage(db, experiment_id)
+            if storage == RankingStorage.COMPACT:
+                rows = [
+                    RankingService._compact_row(experiment_id, query_ranking.query_id, query_ranking.results)
+                    for query_ranking in batch
+                    if query_ranking.results
+                ]
+                if rows:
+                    await RankingService._validate_chunk_ids(db, (c for row in rows for c in row["chunk_ids"]))
+                    try:
+                        result = await db.execute(compact_stmt, rows)
+                    except IntegrityError as e:
+                        raise ValueError(f"Rankings rejected by the database: {e.orig}") from e
+                    for row in result:
+                        inserted[row.query_id] = inserted.get(row.query_id, 0) + row.rows
+            else:
+                rows = [
+                    row
+                    for query_ranking in batch
+                    for row in RankingService._ranking_rows(experiment_id, query_ranking.query_id, query_ranking.results)
+                ]
+                if rows:
+                    try:
+                        result = await db.execute(stmt, rows)
+                    except IntegrityError as e:
+                        raise ValueError(f"Rankings rejected by the database: {e.orig}") from e
+                    for row in result:
+                        inserted[row.query_id] = inserted.get(row.query_id, 0) + 1
+            await MetricsDirtyService.mark_rankings(db, experiment_id, inserted.keys())
+            if inserted and settings.ranking_auto_label:
+                if storage == RankingStorage.COMPACT:
+                    await RankingService.label_compact_rankings(
+                        db, experiment_id, query_ids=inserted.keys(), only_unlabeled=True
+                    )
+                else:
+                    await RankingService.label_rankings(
+                        db, experiment_id, query_ids=inserted.keys(), only_unlabeled=True, returning=False
+                    )
+            await db.commit()
+
+            received: Dict[int, int] = {}
+            for query_ranking in batch:
+                received[query_ranking.query_id] = received.get(query_ranking.query_id, 0) + len(query_ranking.results)
+
+            totals["queries_processed"] += len(batch)
+            totals["rows_received"] += sum(received.values())
+            totals["rows_inserted"] += sum(inserted.values())
+            totals["batches_committed"] += 1
+            batch.clear()
+            return {
+                **totals,
+                "queries": [
+                    {"query_id": query_id, "rows": rows_received, "inserted": inserted.get(query_id, 0)}
+                    for query_id, rows_received in received.items()
+                ]
+            }
+
+        async for query_ranking in rankings:
+            RankingService.validate_rank_positions(query_ranking.results)
+            batch.append(query_ranking)
+            batch_rows += len(query_ranking.results)
+            if batch_rows >= batch_size:
+                yield await commit_batch()
+                batch_rows = 0
+
+        if batch or totals["batches_committed"] == 0:
+            yield await commit_batch()
+
+    @staticmethod
+    def _chunk_relevance(query_id_column: Any, chunk: Any):
+        """
+        EXISTS clause telling whether ``chunk`` matches one of the ground truths of the query
+
+        A ranked chunk is relevant when one of the query's ground truths has the same
+        filename and either no section or the chunk's hierarchical metadata (metadata
+        rows are unique per section, so ids can be compared).
+        """
+        ground_truth = GroundTruth.__table__
+        association = query_ground_truth_association
+        return exists().where(
+            association.c.query_id == query_id_column,
+            association.c.ground_truth_id == ground_truth.c.id,
+            ground_truth.c.filename == chunk.c.filename,
+            or_(
+                ground_truth.c.hierarchical_metadata_id.is_(None),
+                ground_truth.c.hierarchical_metadata_id == chunk.c.hierarchical_metadata_id
+            )
+        )
+
+    @staticmethod
+    async def label_rankings(
+            db: AsyncSession,
+            experiment_id: int,
+            query_ids: Optional[Iterable[int]] = None,
+            only_unlabeled: bool = False,
+            returning: bool = True
+    ) -> Dict[int, bool]:
+        """
+        Compute is_relevant server-side with a single UPDATE ... FROM chunk
+        (see _chunk_relevance for the matching rule).
+
+        Args:
+            db: Database session
+            experiment_id: Experiment whose rankings are labeled
+            query_ids: Restrict to these queries (all queries of the experiment if None)
+            only_unlabeled: Keep the labels sent by the client, only fill NULLs
+            returning: Return the new labels (disable for large relabels)
+
+        Returns:
+            Mapping of ranking id to its new label (empty if returning is False)
+        """
+        ranking = Ranking.__table__
+        chunk = Chunk.__table__
+
+        relevant = RankingService._chunk_relevance(ranking.c.query_id, chunk).correlate(ranking, chunk)
+        stmt = (
+            update(ranking)
+            .values(is_relevant=relevant)
+            .where(
+                ranking.c.chunk_id == chunk.c.id,
+                ranking.c.experiment_id == experiment_id
+            )
+        )
+        if query_ids is not None:
+            stmt = stmt.where(ranking.c.query_id == any_(int_array(query_ids)))
+        if only_unlabeled:
+            stmt = stmt.where(ranking.c.is_relevant.is_(None))
+
+        if not returning:
+            await db.execute(stmt)
+            return {}
+        result = await db.execute(stmt.returning(ranking.c.id, ranking.c.is_relevant))
+        return {row.id: row.is_relevant for row in result}
+
+    @staticmethod
+    async def label_compact_rankings(
+            db: AsyncSession,
+            experiment_id: int,
+            query_ids: Optional[Iterable[int]] = None,
+            only_unlabeled: bool = False
+    ) -> None:
+        """
+        Compact-storage counterpart of label_rankings: each relevance array is rebuilt
+        from its chunk_ids in one UPDATE, by unnesting them against the chunk table
+
+        Args:
+            db: Database session
+            experiment_id: Experiment whose rankings are labeled
+            query_ids: Restrict to these queries (all queries of the experiment if None)
+            only_unlabeled: Keep the labels sent by the client, only fill NULL elements
+        """
+        compact = RankingCompact.__table__
+        chunk = Chunk.__table__
+        ranked = func.unnest(compact.c.chunk_ids).table_valued(
+            "chunk_id", with_ordinality="position"
+        ).render_derived(name="ranked")
+
+        relevant = RankingService._chunk_relevance(compact.c.query_id, chunk).correlate(compact, chunk)
+        if only_unlabeled:
+            relevant = func.coalesce(compact.c.relevance[ranked.c.position], relevant)
+        relevance = (
+            select(func.array_agg(aggregate_order_by(relevant, ranked.c.position)))
+            .select_from(ranked.outerjoin(chunk, chunk.c.id == ranked.c.chunk_id))
+            .correlate(compact)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(compact)
+            .values(relevance=relevance)
+            .where(compact.c.experiment_id == experiment_id)
+        )
+        if query_ids is not None:
+            stmt = stmt.where(compact.c.query_id == any_(int_array(query_ids)))
+        if only_unlabeled:
+            stmt = stmt.where(func.array_position(compact.c.relevance, None).is_not(None))
+        await db.execute(stmt)
+
+    @staticmethod
+    async def relabel_experiment(db: AsyncSession, experiment_id: int) -> Dict[str, int]:
+        """
+        Recompute is_relevant for every ranking of an experiment, overwriting client labels
+
+        Returns:
+            experiment_id, number of rankings labeled and how many of them are relevant
+        """
+        await RankingService.label_rankings(db, experiment_id, returning=False)
+        await RankingService.label_compact_rankings(db, experiment_id)
+        rankings = RankingService.ranking_rows(experiment_id=experiment_id).subquery()
+        result = await db.execute(
+            select(
+                func.count().label("labeled"),
+                func.count().filter(rankings.c.is_relevant == True).label("relevant")
+            )
+        )
+        row = result.one()
+        return {"experiment_id": experiment_id, "rankings_labeled": row.labeled, "relevant": row.relevant}
+
+    @staticmethod
+    async def get_import_progress(db: AsyncSession, experiment_id: int) -> Dict[str, Any]:
+        """
+        Count the rankings stored for each query of an experiment, so that an
+        interrupted import can be resumed from the first incomplete query
+
+        Returns:
+            experiment_id, total_rows and the per-query counts ordered by query id
+        """
+        stored = union_all(
+            select(Ranking.query_id, func.count().label("rows"))
+            .where(Ranking.experiment_id == experiment_id)
+            .group_by(Ranking.query_id),
+            select(RankingCompact.query_id, func.cardinality(RankingCompact.chunk_ids).label("rows"))
+            .where(RankingCompact.experiment_id == experiment_id)
+        ).subquery()
+        result = await db.execute(
+            select(stored.c.query_id, func.sum(stored.c.rows).label("rows"))
+            .group_by(stored.c.query_id)
+            .order_by(stored.c.query_id)
+        )
+        queries = [{"query_id": row.query_id, "rows": row.rows} for row in result]
+        return {
+            "experiment_id": experiment_id,
+            "total_rows": sum(q["rows"] for q in queries),
+            "queries": queries
+        }
+
+    @staticmethod
+    def ranking_rows(
+            experiment_id: Optional[int] = None,
+            query_id: Optional[int] = None,
+            query_ids: Optional[Iterable[int]] = None,
+            after: Optional[Tuple[int, int]] = None,
+            limit: Optional[int] = None
+    ):
+        """
+        One row per ranked chunk over both storages, with the columns of the ranking table
+
+        Compact rankings are unnested (their id is NULL). Filters are applied to each
+        branch so that the indexes of both tables are used.
+
+        Args:
+            experiment_id: Restrict to one experiment
+            query_id: Restrict to one query
+            query_ids: Restrict to several queries
+            after: Keyset (query_id, rank_position): only rows sorting after it
+            limit: Pre-limit each branch to its first ``limit`` rows in (query_id,
+                rank_position) order, so a keyset page never reads further; the caller
+                still has to sort and limit the union
+
+        Returns:
+            A UNION ALL select, to be used as a subquery
+        """
+        ranking = Ranking.__table__
+        compact_table = RankingCompact.__table__
+
+        rows = select(
+            ranking.c.id, ranking.c.rank_position, ranking.c.score, ranking.c.is_relevant,
+            ranking.c.chunk_id, ranking.c.query_id, ranking.c.experiment_id
+        )
+        compact_rows = select(compact_table)
+        if experiment_id is not None:
+            rows = rows.where(ranking.c.experiment_id == experiment_id)
+            compact_rows = compact_rows.where(compact_table.c.experiment_id == experiment_id)
+        if query_id is not None:
+            rows = rows.where(ranking.c.query_id == query_id)
+            compact_rows = compact_rows.where(compact_table.c.query_id == query_id)
+        if query_ids is not None:
+            query_ids = list(query_ids)
+            rows = rows.where(ranking.c.query_id == any_(int_array(query_ids)))
+            compact_rows = compact_rows.where(compact_table.c.query_id == any_(int_array(query_ids)))
+        if after is not None:
+            if experiment_id is not None:
+                # Leading experiment_id makes the row comparison an index condition
+                rows = rows.where(
+                    tuple_(ranking.c.experiment_id, ranking.c.query_id, ranking.c.rank_position)
+                    > tuple_(experiment_id, *after)
+                )
+            else:
+                rows = rows.where(tuple_(ranking.c.query_id, ranking.c.rank_position) > tuple_(*after))
+            # Whole compact rows are skipped before unnesting. The row of the keyset's own
+            # query may have no chunk left after it, so it is read apart from the limit
+            current_rows = compact_rows.where(compact_table.c.query_id == after[0])
+            compact_rows = compact_rows.where(compact_table.c.query_id > after[0])
+        if limit is not None:
+            # Each compact row holds at least one ranked chunk
+            rows = select(rows.order_by(ranking.c.query_id, ranking.c.rank_position).limit(limit).subquery())
+            compact_rows = select(compact_rows.order_by(compact_table.c.query_id).limit(limit).subquery())
+        if after is not None:
+            compact_rows = union_all(current_rows, compact_rows)
+
+        compact = compact_rows.subquery("compact")
+        ranked = func.unnest(compact.c.chunk_ids, compact.c.scores, compact.c.relevance).table_valued(
+            "chunk_id", "score", "is_relevant", with_ordinality="rank_position"
+        ).render_derived(name="ranked")
+        unnested = (
+            select(
+                literal(None, Integer).label("id"),
+                # ordinality is a bigint: cast so that both branches merge on the same sort key
+                cast(ranked.c.rank_position, Integer).label("rank_position"),
+                ranked.c.score.label("score"),
+                ranked.c.is_relevant.label("is_relevant"),
+                ranked.c.chunk_id.label("chunk_id"),
+                compact.c.query_id,
+                compact.c.experiment_id
+            )
+            .select_from(compact.join(ranked, true()))
+        )
+        if after is not None:
+            unnested = unnested.where(tuple_(compact.c.query_id, ranked.c.rank_position) > tuple_(*after))
+        return union_all(rows, unnested)
+
+    @staticmethod
+    async def get_ranking_page(
+            db: AsyncSession,
+            experiment_id: int,
+            after: Optional[Tuple[int, int]] = None,
+            limit: int = 1000
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """
+        Read one keyset page of an experiment's rankings ordered by (query_id, rank_position)
+
+        Args:
+            db: Database session
+            experiment_id: Experiment to page through
+            after: (query_id, rank_position) of the last row already received
+            limit: Page size
+
+        Returns:
+            The rows of the page and the keyset of the next page (None on the last page)
+        """
+        rankings = RankingService.ranking_rows(experiment_id=experiment_id, after=after, limit=limit + 1).subquery()
+        result = await db.execute(
+            select(rankings)
+            .order_by(rankings.c.query_id, rankings.c.rank_position)
+            .limit(limit + 1)
+        )
+        rows = [dict(row) for row in result.mappings()]
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]["query_id"], rows[-1]["rank_position"])
+
+    @staticmethod
+    async def get_rankings_by_query(
+            db: AsyncSession,
+            experiment_id: int,
+            query_ids: List[int],
+            top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch the rankings of several queries of an experiment in one statement
+
+        Args:
+            db: Database session
+            experiment_id: Experiment to read
+            query_ids: Queries to fetch
+            top_k: Keep only the first k rank positions of each query
+
+        Returns:
+            One {"query_id", "rankings"} entry per requested query, in request order
+            (queries without rankings get an empty list)
+        """
+        rankings = RankingService.ranking_rows(experiment_id=experiment_id, query_ids=query_ids).subquery()
+        stmt = select(rankings).order_by(rankings.c.query_id, rankings.c.rank_position)
+        if top_k is not None:
+            stmt = stmt.where(rankings.c.rank_position <= top_k)
+        result = await db.execute(stmt)
+
+        grouped: Dict[int, List[Dict[str, Any]]] = {query_id: [] for query_id in query_ids}
+        for row in result.mappings():
+            grouped[row["query_id"]].append(dict(row))
+        return [{"query_id": query_id, "rankings": rows} for query_id, rows in grouped.items()]
+
+    @staticmethod
+    async def load_rankings(
+            db: AsyncSession,
+            experiment_id: int,
+            query_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, RankedList]:
+        """
+        Read the rankings of an experiment as one ordered list per query, in one round trip.
+
+        Compact rows are returned as stored; row storage is aggregated server-side with
+        array_agg(... ORDER BY rank_position), so gaps in rank positions are closed.
+
+        Args:
+            db: Database session
+            experiment_id: Experiment to read
+            query_ids: Restrict to these queries (all queries of the experiment if None)
+
+        Returns:
+            Mapping of query id to its RankedList
+        """
+        ranking = Ranking.__table__
+        compact = RankingCompact.__table__
+        rows = (
+            select(
+                ranking.c.query_id,
+                func.array_agg(aggregate_order_by(ranking.c.chunk_id, ranking.c.rank_position)).label("chunk_ids"),
+                func.array_agg(aggregate_order_by(ranking.c.score, ranking.c.rank_position)).label("scores"),
+                func.array_agg(aggregate_order_by(ranking.c.is_relevant, ranking.c.rank_position)).label("relevance")
+            )
+            .where(ranking.c.experiment_id == experiment_id)
+            .group_by(ranking.c.query_id)
+        )
+        packed = (
+            select(compact.c.query_id, compact.c.chunk_ids, compact.c.scores, compact.c.relevance)
+            .where(compact.c.experiment_id == experiment_id)
+        )
+        if query_ids is not None:
+            query_ids = list(query_ids)
+            rows = rows.where(ranking.c.query_id == any_(int_array(query_ids)))
+            packed = packed.where(compact.c.query_id == any_(int_array(query_ids)))
+
+        result = await db.execute(union_all(rows, packed))
+        return {
+            row.query_id: RankedList(chunk_ids=row.chunk_ids, scores=row.scores, relevance=row.relevance)
+            for row in result
+        }
+
+    @staticmethod
+    async def compact_experiment(db: AsyncSession, experiment_id: int) -> Dict[str, int]:
+        """
+        Migrate the ranking rows of an experiment to compact storage and switch its mode.
+
+        Runs as INSERT ... SELECT array_agg + DELETE in the caller's transaction; the
+        experiment row is locked first so that no ranking write interleaves.
+
+        Returns:
+            experiment_id, number of queries and ranking rows migrated
+
+        Raises:
+            ValueError: unknown experiment, or a query whose rank positions are not 1..n
+        """
+        result = await db.execute(
+            select(Experiment.id).where(Experiment.id == experiment_id).with_for_update()
+        )
+        if result.scalar_one_or_none() is None:
+            raise ValueError(f"Experiment {experiment_id} not found")
+
+        ranking = Ranking.__table__
+        result = await db.execute(
+            select(ranking.c.query_id)
+            .where(ranking.c.experiment_id == experiment_id)
+            .group_by(ranking.c.query_id)
+            .having(or_(
+                func.min(ranking.c.rank_position) != 1,
+                func.max(ranking.c.rank_position) != func.count()
+            ))
+            .order_by(ranking.c.query_id)
+            .limit(10)
+        )
+        gapped = list(result.scalars())
+        if gapped:
+            raise ValueError(f"Rank positions are not contiguous from 1 for queries {gapped}")
+
+        packed = (
+            select(
+                ranking.c.experiment_id,
+                ranking.c.query_id,
+                func.array_agg(aggregate_order_by(ranking.c.chunk_id, ranking.c.rank_position)),
+                func.array_agg(aggregate_order_by(ranking.c.score, ranking.c.rank_position)),
+                func.array_agg(aggregate_order_by(ranking.c.is_relevant, ranking.c.rank_position))
+            )
+            .where(ranking.c.experiment_id == experiment_id)
+            .group_by(ranking.c.experiment_id, ranking.c.query_id)
+        )
+        try:
+            result = await db.execute(
+                insert(RankingCompact.__table__)
+                .from_select(["experiment_id", "query_id", "chunk_ids", "scores", "relevance"], packed)
+                .returning(func.cardinality(RankingCompact.__table__.c.chunk_ids))
+            )
+        except IntegrityError as e:
+            raise ValueError(f"Rankings rejected by the database: {e.orig}") from e
+        sizes = list(result.scalars())
+
+        await db.execute(delete(ranking).where(ranking.c.experiment_id == experiment_id))
+        await db.execute(
+            update(Experiment)
+            .where(Experiment.id == experiment_id)
+            .values(ranking_storage=RankingStorage.COMPACT)
+        )
+        return {"experiment_id": experiment_id, "queries_compacted": len(sizes), "rows_compacted": sum(sizes)}
+
+    @staticmethod
+    async def _copy_rankings(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """COPY rows into the ranking table on the session's own connection (and transaction)"""
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Ranking.__tablename__,
+            schema_name=Ranking.__table__.schema,
+            columns=RANKING_COPY_COLUMNS,
+            records=[tuple(row[column] for column in RANKING_COPY_COLUMNS) for row in rows]
+        )
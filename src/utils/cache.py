@@ -0,0 +1,191 @@
+# In-process caching utilities (bounded LRU caches with hit/miss counters)
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Every cache registers itself here so that its counters can be scraped from /health/stats
+cache_registry: Dict[str, "LRUCache"] = {}
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded mapping with least-recently-used eviction.
+
+    Process-local and not thread-safe: it is meant to be used from the event loop,
+    where no other coroutine can run between a lookup and an update.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        cache_registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (marking it as recently used) or ``default``"""
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or refresh a value, evicting the least recently used entries if full"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Drop a single entry if present"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters exposed for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None
+        }
+
+
+class InterningCache(LRUCache):
+    """
+    LRU cache of natural key -> primary key for find-or-create tables.
+
+    Ids written inside a transaction are staged on the session and only become
+    visible to other sessions once that transaction commits, so a rollback can
+    never leave an id in the cache that does not exist in the database.
+    """
+
+    def _pending(self, session: Any) -> Dict[Hashable, Any]:
+        return session.info.setdefault("interning_pending", {}).setdefault(self.name, {})
+
+    def lookup(self, session: Any, key: Hashable) -> Optional[Any]:
+        """Return the id for ``key`` from the cache or from this session's uncommitted writes"""
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._pending(session).get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return None
+        if key in self._data:
+            self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def stage(self, session: Any, key: Hashable, value: Any) -> None:
+        """Remember an id resolved in the session's current transaction"""
+        self._pending(session)[key] = value
+
+
+class CoalescingCache(LRUCache):
+    """
+    LRU cache of computed reads, with an optional time to live and coalescing of
+    concurrent identical lookups.
+
+    Callers put a version read from the database in the key (e.g. the experiment's
+    metrics_version), so that a write committed by any API worker makes the next
+    lookups miss; superseded entries age out of the LRU. The time to live bounds the
+    staleness of the inputs that no version covers.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float] = None):
+        super().__init__(name, maxsize)
+        self.ttl = ttl
+        self._in_flight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.coalesced = 0
+        self.expirations = 0
+
+    def _fresh(self, key: Hashable) -> Any:
+        """(expires_at, value) entry of ``key`` unless missing or expired"""
+        entry = self._data.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+        return self.get(key, _MISSING)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value of ``key``, computing it on a miss. Lookups of a key
+        already being computed wait for that computation (and share its result or
+        exception) instead of running their own.
+        """
+        while True:
+            entry = self._fresh(key)
+            if entry is not _MISSING:
+                return entry[1]
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The computing request was cancelled, not this one: take over
+
+        pending = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = pending
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as exc:
+            pending.set_exception(exc)
+            # Mark it retrieved so that asyncio does not log it when nobody waits
+            pending.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+        pending.set_result(value)
+        self.put(key, (time.monotonic() + self.ttl if self.ttl else math.inf, value))
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters exposed for monitoring, with lookups served by an in-flight computation"""
+        return {
+            **super().stats(),
+            "coalesced": self.coalesced,
+            "expirations": self.expirations,
+            "in_flight": len(self._in_flight)
+        }
+
+
+@event.listens_for(Session, "after_commit")
+def _promote_interned_ids(session: Session) -> None:
+    for name, pending in session.info.pop("interning_pending", {}).items():
+        cache = cache_registry[name]
+        for key, value in pending.items():
+            cache.put(key, value)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_interned_ids(session: Session) -> None:
+    session.info.pop("interning_pending", None)
@@ -0,0 +1,69 @@
+# Helpers for newline-delimited JSON (NDJSON) request and response bodies
+import json
+from typing import AsyncIterator, Type, TypeVar, Any
+
+from pydantic import BaseModel, ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Scope, Receive, Send
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Split a byte stream into NDJSON lines without buffering the whole body
+
+    Args:
+        chunks: Raw body chunks, e.g. ``request.stream()``
+
+    Yields:
+        (line_number, line) pairs, blank lines skipped
+    """
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+
+async def iter_ndjson_models(
+        chunks: AsyncIterator[bytes],
+        model: Type[ModelT]
+) -> AsyncIterator[ModelT]:
+    """
+    Parse an NDJSON byte stream into pydantic models one line at a time
+
+    Raises:
+        ValueError: If a line is not a valid ``model``, with its line number
+    """
+    async for line_number, line in iter_ndjson_lines(chunks):
+        try:
+            yield model.model_validate_json(line)
+        except ValidationError as e:
+            raise ValueError(f"Invalid {model.__name__} on line {line_number}: {e}") from e
+
+
+def ndjson_line(payload: Any) -> bytes:
+    """Serialize one object as an NDJSON line"""
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming NDJSON response whose body generator may still be reading the request body.
+
+    StreamingResponse normally listens for client disconnects on ``receive`` while it
+    streams, which would swallow the chunks ``request.stream()`` is waiting for.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -1 +1,32 @@
-# Pagination utilities (limit/offset helpers)
+# Pagination utilities (limit/offset helpers and keyset cursors)
+from typing import Optional, Tuple
+
+
+def encode_cursor(*values: int) -> str:
+    """Encode the sort key of the last returned row as a cursor, e.g. (12, 3) -> "12:3\""""
+    return ":".join(str(value) for value in values)
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[Tuple[int, ...]]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string, None or empty for the first page
+        size: Number of integer components the cursor must have
+
+    Returns:
+        Tuple of integers, or None for the first page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None
+    parts = cursor.split(":")
+    if len(parts) != size:
+        raise ValueError(f"Invalid cursor '{cursor}': expected {size} components")
+    try:
+        return tuple(int(part) for part in parts)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{cursor}': components must be integers")
@@ -0,0 +1,44 @@
+# Paired resampling kernels for significance tests. They run in worker processes and
+# only depend on NumPy, so that spawned workers do not import the application.
+from typing import Tuple
+
+import numpy as np
+
+# Upper bound of resamples * queries values materialized at once
+RESAMPLING_BLOCK_CELLS = 4_000_000
+
+
+def paired_resampling(
+        differences: np.ndarray,
+        resamples: int,
+        seed: np.random.SeedSequence
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resampled means of per-query paired differences (system B - system A)
+
+    Bootstrap: queries drawn with replacement. Randomization: the sign of each
+    difference flipped with probability 1/2 (the two systems' values swapped under
+    the null hypothesis that they are exchangeable).
+
+    Args:
+        differences: (n,) paired differences, n > 0
+        resamples: Number of resamples of each kind
+        seed: Seed of this worker's generator
+
+    Returns:
+        (resamples,) bootstrap means and (resamples,) randomization means
+    """
+    rng = np.random.default_rng(seed)
+    n = len(differences)
+    bootstrap = np.empty(resamples, dtype=np.float64)
+    randomization = np.empty(resamples, dtype=np.float64)
+
+    block_size = max(1, RESAMPLING_BLOCK_CELLS // n)
+    for start in range(0, resamples, block_size):
+        block = slice(start, min(start + block_size, resamples))
+        size = block.stop - block.start
+        bootstrap[block] = differences[rng.integers(0, n, (size, n))].mean(axis=1)
+        # sum over kept signs minus sum over flipped ones
+        kept = (rng.random((size, n)) < 0.5).astype(np.float64)
+        randomization[block] = (2 * (kept @ differences) - differences.sum()) / n
+    return bootstrap, randomization
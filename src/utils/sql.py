@@ -0,0 +1,10 @@
+# SQL expression helpers shared by the services
+from typing import Iterable
+
+from sqlalchemy import literal, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+def int_array(values: Iterable[int]):
+    """Bind a list of integers as a single PostgreSQL array parameter"""
+    return literal(list(values), ARRAY(Integer))
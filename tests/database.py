@@ -0,0 +1,49 @@
+# Disposable PostgreSQL schema for the DB-backed tests
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+
+# Schema of the models, redirected by schema_translate_map
+MODELS_SCHEMA = "retrieval_framework"
+
+
+@asynccontextmanager
+async def disposable_schema(
+        database_url: str,
+        schema: str
+) -> AsyncIterator[Tuple[AsyncEngine, async_sessionmaker]]:
+    """
+    Create every table in a fresh ``schema`` and drop it on exit
+
+    Yields:
+        An engine whose tables are redirected to ``schema``, and a session factory on it
+    """
+    from src.models import Base
+
+    engine = create_async_engine(
+        database_url,
+        execution_options={"schema_translate_map": {MODELS_SCHEMA: schema}}
+    )
+    session_factory = async_sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+            # Declared with create_type=False on the models
+            await conn.execute(text(
+                f"CREATE TYPE {schema}.confidence_level AS ENUM ('Low', 'Medium', 'High')"
+            ))
+            await conn.execute(text(
+                f"CREATE TYPE {schema}.complexity_query AS ENUM "
+                "('Textual_Description', 'Image_Analysis', 'Table_Analysis', 'Reasoning')"
+            ))
+            await conn.run_sync(Base.metadata.create_all)
+        yield engine, session_factory
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await engine.dispose()
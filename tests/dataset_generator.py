@@ -0,0 +1,93 @@
+# Synthetic dataset generator for ingestion tests and benchmarks
+import random
+from typing import Any, Dict, List, Optional
+
+COMPLEXITIES = ["Textual_Description", "Image_Analysis", "Table_Analysis", "Reasoning"]
+CONFIDENCES = ["Low", "Medium", "High"]
+SHARED_METADATA_POOL_SIZE = 50
+
+
+def generate_dataset(
+        dataset_name: str,
+        num_queries: int,
+        ground_truths_per_query: int = 3,
+        metadata_reuse_ratio: float = 0.8,
+        seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Build a DatasetCreate payload
+
+    Args:
+        dataset_name: Name of the dataset
+        num_queries: Number of queries (positions 1..num_queries)
+        ground_truths_per_query: Ground truths attached to every query
+        metadata_reuse_ratio: Probability that a ground truth points to a section shared
+            with other queries instead of a section of its own
+        seed: Seed of the random generator, the same seed gives the same payload
+    """
+    rng = random.Random(seed)
+    shared_sections = [
+        {"id_section": f"{i // 10}.{i % 10}", "section_title": f"Shared section {i}", "depth": 2}
+        for i in range(SHARED_METADATA_POOL_SIZE)
+    ]
+
+    queries = []
+    for position_id in range(1, num_queries + 1):
+        ground_truths = []
+        for n in range(ground_truths_per_query):
+            if rng.random() < metadata_reuse_ratio:
+                metadata = rng.choice(shared_sections)
+            else:
+                metadata = {
+                    "id_section": f"{position_id}.{n}",
+                    "section_title": f"Section {position_id}.{n}",
+                    "depth": 3
+                }
+            ground_truths.append({
+                "filename": f"manual_{rng.randrange(20)}.pdf",
+                "confidence": rng.choice(CONFIDENCES),
+                "hierarchical_metadata": metadata
+            })
+        queries.append({
+            "position_id": position_id,
+            "prompt": f"Synthetic question {position_id}?",
+            "device": f"device_{position_id % 7}",
+            "customer": f"customer_{position_id % 3}",
+            "complexity": COMPLEXITIES[position_id % len(COMPLEXITIES)],
+            "ground_truths": ground_truths
+        })
+    return {"dataset_name": dataset_name, "queries": queries}
+
+
+def change_queries(
+        dataset: Dict[str, Any],
+        changed_fraction: float,
+        seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Return a copy of a payload where a fraction of the queries has a new prompt
+
+    Args:
+        dataset: Payload produced by generate_dataset
+        changed_fraction: Fraction of queries to modify (0.0 - 1.0)
+        seed: Seed choosing which queries change
+    """
+    rng = random.Random(seed)
+    queries = [dict(query) for query in dataset["queries"]]
+    for query in rng.sample(queries, round(len(queries) * changed_fraction)):
+        query["prompt"] = query["prompt"] + " (revised)"
+    return {"dataset_name": dataset["dataset_name"], "queries": queries}
+
+
+def count_changed(before: Dict[str, Any], after: Dict[str, Any]) -> int:
+    """Number of positions whose payload differs between two versions of a dataset"""
+    return sum(1 for old, new in zip(before["queries"], after["queries"]) if old != new)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of measurements"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
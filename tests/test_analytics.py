@@ -0,0 +1,147 @@
+# Unit tests for the cross-experiment analytics
+from typing import List
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from src.schemas.analytics import ExperimentSignificanceResponse, PairedComparison, QuerySimilarity
+from src.services.analytics_service import AnalyticsService
+from src.services.ranking_service import RankedList
+from src.utils.resampling import paired_resampling
+
+
+def _ranked(chunk_ids: List[int]) -> RankedList:
+    return RankedList(chunk_ids=chunk_ids, scores=[0.0] * len(chunk_ids), relevance=[None] * len(chunk_ids))
+
+
+def _reference_similarity(a: List[int], b: List[int], k: int, p: float) -> dict:
+    """Row-by-row similarity from the definitions, padding excluded"""
+    a, b = [x for x in a if x >= 0], [x for x in b if x >= 0]
+    common = set(a) & set(b)
+    prefix = [len(set(a[:d]) & set(b[:d])) for d in range(1, k + 1)]
+    rbo = (1 - p) / p * sum(x / d * p ** d for d, x in enumerate(prefix, 1)) + prefix[-1] / k * p ** k
+
+    pairs = [(x, y) for i, x in enumerate(a) for y in a[i + 1:] if x in common and y in common]
+    signs = [1 if b.index(x) < b.index(y) else -1 for x, y in pairs]
+    union = len(set(a) | set(b))
+    return {
+        "overlap_at_k": len(common) / k,
+        "jaccard": len(common) / union if union else np.nan,
+        "rbo": rbo,
+        "kendall_tau": sum(signs) / len(signs) if signs else np.nan
+    }
+
+
+def test_identical_and_disjoint_rankings():
+    same = AnalyticsService.ranking_similarity(np.array([[1, 2, 3]]), np.array([[1, 2, 3]]))
+    disjoint = AnalyticsService.ranking_similarity(np.array([[1, 2, -1]]), np.array([[5, 6, -2]]))
+
+    for name in ("overlap_at_k", "jaccard", "rbo", "kendall_tau"):
+        assert same[name][0] == pytest.approx(1.0)
+    assert disjoint["overlap_at_k"][0] == 0.0
+    assert disjoint["jaccard"][0] == 0.0
+    assert disjoint["rbo"][0] == 0.0
+    assert np.isnan(disjoint["kendall_tau"][0])
+
+
+def test_reversed_ranking():
+    similarity = AnalyticsService.ranking_similarity(np.array([[1, 2, 3, -1]]), np.array([[3, 2, 1, -2]]))
+
+    assert similarity["overlap_at_k"][0] == pytest.approx(0.75)
+    assert similarity["jaccard"][0] == pytest.approx(1.0)
+    assert similarity["kendall_tau"][0] == pytest.approx(-1.0)
+    # X_d = 0, 1, 3, 3 at p = 0.9
+    assert similarity["rbo"][0] == pytest.approx(0.1 / 0.9 * (0.81 / 2 + 0.729 + 0.6561 * 3 / 4) + 0.6561 * 3 / 4)
+
+
+def test_similarity_matches_reference_definitions(monkeypatch):
+    # Small blocks, so that rows are spread over several of them
+    monkeypatch.setattr("src.services.analytics_service.SIMILARITY_BLOCK_CELLS", 100)
+    rng = np.random.default_rng(7)
+    k, p = 6, 0.8
+    rows_a, rows_b = [], []
+    for _ in range(40):
+        rows_a.append(_ranked(list(rng.choice(12, rng.integers(0, k + 3), replace=False))))
+        rows_b.append(_ranked(list(rng.choice(12, rng.integers(0, k + 3), replace=False))))
+    a = AnalyticsService.top_k_matrix(rows_a, k, pad=-1)
+    b = AnalyticsService.top_k_matrix(rows_b, k, pad=-2)
+
+    similarity = AnalyticsService.ranking_similarity(a, b, rbo_p=p)
+
+    for row in range(len(a)):
+        expected = _reference_similarity(list(a[row]), list(b[row]), k, p)
+        for name, value in expected.items():
+            np.testing.assert_allclose(similarity[name][row], value, equal_nan=True, err_msg=f"{name}, row {row}")
+
+
+def test_top_k_matrix_keeps_best_position_of_repeated_chunks():
+    matrix = AnalyticsService.top_k_matrix([_ranked([4, 4, 7, 4, 9]), _ranked([])], 3, pad=-1)
+
+    assert matrix.tolist() == [[4, 7, 9], [-1, -1, -1]]
+
+
+def test_summarize_ignores_undefined_values():
+    summary = AnalyticsService.summarize(np.array([1.0, np.nan, 3.0]))
+
+    assert summary["count"] == 2
+    assert summary["mean"] == pytest.approx(2.0)
+    assert summary["median"] == pytest.approx(2.0)
+    assert AnalyticsService.summarize(np.array([np.nan]))["mean"] is None
+
+
+def test_query_similarity_schema():
+    similarity = QuerySimilarity.model_validate({"query_id": 3, "overlap_at_k": 0.5, "rbo": 0.4})
+
+    assert similarity.jaccard is None
+    assert similarity.kendall_tau is None
+    with pytest.raises(ValidationError):
+        QuerySimilarity.model_validate({"query_id": 3, "overlap_at_k": 0.5})
+
+
+def test_paired_resampling_is_reproducible():
+    differences = np.random.default_rng(1).normal(0.2, 1.0, 30)
+
+    first = paired_resampling(differences, 500, np.random.SeedSequence(11))
+    second = paired_resampling(differences, 500, np.random.SeedSequence(11))
+    other = paired_resampling(differences, 500, np.random.SeedSequence(12))
+
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
+    assert not np.array_equal(first[0], other[0])
+
+
+def test_paired_resampling_distributions(monkeypatch):
+    # Small blocks, so that resamples are spread over several of them
+    monkeypatch.setattr("src.utils.resampling.RESAMPLING_BLOCK_CELLS", 1000)
+    differences = np.random.default_rng(2).normal(0.5, 1.0, 40)
+
+    bootstrap, randomization = paired_resampling(differences, 20_000, np.random.SeedSequence(3))
+
+    assert bootstrap.shape == randomization.shape == (20_000,)
+    # Bootstrap means center on the observed mean with the standard error of the mean
+    assert bootstrap.mean() == pytest.approx(differences.mean(), abs=0.02)
+    assert bootstrap.std() == pytest.approx(differences.std() / np.sqrt(len(differences)), rel=0.05)
+    # Sign flips center on 0 and never exceed the mean of the absolute differences
+    assert randomization.mean() == pytest.approx(0.0, abs=0.01)
+    assert np.abs(randomization).max() <= np.abs(differences).mean() + 1e-12
+
+
+def test_paired_resampling_of_constant_differences():
+    bootstrap, randomization = paired_resampling(np.full(5, 2.0), 200, np.random.SeedSequence(4))
+
+    np.testing.assert_allclose(bootstrap, 2.0)
+    # Means of 5 values of +-2: (2 * kept - 5) * 2 / 5
+    assert set(np.round(randomization, 9)) <= {round((2 * kept - 5) * 2 / 5, 9) for kept in range(6)}
+
+
+def test_significance_response_schema():
+    response = ExperimentSignificanceResponse.model_validate({
+        "experiment_ids": [1, 2], "metrics": ["ndcg"], "resamples": 1000, "confidence": 0.95, "seed": 7,
+        "comparisons": [{"experiment_a": 1, "experiment_b": 2, "metric": "ndcg", "queries": 0}]
+    })
+
+    assert response.comparisons[0].mean_difference is None
+    assert response.comparisons[0].bootstrap_p_value is None
+    with pytest.raises(ValidationError):
+        PairedComparison.model_validate({"experiment_a": 1, "experiment_b": 2, "metric": "ndcg"})
@@ -1 +1,233 @@
 # Unit tests for dataset endpoints
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy import event
+
+from tests.database import disposable_schema
+from tests.dataset_generator import generate_dataset, change_queries, count_changed, percentile
+
+# Disposable schema the benchmark tables are redirected to
+BENCHMARK_SCHEMA = "retrieval_framework_benchmark"
+# Statements per no-op re-upload must not grow with the dataset size
+NOOP_REUPLOAD_STATEMENT_BUDGET = 10
+
+
+def test_generate_dataset_is_deterministic():
+    first = generate_dataset("bench", 50, ground_truths_per_query=2, seed=7)
+    second = generate_dataset("bench", 50, ground_truths_per_query=2, seed=7)
+
+    assert first == second
+    assert [q["position_id"] for q in first["queries"]] == list(range(1, 51))
+    assert all(len(q["ground_truths"]) == 2 for q in first["queries"])
+
+
+def test_generate_dataset_metadata_reuse():
+    def distinct_sections(payload):
+        return {
+            gt["hierarchical_metadata"]["id_section"]
+            for q in payload["queries"] for gt in q["ground_truths"]
+        }
+
+    shared = generate_dataset("bench", 200, metadata_reuse_ratio=1.0)
+    unique = generate_dataset("bench", 200, metadata_reuse_ratio=0.0)
+
+    assert len(distinct_sections(shared)) <= 50
+    assert len(distinct_sections(unique)) == 200 * 3
+
+
+def test_change_queries_fraction():
+    dataset = generate_dataset("bench", 100)
+    changed = change_queries(dataset, 0.25)
+
+    assert count_changed(dataset, changed) == 25
+    assert count_changed(dataset, change_queries(dataset, 0.0)) == 0
+
+
+# ============================================================================
+# BULK UPSERT
+# ============================================================================
+
+# Disposable schema of the bulk upsert test
+UPSERT_SCHEMA = "retrieval_framework_upsert_test"
+
+
+def _query(position_id: int, prompt: str, *ground_truths: Dict[str, Any]) -> Dict[str, Any]:
+    return {"position_id": position_id, "prompt": prompt, "complexity": "Reasoning",
+            "ground_truths": list(ground_truths)}
+
+
+async def _count_rows(db, model) -> int:
+    from sqlalchemy import func, select
+
+    return (await db.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+async def _run_bulk_upsert(database_url: str) -> None:
+    from src.models import GroundTruth, HierarchicalMetadata
+    from src.models.dataset_snapshot import DatasetSnapshot
+    from src.schemas.query import QueryInput
+    from src.services.dataset_service import DatasetService, hierarchical_metadata_cache, ground_truth_cache
+
+    section = {"filename": "a.pdf", "confidence": "High",
+               "hierarchical_metadata": {"id_section": "1.1", "section_title": "Intro", "depth": 2}}
+    partial = {"filename": "a.pdf", "confidence": "Low", "hierarchical_metadata": {"id_section": "2"}}
+    whole_file = {"filename": "b.pdf", "confidence": "Medium"}
+
+    async def upload(db, name: str, queries: List[Dict[str, Any]]) -> Dict[str, int]:
+        stats = await DatasetService.process_dataset_with_retry(
+            db, name, [QueryInput.model_validate(q) for q in queries]
+        )
+        stats.pop("dataset_id")
+        return stats
+
+    async with disposable_schema(database_url, UPSERT_SCHEMA) as (_, session_factory):
+        hierarchical_metadata_cache.clear()
+        ground_truth_cache.clear()
+        async with session_factory() as db:
+            first = [_query(1, "one", section, whole_file), _query(2, "two", section), _query(3, "three", partial)]
+            assert await upload(db, "upsert", first) == {
+                "queries_added": 3, "queries_updated": 0, "queries_marked_obsolete": 0, "ground_truths_added": 4
+            }
+            assert await _count_rows(db, HierarchicalMetadata) == 2
+            assert await _count_rows(db, GroundTruth) == 3
+            assert await _count_rows(db, DatasetSnapshot) == 1
+
+            # Unchanged content: nothing written, no snapshot
+            assert await upload(db, "upsert", first) == {
+                "queries_added": 0, "queries_updated": 0, "queries_marked_obsolete": 0, "ground_truths_added": 0
+            }
+            assert await _count_rows(db, DatasetSnapshot) == 1
+
+            changed = [_query(2, "two, reworded", section), _query(4, "four", partial, whole_file)]
+            assert await upload(db, "upsert", changed) == {
+                "queries_added": 1, "queries_updated": 1, "queries_marked_obsolete": 1, "ground_truths_added": 3
+            }
+
+            # Cold cache: existing rows are found through the unique constraints
+            hierarchical_metadata_cache.clear()
+            ground_truth_cache.clear()
+            assert (await upload(db, "other", first))["ground_truths_added"] == 4
+            assert await _count_rows(db, HierarchicalMetadata) == 2
+            assert await _count_rows(db, GroundTruth) == 3
+
+            # Batched import: one commit per batch, a single snapshot at the end
+            async def queries():
+                for position_id in range(1, 6):
+                    yield QueryInput.model_validate(_query(position_id, f"batched {position_id}", whole_file))
+
+            snapshots = await _count_rows(db, DatasetSnapshot)
+            reports = [
+                report async for report in DatasetService.import_queries_in_batches(
+                    db, "batched", queries(), batch_size=2
+                )
+            ]
+            assert [r["batches_committed"] for r in reports] == [1, 2, 3]
+            assert reports[-1]["queries_added"] == 5
+            assert await _count_rows(db, DatasetSnapshot) == snapshots + 1
+
+
+def test_bulk_upsert_stats(database_url):
+    asyncio.run(_run_bulk_upsert(database_url))
+
+
+# ============================================================================
+# INGESTION BENCHMARK
+# ============================================================================
+
+async def _run_ingestion_benchmark(database_url: str, config: Dict[str, Any]) -> list:
+    import httpx
+    from src.database import get_db
+    from src.main import app
+    from src.services.dataset_service import hierarchical_metadata_cache, ground_truth_cache
+
+    results = []
+    # All tables are redirected to a disposable schema
+    async with disposable_schema(database_url, BENCHMARK_SCHEMA) as (engine, session_factory):
+        statements = {"count": 0}
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements["count"] += 1
+
+        async def override_get_db():
+            async with session_factory() as session:
+                try:
+                    yield session
+                except Exception:
+                    await session.rollback()
+                    raise
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            num_queries = config["num_queries"]
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+
+                async def upload(payload: Dict[str, Any]):
+                    statements["count"] = 0
+                    started = time.perf_counter()
+                    response = await client.post("/api/v1/datasets/", json=payload)
+                    elapsed = time.perf_counter() - started
+                    assert response.status_code == 201, response.text
+                    return response.json(), elapsed, statements["count"]
+
+                timings = {"first upload": [], "no-op re-upload": [], "partial-change re-upload": []}
+                counts = {}
+                for repeat in range(config["repeats"]):
+                    # Cold interning caches: every repeat measures the same work
+                    hierarchical_metadata_cache.clear()
+                    ground_truth_cache.clear()
+
+                    dataset = generate_dataset(
+                        f"benchmark_{repeat}",
+                        num_queries,
+                        ground_truths_per_query=config["ground_truths_per_query"],
+                        metadata_reuse_ratio=config["metadata_reuse_ratio"],
+                        seed=repeat
+                    )
+                    changed_dataset = change_queries(dataset, config["changed_fraction"], seed=repeat)
+                    expected_updates = count_changed(dataset, changed_dataset)
+
+                    stats, elapsed, count = await upload(dataset)
+                    assert stats["queries_added"] == num_queries
+                    timings["first upload"].append(elapsed)
+                    counts["first upload"] = count
+
+                    stats, elapsed, count = await upload(dataset)
+                    assert stats["queries_added"] == stats["queries_updated"] == 0
+                    assert count <= NOOP_REUPLOAD_STATEMENT_BUDGET
+                    timings["no-op re-upload"].append(elapsed)
+                    counts["no-op re-upload"] = count
+
+                    stats, elapsed, count = await upload(changed_dataset)
+                    assert stats["queries_updated"] == expected_updates
+                    assert stats["queries_marked_obsolete"] == expected_updates
+                    timings["partial-change re-upload"].append(elapsed)
+                    counts["partial-change re-upload"] = count
+
+            for scenario, values in timings.items():
+                results.append({
+                    "scenario": scenario,
+                    "queries": num_queries,
+                    "queries_per_second": num_queries / (sum(values) / len(values)),
+                    "statements": counts[scenario],
+                    "p50_ms": percentile(values, 0.5) * 1000,
+                    "p95_ms": percentile(values, 0.95) * 1000
+                })
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+    return results
+
+
+def test_dataset_ingestion_benchmark(database_url, benchmark_config, benchmark_results):
+    """
+    First upload, no-op re-upload and partial-change re-upload of a synthetic dataset,
+    driven through POST /datasets in-process. The summary table is printed at the end
+    of the run.
+    """
+    pytest.importorskip("httpx")
+    results = asyncio.run(_run_ingestion_benchmark(database_url, benchmark_config))
+    benchmark_results.extend(results)
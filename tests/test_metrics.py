@@ -0,0 +1,150 @@
+# Unit tests for the metrics calculation
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from src.schemas.metrics import ExperimentMetricsCalculation, MetricCurvesResponse
+from src.services.metrics_service import GainMatrix, MetricsService
+
+# (filename, section) of a ranked chunk or a ground truth, section 0 = no section
+Item = Tuple[str, int]
+
+
+def _grade(rankings: List[List[Item]], truths: List[List[Tuple[str, int, float]]], k: Optional[int] = None) -> GainMatrix:
+    """Gain matrix of rankings graded against (filename, section, gain) ground truths"""
+    n = len(rankings)
+    k = k or max(len(ranking) for ranking in rankings)
+    files = {}
+
+    def key(row: int, filename: str, section: int) -> int:
+        return (row * 100 + files.setdefault(filename, len(files))) * 10 + section
+
+    section_keys = np.full((n, k), -1, dtype=np.int64)
+    file_keys = np.full((n, k), -1, dtype=np.int64)
+    for row, ranking in enumerate(rankings):
+        for rank, (filename, section) in enumerate(ranking[:k]):
+            file_keys[row, rank] = key(row, filename, 0)
+            if section:
+                section_keys[row, rank] = key(row, filename, section)
+
+    truth_keys = np.array([key(row, f, s) for row, query in enumerate(truths) for f, s, _ in query], dtype=np.int64)
+    truth_gains = np.array([g for query in truths for _, _, g in query], dtype=np.float64)
+    ideal_gains = np.zeros((n, k))
+    for row, query in enumerate(truths):
+        best = sorted((g for _, _, g in query), reverse=True)[:k]
+        ideal_gains[row, :len(best)] = best
+
+    return GainMatrix(
+        query_ids=list(range(1, n + 1)),
+        gains=MetricsService.cover_ground_truths(section_keys, file_keys, truth_keys, truth_gains),
+        lengths=np.array([min(len(ranking), k) for ranking in rankings], dtype=np.float64),
+        ideal_gains=ideal_gains,
+        ground_truths=np.array([len(query) for query in truths], dtype=np.float64)
+    )
+
+
+def _metrics(matrix: GainMatrix) -> dict:
+    return MetricsService.compute_metrics(matrix.gains, matrix.lengths, matrix.ideal_gains, matrix.ground_truths)
+
+
+def test_ground_truth_is_credited_once():
+    # Three chunks of A, none of B: only half of the ground truths are found
+    matrix = _grade([[("a", 0), ("a", 0), ("a", 0)]], [[("a", 0, 3.0), ("b", 0, 3.0)]])
+    metrics = _metrics(matrix)
+
+    assert matrix.gains.tolist() == [[3.0, 0.0, 0.0]]
+    assert metrics["recall"][0] == pytest.approx(0.5)
+    assert metrics["precision_value"][0] == pytest.approx(1 / 3)
+    assert metrics["map_value"][0] == pytest.approx(0.5)
+    assert metrics["ndcg"][0] == pytest.approx(3 / (3 + 3 / math.log2(3)))
+
+
+def test_section_match_is_preferred_on_ties():
+    # The first chunk matches both ground truths: covering the section one leaves the
+    # whole-file one to the second chunk
+    matrix = _grade([[("a", 1), ("a", 2)]], [[("a", 0, 2.0), ("a", 1, 2.0)]])
+
+    assert matrix.gains.tolist() == [[2.0, 2.0]]
+    assert _metrics(matrix)["recall"][0] == pytest.approx(1.0)
+
+
+def test_best_uncovered_ground_truth_is_covered_first():
+    matrix = _grade([[("a", 1), ("a", 1), ("a", 1)]], [[("a", 0, 3.0), ("a", 1, 1.0)]])
+
+    assert matrix.gains.tolist() == [[3.0, 1.0, 0.0]]
+
+
+def test_compute_metrics_of_graded_ranking():
+    # A (gain 3) at rank 1, a miss, B (gain 1) at rank 3
+    metrics = _metrics(_grade([[("a", 0), ("x", 0), ("b", 0)]], [[("a", 0, 3.0), ("b", 0, 1.0)]]))
+
+    assert metrics["precision_value"][0] == pytest.approx(2 / 3)
+    assert metrics["recall"][0] == pytest.approx(1.0)
+    assert metrics["f1_score"][0] == pytest.approx(0.8)
+    assert metrics["mrr"][0] == pytest.approx(1.0)
+    assert metrics["map_value"][0] == pytest.approx((1 + 2 / 3) / 2)
+    assert metrics["ndcg"][0] == pytest.approx((3 + 1 / 2) / (3 + 1 / math.log2(3)))
+
+
+def test_query_without_ground_truths_is_undefined():
+    metrics = _metrics(_grade([[("x", 0), ("y", 0)]], [[]]))
+
+    assert metrics["precision_value"][0] == 0.0
+    assert metrics["mrr"][0] == 0.0
+    for name in ("recall", "f1_score", "ndcg", "map_value"):
+        assert np.isnan(metrics[name][0])
+
+
+def test_compute_metrics_at_matches_shorter_rankings():
+    rankings = [[("a", 0), ("x", 0), ("b", 0)], [("x", 0), ("c", 2)], [("y", 0)]]
+    truths = [[("a", 0, 3.0), ("b", 0, 1.0)], [("c", 0, 2.0), ("d", 0, 1.0)], [("e", 0, 1.0)]]
+    at_k = MetricsService.compute_metrics_at(_grade(rankings, truths), [1, 2, 3])
+
+    for cutoff, metrics in at_k.items():
+        expected = _metrics(_grade(rankings, truths, k=cutoff))
+        for name, values in expected.items():
+            np.testing.assert_allclose(metrics[name], values, equal_nan=True, err_msg=f"{name}@{cutoff}")
+
+
+def test_calculation_response_schema():
+    response = ExperimentMetricsCalculation.model_validate({
+        "experiment_id": 1,
+        "queries_computed": 2,
+        "at_k": {"5": {"precision_value": 0.5, "recall": None}}
+    })
+
+    assert response.k is None
+    assert response.at_k[5].precision_value == 0.5
+    assert response.at_k[5].ndcg is None
+    with pytest.raises(ValidationError):
+        ExperimentMetricsCalculation.model_validate({"experiment_id": 1, "at_k": {}})
+
+
+def test_curves_match_metrics_at_each_cutoff():
+    rankings = [[("a", 0), ("x", 0), ("b", 0), ("a", 1)], [("x", 0), ("c", 2)], [("y", 0)]]
+    truths = [[("a", 0, 3.0), ("b", 0, 1.0), ("a", 1, 2.0)], [("c", 0, 2.0), ("d", 0, 1.0)], []]
+    matrix = _grade(rankings, truths)
+    curves = MetricsService.compute_curves(matrix)
+    at_k = MetricsService.compute_metrics_at(matrix, range(1, 5))
+
+    for cutoff, metrics in at_k.items():
+        column = cutoff - 1
+        np.testing.assert_allclose(curves["precision"][:, column], metrics["precision_value"])
+        np.testing.assert_allclose(curves["recall"][:, column], metrics["recall"], equal_nan=True)
+        np.testing.assert_allclose(curves["ndcg"][:, column], metrics["ndcg"], equal_nan=True)
+        np.testing.assert_allclose(curves["hit_rate"][:, column], (metrics["mrr"] > 0).astype(float))
+
+
+def test_curves_response_schema():
+    response = MetricCurvesResponse.model_validate({
+        "experiment_id": 1, "max_k": 2, "query_count": 3,
+        "precision": [1.0, 0.5], "recall": [0.5, None], "hit_rate": [1, 1], "ndcg": [None, None]
+    })
+
+    assert response.recall == [0.5, None]
+    assert response.hit_rate == [1.0, 1.0]
+    with pytest.raises(ValidationError):
+        MetricCurvesResponse.model_validate({"experiment_id": 1, "max_k": 2, "query_count": 3, "precision": ["high"]})
@@ -0,0 +1,88 @@
+# Unit tests for ranking storage and keyset paging
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import update
+
+from tests.database import disposable_schema
+
+# Disposable schema the ranking tests run in
+RANKINGS_SCHEMA = "retrieval_framework_rankings_test"
+
+
+async def _seed_experiments(db, rankings: Dict[int, Dict[int, int]]) -> None:
+    """
+    Store {experiment_id: {position_id: ranking length}}: even queries as ranking rows,
+    odd ones in compact storage (experiments and the query of position p are numbered
+    from 1, so positions must be 1..n)
+    """
+    from src.models import RankingStorage
+    from src.models.chunk import Chunk
+    from src.models.configuration import Configuration
+    from src.models.experiment import Experiment
+    from src.schemas.dataset import QueryInput
+    from src.schemas.ranking import RankingResultInput
+    from src.services.dataset_service import DatasetService
+    from src.services.ranking_service import RankingService
+
+    positions = sorted({p for queries in rankings.values() for p in queries})
+    await DatasetService.process_dataset_with_queries(db, "paging", [
+        QueryInput(position_id=p, prompt=f"query {p}", complexity="Reasoning", ground_truths=[])
+        for p in positions
+    ])
+    db.add(Configuration(idconfiguration="paging", name="paging"))
+    db.add_all([Chunk(text=f"chunk {i}", filename="paging.pdf") for i in range(10)])
+    await db.flush()
+
+    for experiment_id, queries in rankings.items():
+        db.add(Experiment(start_time=datetime(2026, 1, 1), configuration_id=1, dataset_id=1))
+        await db.flush()
+        for storage in (RankingStorage.ROWS, RankingStorage.COMPACT):
+            await db.execute(
+                update(Experiment).where(Experiment.id == experiment_id).values(ranking_storage=storage)
+            )
+            for position, length in queries.items():
+                if (position % 2 == 1) == (storage == RankingStorage.COMPACT):
+                    await RankingService.bulk_insert_rankings(db, experiment_id, position, [
+                        RankingResultInput(rank_position=r, score=1.0 / r, is_relevant=False, chunk_id=r)
+                        for r in range(1, length + 1)
+                    ])
+    await db.commit()
+
+
+async def _pages(db, experiment_id: int, limit: int) -> List[List[tuple]]:
+    from src.services.ranking_service import RankingService
+
+    pages, after = [], None
+    while True:
+        rows, after = await RankingService.get_ranking_page(db, experiment_id, after=after, limit=limit)
+        pages.append([(row["query_id"], row["rank_position"]) for row in rows])
+        if after is None:
+            return pages
+
+
+async def _run_paging(database_url: str) -> None:
+    async with disposable_schema(database_url, RANKINGS_SCHEMA) as (_, session_factory):
+        async with session_factory() as db:
+            await _seed_experiments(db, {
+                # Mixed storage, rankings of several lengths
+                1: {1: 3, 2: 2, 3: 1, 4: 4, 5: 1, 6: 1, 7: 2, 8: 1, 9: 1},
+                # Compact storage only, one chunk per ranking
+                2: {1: 1, 3: 1, 5: 1, 7: 1, 9: 1}
+            })
+
+            mixed = [(q, r) for q, n in [(1, 3), (2, 2), (3, 1), (4, 4), (5, 1), (6, 1), (7, 2), (8, 1), (9, 1)]
+                     for r in range(1, n + 1)]
+            for limit in range(1, len(mixed) + 2):
+                pages = await _pages(db, 1, limit)
+                assert [row for page in pages for row in page] == mixed, f"page size {limit}"
+                assert all(len(page) == limit for page in pages[:-1])
+
+            # The cursor's own compact row has no chunk left: the next page must still fill up
+            pages = await _pages(db, 2, 2)
+            assert pages == [[(1, 1), (3, 1)], [(5, 1), (7, 1)], [(9, 1)]]
+
+
+def test_keyset_pages_cover_both_storages(database_url):
+    asyncio.run(_run_paging(database_url))